@@ -31,4 +31,13 @@ def create_app(config_overrides=None):
         from app.models import Transaction  # noqa: F401
         db.create_all()
 
+        # Load the columnar snapshot at worker start when it is enabled
+        if app.config["ANALYTICS_ENGINE"] == "snapshot":
+            from app.services.snapshot import get_snapshot
+            get_snapshot()
+
+        # Build the store index before the first product or store question
+        from app.services.store_index import get_store_index
+        get_store_index()
+
     return app
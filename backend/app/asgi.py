@@ -0,0 +1,245 @@
+"""ASGI entry point with an asyncio-native chat path.
+
+    gunicorn -k uvicorn.workers.UvicornWorker --timeout 120 "app.asgi:create_asgi_app()"
+
+POST /api/chat and /api/chat/stream are served by coroutines: LLM calls go
+through AsyncOpenAI and database work runs in worker threads, so one process
+keeps hundreds of conversations waiting on the LLM at once instead of one per
+sync worker. Every other request (including CORS preflights) is handed to
+the Flask app through asgiref's WSGI adapter.
+
+The pipeline is the same as app.routes.chat, whose step-3 helpers
+(_prepare/_finish) it shares: speculative retrieval during classification,
+deadline budgets, templated answers, payload compaction and hedged
+generation. Identical in-flight questions are coalesced within the worker
+only; COALESCE_BACKEND=redis applies to the WSGI app.
+"""
+
+import asyncio
+import json
+import logging
+
+from asgiref.wsgi import WsgiToAsgi
+
+from app import create_app
+from app.routes.chat import (
+    ERROR_RESPONSE,
+    OFF_TOPIC_RESPONSE,
+    _coalesce_key,
+    _degraded,
+    _finish,
+    _meta_event,
+    _normalize_classification,
+    _prepare,
+    _retrieve,
+    _sse,
+    _validate_message,
+)
+from app.services import metrics
+from app.services.deadline import Deadline
+from app.services.llm_async import aclassify_query, agenerate_response, astream_response
+from app.services.llm_service import DeadlineExceeded
+from app.services.speculation import retrieval_key, speculate
+
+logger = logging.getLogger(__name__)
+
+CHAT_PATHS = ("/api/chat", "/api/chat/stream")
+
+
+async def _offload(flask_app, fn, *args):
+    """Run blocking (database) work in a thread with its own app context."""
+    def run():
+        with flask_app.app_context():
+            return fn(*args)
+    return await asyncio.to_thread(run)
+
+
+async def _classify_and_retrieve(flask_app, user_message, deadline):
+    """Async steps 1 and 2; returns (classification, retrieval or None)."""
+    speculation = speculate(user_message, _retrieve)
+    try:
+        with deadline.stage("classify") as stage:
+            classification = _normalize_classification(
+                await aclassify_query(user_message, timeout=stage.timeout)
+            )
+    except BaseException:
+        if speculation is not None:
+            speculation.discard()
+        raise
+
+    if classification["intent"] == "off_topic":
+        if speculation is not None:
+            speculation.discard()
+        return classification, None
+
+    with deadline.stage("retrieve"):
+        retrieval = None
+        if speculation is not None:
+            if retrieval_key(classification) == retrieval_key(speculation.guess):
+                # Don't block the loop in claim(); failures are handled there
+                await asyncio.wait([asyncio.wrap_future(speculation.future)])
+            retrieval = speculation.claim(classification)
+        if retrieval is None:
+            retrieval = await _offload(flask_app, _retrieve, classification)
+    return classification, retrieval
+
+
+async def answer(flask_app, user_message):
+    """Run the full pipeline for one question and return the JSON body."""
+    deadline = Deadline.from_config()
+    classification, retrieval = await _classify_and_retrieve(flask_app, user_message, deadline)
+    intent = classification["intent"]
+
+    if intent == "off_topic":
+        return {"response": OFF_TOPIC_RESPONSE, "intent": "off_topic"}
+
+    result, prompt_data = _prepare(user_message, classification, retrieval)
+    if result["response"] is not None:
+        return result
+
+    with deadline.stage("generate") as stage:
+        try:
+            text = await agenerate_response(user_message, prompt_data, deadline=stage.expires)
+        except DeadlineExceeded:
+            text = None
+    return _finish(result, retrieval, text)
+
+
+async def stream_events(flask_app, user_message):
+    """Yield the SSE events of /api/chat/stream."""
+    try:
+        deadline = Deadline.from_config()
+        classification, retrieval = await _classify_and_retrieve(flask_app, user_message, deadline)
+        intent = classification["intent"]
+
+        if intent == "off_topic":
+            yield _sse("meta", {"intent": "off_topic"})
+            yield _sse("token", {"text": OFF_TOPIC_RESPONSE})
+            yield _sse("done", {})
+            return
+
+        result, prompt_data = _prepare(user_message, classification, retrieval)
+        yield _meta_event(result)
+
+        if result["response"] is not None:
+            yield _sse("token", {"text": result["response"]})
+        else:
+            with deadline.stage("generate") as stage:
+                try:
+                    async for text in astream_response(user_message, prompt_data, deadline=stage.expires):
+                        yield _sse("token", {"text": text})
+                except DeadlineExceeded:
+                    yield _sse("token", {"text": _degraded(retrieval[0], retrieval[2])})
+        yield _sse("done", {})
+
+    except Exception as e:
+        logger.error(f"Chat stream error: {e}", exc_info=True)
+        yield _sse("error", {"response": ERROR_RESPONSE})
+
+
+class ChatASGI:
+    """ASGI app: native async chat endpoints, Flask for everything else."""
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.wsgi = WsgiToAsgi(flask_app)
+        self._inflight = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http" and scope["method"] == "POST" and scope["path"] in CHAT_PATHS:
+            body = await self._read_body(receive)
+            with self.flask_app.app_context():
+                if scope["path"] == "/api/chat":
+                    await self._chat(body, send)
+                else:
+                    await self._chat_stream(body, send)
+        else:
+            await self.wsgi(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    @staticmethod
+    async def _read_body(receive):
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                return b"".join(chunks)
+
+    @staticmethod
+    async def _start(send, status, content_type, extra_headers=()):
+        headers = [
+            (b"content-type", content_type),
+            (b"access-control-allow-origin", b"*"),
+            *extra_headers,
+        ]
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+
+    async def _send_json(self, send, payload, status=200):
+        await self._start(send, status, b"application/json")
+        await send({"type": "http.response.body", "body": json.dumps(payload).encode()})
+
+    async def _coalesced(self, user_message):
+        """Share one in-flight answer() between identical concurrent questions."""
+        key = await _offload(self.flask_app, _coalesce_key, user_message)
+        task = self._inflight.get(key)
+        if task is not None:
+            metrics.incr("singleflight.shared")
+            return await asyncio.shield(task)
+
+        metrics.incr("singleflight.leaders")
+        task = asyncio.ensure_future(answer(self.flask_app, user_message))
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _chat(self, body, send):
+        try:
+            user_message, error = _validate_message(json.loads(body or b"{}"))
+        except ValueError:
+            user_message, error = None, "Please enter a question about retail data."
+        if error:
+            await self._send_json(send, {"response": error})
+            return
+
+        try:
+            result = await self._coalesced(user_message)
+        except Exception as e:
+            logger.error(f"Chat error: {e}", exc_info=True)
+            await self._send_json(send, {"response": ERROR_RESPONSE}, status=500)
+            return
+        await self._send_json(send, result)
+
+    async def _chat_stream(self, body, send):
+        try:
+            user_message, error = _validate_message(json.loads(body or b"{}"))
+        except ValueError:
+            user_message, error = None, "Please enter a question about retail data."
+
+        await self._start(send, 200, b"text/event-stream", [
+            (b"cache-control", b"no-cache"),
+            (b"x-accel-buffering", b"no"),
+        ])
+        if error:
+            events = [_sse("meta", {"intent": None}), _sse("token", {"text": error}), _sse("done", {})]
+            for event in events:
+                await send({"type": "http.response.body", "body": event.encode(), "more_body": True})
+        else:
+            async for event in stream_events(self.flask_app, user_message):
+                await send({"type": "http.response.body", "body": event.encode(), "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+
+def create_asgi_app(config_overrides=None):
+    """Build the ASGI application around a new Flask app."""
+    return ChatASGI(create_app(config_overrides))
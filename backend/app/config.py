@@ -8,3 +8,66 @@ class Config:
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
+
+    # "sql" aggregates in the database; "snapshot" keeps a columnar copy of
+    # the transactions table in each worker (see app/services/snapshot.py)
+    ANALYTICS_ENGINE = os.getenv("ANALYTICS_ENGINE", "sql")
+    SNAPSHOT_CHECK_INTERVAL = float(os.getenv("SNAPSHOT_CHECK_INTERVAL", "5"))
+
+    # Caches: "memory" (per worker) or "redis" (shared, needs REDIS_URL)
+    CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+    REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+    CLASSIFICATION_CACHE_SIZE = int(os.getenv("CLASSIFICATION_CACHE_SIZE", "2048"))
+    CLASSIFICATION_CACHE_TTL = int(os.getenv("CLASSIFICATION_CACHE_TTL", "86400"))
+    # Formatted data and chart payloads, keyed on the dataset version
+    RESULTS_CACHE_SIZE = int(os.getenv("RESULTS_CACHE_SIZE", "4096"))
+    RESULTS_CACHE_TTL = int(os.getenv("RESULTS_CACHE_TTL", "86400"))
+
+    # /api/customers/<id> history page size (default and maximum), and the
+    # number of recent transactions shown to the LLM for a customer question
+    CUSTOMER_PAGE_SIZE = int(os.getenv("CUSTOMER_PAGE_SIZE", "50"))
+    CUSTOMER_PAGE_MAX = int(os.getenv("CUSTOMER_PAGE_MAX", "500"))
+    CUSTOMER_LLM_TRANSACTIONS = int(os.getenv("CUSTOMER_LLM_TRANSACTIONS", "20"))
+
+    # Seconds a proxy or browser may reuse a /api/customers or /api/products
+    # response before revalidating its ETag (0 revalidates every time)
+    HTTP_CACHE_MAX_AGE = int(os.getenv("HTTP_CACHE_MAX_AGE", "60"))
+
+    # Coalescing of identical in-flight chat requests: "memory" (threads in a
+    # worker) or "redis" (across workers)
+    COALESCE_BACKEND = os.getenv("COALESCE_BACKEND", "memory")
+
+    # Approximate token budget for the [DATA] section of the response prompt
+    # (0 disables compaction)
+    DATA_TOKEN_BUDGET = int(os.getenv("DATA_TOKEN_BUDGET", "600"))
+
+    # End-to-end deadline for a chat request and its per-stage budgets, in
+    # seconds (kept below gunicorn's --timeout 120). When generation runs out
+    # of time the data is returned with a short templated summary.
+    CHAT_DEADLINE = float(os.getenv("CHAT_DEADLINE", "90"))
+    CHAT_CLASSIFY_BUDGET = float(os.getenv("CHAT_CLASSIFY_BUDGET", "10"))
+    CHAT_RETRIEVE_BUDGET = float(os.getenv("CHAT_RETRIEVE_BUDGET", "15"))
+    CHAT_GENERATE_BUDGET = float(os.getenv("CHAT_GENERATE_BUDGET", "60"))
+
+    # /api/chat/batch: maximum questions per request, threads for
+    # classification and retrieval, and concurrent generations
+    BATCH_MAX_MESSAGES = int(os.getenv("BATCH_MAX_MESSAGES", "500"))
+    BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "16"))
+    BATCH_GENERATE_CONCURRENCY = int(os.getenv("BATCH_GENERATE_CONCURRENCY", "8"))
+
+    # Threads per worker that start the likely entity query while the question
+    # is being classified (0 disables speculative retrieval)
+    SPECULATION_WORKERS = int(os.getenv("SPECULATION_WORKERS", "4"))
+
+    # "approximate" answers every business-metrics question from a random
+    # sample and HyperLogLog sketches; "exact" (default) only when asked for
+    METRICS_MODE = os.getenv("METRICS_MODE", "exact")
+    APPROX_SAMPLE_SIZE = int(os.getenv("APPROX_SAMPLE_SIZE", "2000"))
+
+    # (intent:metric_type) pairs answered from a deterministic template
+    # instead of GPT-4o; empty sends every question to the LLM
+    TEMPLATED_ANSWERS = {
+        key.strip()
+        for key in os.getenv("TEMPLATED_ANSWERS", "business_metric:count,business_metric:revenue").split(",")
+        if key.strip()
+    }
@@ -4,9 +4,14 @@ from app.extensions import db
 class Transaction(db.Model):
     """Retail transaction record from the Kaggle dataset."""
     __tablename__ = "transactions"
+    __table_args__ = (
+        # Customer history pages newest first by (transaction_date, id); its
+        # customer_id prefix also serves plain customer lookups
+        db.Index("ix_transactions_customer_date_id", "customer_id", "transaction_date", "id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    customer_id = db.Column(db.String(20), nullable=False, index=True)
+    customer_id = db.Column(db.String(20), nullable=False)
     product_id = db.Column(db.String(20), nullable=False, index=True)
     quantity = db.Column(db.Integer, nullable=False)
     price = db.Column(db.Float, nullable=False)
@@ -31,3 +36,87 @@ class Transaction(db.Model):
             "discount_applied": self.discount_applied,
             "total_amount": self.total_amount,
         }
+
+
+class DatasetVersion(db.Model):
+    """Single-row version token, bumped whenever transactions are loaded."""
+    __tablename__ = "dataset_version"
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+
+class IngestWatermark(db.Model):
+    """How far each CSV source has been ingested by append loads."""
+    __tablename__ = "ingest_watermarks"
+
+    source = db.Column(db.String(500), primary_key=True)
+    rows_ingested = db.Column(db.Integer, nullable=False, default=0)
+    size_bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    content_hash = db.Column(db.String(64), nullable=False)
+    max_transaction_date = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+
+class TransactionRollup(db.Model):
+    """Per-day sums of transactions by category, payment method and product.
+
+    Maintained by app.services.rollups on ingest; answers business metrics
+    and trend questions without scanning the transactions table.
+    """
+    __tablename__ = "transaction_rollups"
+
+    day = db.Column(db.Date, primary_key=True)
+    product_category = db.Column(db.String(100), primary_key=True)
+    payment_method = db.Column(db.String(50), primary_key=True)
+    product_id = db.Column(db.String(20), primary_key=True)
+    month = db.Column(db.Date, nullable=False, index=True)  # first day of the month
+    tx_count = db.Column(db.Integer, nullable=False)
+    total_quantity = db.Column(db.Integer, nullable=False)
+    revenue = db.Column(db.Float, nullable=False)
+    sum_price = db.Column(db.Float, nullable=False)
+    sum_discount = db.Column(db.Float, nullable=False)
+
+
+class CustomerProfile(db.Model):
+    """Running totals for one customer, maintained by app.services.profiles on ingest."""
+    __tablename__ = "customer_profiles"
+
+    customer_id = db.Column(db.String(20), primary_key=True)
+    tx_count = db.Column(db.Integer, nullable=False)
+    total_quantity = db.Column(db.Integer, nullable=False)
+    total_spend = db.Column(db.Float, nullable=False)
+    sum_price = db.Column(db.Float, nullable=False)
+    sum_discount = db.Column(db.Float, nullable=False)
+    product_count = db.Column(db.Integer, nullable=False)
+    first_purchase = db.Column(db.DateTime, nullable=False)
+    last_purchase = db.Column(db.DateTime, nullable=False)
+    # {name: value} maps and the first amounts (by id) for calculation breakdowns
+    spend_by_category = db.Column(db.JSON, nullable=False)
+    count_by_category = db.Column(db.JSON, nullable=False)
+    spend_by_payment = db.Column(db.JSON, nullable=False)
+    count_by_payment = db.Column(db.JSON, nullable=False)
+    sample_quantities = db.Column(db.JSON, nullable=False)
+    sample_amounts = db.Column(db.JSON, nullable=False)
+
+
+class ProductSummary(db.Model):
+    """Running totals for one product, maintained by app.services.product_summaries on ingest."""
+    __tablename__ = "product_summaries"
+
+    product_id = db.Column(db.String(20), primary_key=True)
+    max_id = db.Column(db.Integer, nullable=False)  # last transaction folded in
+    tx_count = db.Column(db.Integer, nullable=False)
+    total_quantity = db.Column(db.Integer, nullable=False)
+    revenue = db.Column(db.Float, nullable=False)
+    sum_price = db.Column(db.Float, nullable=False)
+    sum_discount = db.Column(db.Float, nullable=False)
+    revenue_by_category = db.Column(db.JSON, nullable=False)
+    count_by_category = db.Column(db.JSON, nullable=False)
+    revenue_by_payment = db.Column(db.JSON, nullable=False)
+    count_by_payment = db.Column(db.JSON, nullable=False)
+    sample_quantities = db.Column(db.JSON, nullable=False)
+    sample_amounts = db.Column(db.JSON, nullable=False)
+    # HyperLogLog registers (app.services.sketch) for distinct customers
+    customer_sketch = db.Column(db.LargeBinary, nullable=False)
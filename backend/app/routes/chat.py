@@ -1,116 +1,513 @@
 """Chat endpoint — orchestrates LLM + data layer."""
 
+import hashlib
+import json
 import logging
-from flask import Blueprint, jsonify, request
+import time
+from concurrent.futures import ThreadPoolExecutor
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
 
-from app.services.llm_service import classify_query, generate_response
+from app.services.llm_service import (
+    DeadlineExceeded,
+    classify_query,
+    generate_response,
+    stream_response,
+)
+from app.services.answer_templates import fallback_summary, render_answer, template_key
 from app.services.data_service import (
     get_customer_transactions,
     get_product_info,
     get_business_metrics,
+    get_revenue_trend,
+    get_store_membership,
+    summarize_business_metrics,
+    product_summary,
+    store_membership,
     compare_customers,
     compare_products,
 )
+from app.services import metrics
+from app.services.compaction import compact_payload
+from app.services.dataset import current_dataset_version
+from app.services.deadline import Deadline
+from app.services.intent_rules import normalize_text
+from app.services.rollups import GRANULARITIES
+from app.services.singleflight import get_singleflight
+from app.services.speculation import retrieval_key, speculate
 from app.services.chart_service import (
-    build_product_charts,
     build_business_charts,
-    build_comparison_charts,
+    build_store_charts,
+    business_charts,
+    comparison_charts,
+    product_charts,
+    trend_charts,
 )
-from app.models import Transaction
 
 logger = logging.getLogger(__name__)
 
 chat_bp = Blueprint("chat", __name__)
 
+MAX_MESSAGE_LENGTH = 500
 
-@chat_bp.route("/chat", methods=["POST"])
-def chat():
-    data = request.get_json()
-    user_message = data.get("message", "").strip()
+OFF_TOPIC_RESPONSE = (
+    "I'm a retail analytics assistant — I can only help with questions about customers, "
+    "products, and business metrics from the transaction dataset. Try asking something like "
+    "*\"What has customer 109318 purchased?\"*"
+)
+ERROR_RESPONSE = "Sorry, something went wrong processing your question. Please try again."
 
-    if not user_message:
-        return jsonify({"response": "Please enter a question about retail data."})
 
-    MAX_MESSAGE_LENGTH = 500
+def _validate_message(data):
+    """Return (message, None) or (None, error_text) for a chat request body."""
+    user_message = (data or {}).get("message", "").strip()
+
+    if not user_message:
+        return None, "Please enter a question about retail data."
     if len(user_message) > MAX_MESSAGE_LENGTH:
-        return jsonify({"response": f"Please keep your question under {MAX_MESSAGE_LENGTH} characters."})
+        return None, f"Please keep your question under {MAX_MESSAGE_LENGTH} characters."
+    return user_message, None
 
-    try:
-        # Step 1: Classify intent and extract entities
-        classification = classify_query(user_message)
-        intent = classification.get("intent", "general")
-        customer_id = classification.get("customer_id")
-        customer_id_2 = classification.get("customer_id_2")
-        product_id = classification.get("product_id")
-        product_id_2 = classification.get("product_id_2")
-
-        # Normalize customer IDs to uppercase for case-insensitive matching
-        if customer_id:
-            customer_id = customer_id.upper()
-        if customer_id_2:
-            customer_id_2 = customer_id_2.upper()
-        if product_id:
-            product_id = product_id.upper()
-        if product_id_2:
-            product_id_2 = product_id_2.upper()
-
-        logger.info(f"Intent: {intent}, customer_id: {customer_id}, product_id: {product_id}")
-
-        # Handle off-topic questions
-        if intent == "off_topic":
-            return jsonify({
-                "response": "I'm a retail analytics assistant — I can only help with questions about customers, products, and business metrics from the transaction dataset. Try asking something like *\"What has customer 109318 purchased?\"*",
-                "intent": "off_topic",
-            })
-
-        # Step 2: Load rows ONCE, use for both text + charts
-        chart_data = None
-
-        if intent == "comparison":
-            if customer_id and customer_id_2:
-                r1 = Transaction.query.filter_by(customer_id=customer_id).all()
-                r2 = Transaction.query.filter_by(customer_id=customer_id_2).all()
-                retrieved_data = compare_customers(customer_id, customer_id_2, r1, r2)
-                if r1 and r2:
-                    chart_data = build_comparison_charts("customer", customer_id, customer_id_2, r1, r2)
-            elif product_id and product_id_2:
-                r1 = Transaction.query.filter_by(product_id=product_id).all()
-                r2 = Transaction.query.filter_by(product_id=product_id_2).all()
-                retrieved_data = compare_products(product_id, product_id_2, r1, r2)
-                if r1 and r2:
-                    chart_data = build_comparison_charts("product", product_id, product_id_2, r1, r2)
-            else:
-                retrieved_data = "Could not identify two entities to compare."
-        elif intent == "customer_query" and customer_id:
-            retrieved_data = get_customer_transactions(customer_id)
-        elif intent == "product_query" and product_id:
-            rows = Transaction.query.filter_by(product_id=product_id).all()
-            retrieved_data = get_product_info(product_id, rows)
-            chart_data = build_product_charts(product_id, rows)
-        elif intent == "business_metric":
-            rows = Transaction.query.all()
-            retrieved_data = get_business_metrics(rows)
-            metric_type = classification.get("metric_type", "revenue")
+
+def _classify(user_message, timeout):
+    """Step 1: Classify intent and extract entities."""
+    return _normalize_classification(classify_query(user_message, timeout=timeout))
+
+
+def _normalize_classification(classification):
+    classification.setdefault("intent", "general")
+
+    # Normalize IDs to uppercase for case-insensitive matching
+    for key in ("customer_id", "customer_id_2", "product_id", "product_id_2"):
+        if classification.get(key):
+            classification[key] = classification[key].upper()
+
+    logger.info(
+        f"Intent: {classification['intent']}, customer_id: {classification.get('customer_id')}, "
+        f"product_id: {classification.get('product_id')}"
+    )
+    return classification
+
+
+def _retrieve(classification):
+    """Step 2: Load the formatted data and charts for the classified question.
+
+    Text, charts and the summaries they are built from come from the result
+    cache while the dataset version is unchanged, so each is computed once. Returns (retrieved_data, chart_data, summary); ``summary`` is
+    the product's TransactionSummary, the business-metrics one when a
+    templated answer or an approximate figure needs it, else None.
+    """
+    intent = classification["intent"]
+    customer_id = classification.get("customer_id")
+    customer_id_2 = classification.get("customer_id_2")
+    product_id = classification.get("product_id")
+    product_id_2 = classification.get("product_id_2")
+    chart_data = None
+    summary = None
+
+    if intent == "comparison":
+        if customer_id and customer_id_2:
+            retrieved_data = compare_customers(customer_id, customer_id_2)
+            chart_data = comparison_charts("customer", customer_id, customer_id_2)
+        elif product_id and product_id_2:
+            retrieved_data = compare_products(product_id, product_id_2)
+            chart_data = comparison_charts("product", product_id, product_id_2)
+        else:
+            retrieved_data = "Could not identify two entities to compare."
+    elif intent == "customer_query" and customer_id:
+        retrieved_data = get_customer_transactions(customer_id)
+    elif intent == "product_query" and product_id:
+        # Cached; the text and charts below reuse it
+        summary = product_summary(product_id)
+        retrieved_data = get_product_info(product_id)
+        chart_data = product_charts(product_id)
+    elif intent == "store_query":
+        membership = store_membership(
+            [p for p in (product_id, product_id_2) if p],
+            [c for c in (classification.get("category"), classification.get("category_2")) if c],
+            match_all=classification.get("match") != "any",
+        )
+        retrieved_data = get_store_membership(membership)
+        chart_data = build_store_charts(membership)
+    elif intent == "business_metric" and classification.get("metric_type") == "trend":
+        granularity = classification.get("granularity")
+        granularity = granularity if granularity in GRANULARITIES else "month"
+        filters = {
+            column: classification.get(field)
+            for column, field in (("product_category", "category"), ("payment_method", "payment_method"))
+            if classification.get(field)
+        }
+        retrieved_data = get_revenue_trend(granularity, **filters)
+        chart_data = trend_charts(granularity, **filters)
+    elif intent == "business_metric":
+        approximate = bool(classification.get("approximate")) or (
+            current_app.config["METRICS_MODE"] == "approximate"
+        )
+        metric_type = classification.get("metric_type", "revenue")
+        if approximate:
+            # Each sample differs, so approximate answers are not cached
+            summary = summarize_business_metrics(approximate=True)
+            retrieved_data = get_business_metrics(summary)
             if metric_type == "revenue":
-                chart_data = build_business_charts(rows)
+                chart_data = build_business_charts(summary)
         else:
-            retrieved_data = "No specific data retrieval needed for this query."
+            retrieved_data = get_business_metrics()
+            if metric_type == "revenue":
+                chart_data = business_charts()
+            if template_key(classification) in current_app.config["TEMPLATED_ANSWERS"]:
+                summary = summarize_business_metrics()
+    else:
+        retrieved_data = "No specific data retrieval needed for this query."
 
-        # Step 3: Generate natural language response
-        response_text = generate_response(user_message, retrieved_data)
+    return retrieved_data, chart_data, summary
 
-        result = {
-            "response": response_text,
-            "source_data": retrieved_data,
-            "intent": intent,
-        }
-        if chart_data:
-            result["chart_data"] = chart_data
 
+def _classify_and_retrieve(user_message, deadline):
+    """Steps 1 and 2, with the likely retrieval started during classification.
+
+    Returns (classification, retrieval) where ``retrieval`` is the
+    _retrieve() tuple, or None for off-topic questions.
+    """
+    speculation = speculate(user_message, _retrieve)
+    try:
+        with deadline.stage("classify") as stage:
+            classification = _classify(user_message, stage.timeout)
+    except BaseException:
+        if speculation is not None:
+            speculation.discard()
+        raise
+
+    if classification["intent"] == "off_topic":
+        if speculation is not None:
+            speculation.discard()
+        return classification, None
+
+    with deadline.stage("retrieve"):
+        retrieval = speculation.claim(classification) if speculation is not None else None
+        if retrieval is None:
+            retrieval = _retrieve(classification)
+    return classification, retrieval
+
+
+def _compact(retrieved_data):
+    """Fit the retrieved data to the prompt token budget.
+
+    Returns (prompt_data, {"before": n, "after": n}).
+    """
+    prompt_data, before, after = compact_payload(
+        retrieved_data, current_app.config["DATA_TOKEN_BUDGET"]
+    )
+    metrics.incr("compaction.tokens_before", before)
+    metrics.incr("compaction.tokens_after", after)
+    logger.info(f"[DATA] payload: {before} -> {after} tokens")
+    return prompt_data, {"before": before, "after": after}
+
+
+def _templated(user_message, classification, summary):
+    """Render a deterministic answer from ``summary`` if one is enabled, else None."""
+    enabled = current_app.config["TEMPLATED_ANSWERS"]
+    if not enabled:
+        return None
+    text = render_answer(user_message, classification, summary, enabled)
+    metrics.incr("templates.rendered" if text is not None else "templates.fallbacks")
+    return text
+
+
+def _degraded(retrieved_data, summary):
+    """Answer for when the generation budget ran out: the data, summarized."""
+    metrics.incr("deadline.degraded")
+    logger.warning("Generation budget exhausted; returning data-only summary")
+    return fallback_summary(retrieved_data, summary)
+
+
+def _prepare(user_message, classification, retrieval):
+    """Step 3 up to the LLM call: compact the data and try a templated answer.
+
+    Returns (result, prompt_data). ``result`` is the JSON body; its
+    "response" is None while the LLM still has to answer from
+    ``prompt_data`` (see _finish). Shared with app.asgi, which makes the
+    LLM call itself.
+    """
+    retrieved_data, chart_data, summary = retrieval
+    prompt_data, data_tokens = _compact(retrieved_data)
+    response_text = _templated(user_message, classification, summary)
+
+    result = {
+        "response": response_text,
+        "source_data": retrieved_data,
+        "intent": classification["intent"],
+        "data_tokens": data_tokens,
+        "answered_by": "template" if response_text is not None else "llm",
+    }
+    if chart_data:
+        result["chart_data"] = chart_data
+    return result, prompt_data
+
+
+def _finish(result, retrieval, text):
+    """Fill in the LLM's answer, or the data-only summary if ``text`` is None (deadline passed)."""
+    if text is None:
+        result["response"] = _degraded(retrieval[0], retrieval[2])
+        result["answered_by"] = "fallback"
+    else:
+        result["response"] = text
+    return result
+
+
+def _meta_event(result):
+    """The SSE "meta" event announcing a prepared answer."""
+    return _sse("meta", {
+        "intent": result["intent"],
+        "source_data": result["source_data"],
+        "chart_data": result.get("chart_data"),
+        "data_tokens": result["data_tokens"],
+        "answered_by": result["answered_by"],
+    })
+
+
+def _respond(user_message, classification, retrieval, deadline):
+    """Step 3 and the JSON body for a classified, retrieved question."""
+    result, prompt_data = _prepare(user_message, classification, retrieval)
+    if result["response"] is not None:
+        return result
+
+    with deadline.stage("generate") as stage:
+        try:
+            text = generate_response(user_message, prompt_data, deadline=stage.expires)
+        except DeadlineExceeded:
+            text = None
+    return _finish(result, retrieval, text)
+
+
+def _answer(user_message):
+    """Run the full pipeline for one question and return the JSON body."""
+    deadline = Deadline.from_config()
+    classification, retrieval = _classify_and_retrieve(user_message, deadline)
+
+    # Handle off-topic questions
+    if classification["intent"] == "off_topic":
+        return {"response": OFF_TOPIC_RESPONSE, "intent": "off_topic"}
+
+    return _respond(user_message, classification, retrieval, deadline)
+
+
+def _coalesce_key(user_message):
+    """Key identical questions against the same data to one in-flight execution."""
+    text = normalize_text(user_message)
+    digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+    return f"chat:{current_dataset_version()}:{digest}"
+
+
+@chat_bp.route("/chat", methods=["POST"])
+def chat():
+    user_message, error = _validate_message(request.get_json())
+    if error:
+        return jsonify({"response": error})
+
+    try:
+        # Identical concurrent questions share one classification/retrieval/generation
+        result, shared = get_singleflight().do(
+            _coalesce_key(user_message), lambda: _answer(user_message)
+        )
+        if shared:
+            logger.info("Served coalesced chat result")
         return jsonify(result)
 
     except Exception as e:
         logger.error(f"Chat error: {e}", exc_info=True)
-        return jsonify({
-            "response": "Sorry, something went wrong processing your question. Please try again."
-        }), 500
+        return jsonify({"response": ERROR_RESPONSE}), 500
+
+
+def _ms(started):
+    return round((time.monotonic() - started) * 1000, 1)
+
+
+def _batch_group(classification):
+    """Questions with the same group share one retrieval."""
+    key = retrieval_key(classification)
+    if classification["intent"] == "business_metric":
+        key += (
+            classification.get("metric_type", "revenue"),
+            classification.get("granularity"),
+            classification.get("category"),
+            classification.get("payment_method"),
+            bool(classification.get("approximate")),
+        )
+    return key
+
+
+def _answer_batch(messages):
+    """Answer many questions, loading each entity once.
+
+    Classification runs on ``BATCH_CONCURRENCY`` threads, questions are
+    grouped by what they retrieve, each group is retrieved once, and
+    generation runs on ``BATCH_GENERATE_CONCURRENCY`` threads. Results keep
+    the order of ``messages``.
+    """
+    app = current_app._get_current_object()
+    started = time.monotonic()
+    results = [None] * len(messages)
+    items = []
+    for i, message in enumerate(messages):
+        user_message, error = _validate_message({"message": message} if isinstance(message, str) else None)
+        if error:
+            results[i] = {"response": error, "error": True}
+        else:
+            items.append({"index": i, "message": user_message, "timings": {}})
+
+    def in_context(fn):
+        def run(arg):
+            with app.app_context():
+                return fn(arg)
+        return run
+
+    def classify(item):
+        t = time.monotonic()
+        try:
+            item["classification"] = _classify(item["message"], app.config["CHAT_CLASSIFY_BUDGET"])
+        except Exception as e:
+            logger.error(f"Batch classify error: {e}", exc_info=True)
+        item["timings"]["classify_ms"] = _ms(t)
+
+    def retrieve(group):
+        t = time.monotonic()
+        try:
+            retrieval = _retrieve(group[0]["classification"])
+        except Exception as e:
+            logger.error(f"Batch retrieval error: {e}", exc_info=True)
+            retrieval = None
+        for item in group:
+            item["retrieval"] = retrieval
+            item["timings"]["retrieve_ms"] = _ms(t)
+
+    def respond(item):
+        t = time.monotonic()
+        try:
+            result = _respond(item["message"], item["classification"], item["retrieval"],
+                              Deadline.from_config())
+        except Exception as e:
+            logger.error(f"Batch generation error: {e}", exc_info=True)
+            result = {"response": ERROR_RESPONSE, "error": True}
+        item["timings"]["generate_ms"] = _ms(t)
+        return result
+
+    with ThreadPoolExecutor(app.config["BATCH_CONCURRENCY"], thread_name_prefix="batch") as pool:
+        list(pool.map(in_context(classify), items))
+        classified_ms = _ms(started)
+
+        groups = {}
+        for item in items:
+            classification = item.get("classification")
+            if classification is None:
+                results[item["index"]] = {"response": ERROR_RESPONSE, "error": True}
+            elif classification["intent"] == "off_topic":
+                results[item["index"]] = {"response": OFF_TOPIC_RESPONSE, "intent": "off_topic"}
+            else:
+                groups.setdefault(_batch_group(classification), []).append(item)
+        list(pool.map(in_context(retrieve), groups.values()))
+        retrieved_ms = _ms(started)
+
+    pending = []
+    retrieved_groups = 0
+    for group in groups.values():
+        if group[0]["retrieval"] is None:
+            for item in group:
+                results[item["index"]] = {"response": ERROR_RESPONSE, "error": True}
+        else:
+            retrieved_groups += 1
+            pending.extend(group)
+    with ThreadPoolExecutor(app.config["BATCH_GENERATE_CONCURRENCY"], thread_name_prefix="batch-gen") as pool:
+        for item, result in zip(pending, pool.map(in_context(respond), pending)):
+            results[item["index"]] = result
+
+    for item in items:
+        if results[item["index"]] is not None:
+            results[item["index"]]["timings"] = item["timings"]
+
+    metrics.incr("batch.requests")
+    metrics.incr("batch.items", len(messages))
+    # Questions answered from another question's retrieval
+    metrics.incr("batch.retrievals_saved", len(pending) - retrieved_groups)
+    return {
+        "results": results,
+        "groups": len(groups),
+        "timings": {
+            "classify_ms": classified_ms,
+            "retrieve_ms": round(retrieved_ms - classified_ms, 1),
+            "total_ms": _ms(started),
+        },
+    }
+
+
+@chat_bp.route("/chat/batch", methods=["POST"])
+def chat_batch():
+    """Answer a list of questions: ``{"messages": [...]}`` -> ``{"results": [...]}``."""
+    messages = (request.get_json(silent=True) or {}).get("messages")
+    if not isinstance(messages, list) or not messages:
+        return jsonify({"error": "Expected a non-empty list of messages."}), 400
+    limit = current_app.config["BATCH_MAX_MESSAGES"]
+    if len(messages) > limit:
+        return jsonify({"error": f"A batch may contain at most {limit} messages."}), 400
+
+    try:
+        return jsonify(_answer_batch(messages))
+    except Exception as e:
+        logger.error(f"Batch chat error: {e}", exc_info=True)
+        return jsonify({"error": ERROR_RESPONSE}), 500
+
+
+def _sse(event, payload):
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+@chat_bp.route("/chat/stream", methods=["POST"])
+def chat_stream():
+    """Streaming variant of /chat using Server-Sent Events.
+
+    Emits a ``meta`` event (intent, source_data, chart_data) as soon as
+    retrieval finishes, then one ``token`` event per generated text delta,
+    then ``done``. Failures are reported as an ``error`` event.
+    """
+    user_message, error = _validate_message(request.get_json())
+
+    def events():
+        if error:
+            yield _sse("meta", {"intent": None})
+            yield _sse("token", {"text": error})
+            yield _sse("done", {})
+            return
+
+        try:
+            deadline = Deadline.from_config()
+            classification, retrieval = _classify_and_retrieve(user_message, deadline)
+            intent = classification["intent"]
+
+            if intent == "off_topic":
+                yield _sse("meta", {"intent": "off_topic"})
+                yield _sse("token", {"text": OFF_TOPIC_RESPONSE})
+                yield _sse("done", {})
+                return
+
+            result, prompt_data = _prepare(user_message, classification, retrieval)
+            yield _meta_event(result)
+
+            if result["response"] is not None:
+                yield _sse("token", {"text": result["response"]})
+            else:
+                with deadline.stage("generate") as stage:
+                    try:
+                        for text in stream_response(user_message, prompt_data, deadline=stage.expires):
+                            yield _sse("token", {"text": text})
+                    except DeadlineExceeded:
+                        yield _sse("token", {"text": _degraded(retrieval[0], retrieval[2])})
+            yield _sse("done", {})
+
+        except Exception as e:
+            logger.error(f"Chat stream error: {e}", exc_info=True)
+            yield _sse("error", {"response": ERROR_RESPONSE})
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
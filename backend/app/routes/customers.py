@@ -1,28 +1,70 @@
-from flask import Blueprint, jsonify
-from app.models import Transaction
+from datetime import date
+
+from flask import Blueprint, current_app, jsonify, request
+from app.services.data_service import customer_history, customer_history_summary, decode_cursor
+from app.services.http_cache import conditional
+from app.services.result_cache import cached_result
 
 customers_bp = Blueprint("customers", __name__)
 
 
-@customers_bp.route("/customers/<customer_id>")
-def get_customer(customer_id):
-    """Get all transactions for a specific customer."""
-    rows = (
-        Transaction.query
-        .filter_by(customer_id=customer_id)
-        .order_by(Transaction.transaction_date.desc())
-        .limit(50)
-        .all()
-    )
+def _parse_date(value):
+    return date.fromisoformat(value) if value else None
 
-    if not rows:
-        return jsonify({"error": f"No transactions found for customer {customer_id}"}), 404
 
-    total_spend = sum(r.total_amount for r in rows)
+@cached_result("api.customer")
+def _customer_payload(customer_id, limit, cursor=None, start=None, end=None):
+    start, end = _parse_date(start), _parse_date(end)
+    summary = customer_history_summary(customer_id, start, end)
+    if not summary:
+        return None
+
+    rows, next_cursor = customer_history(customer_id, limit, cursor, start, end)
 
-    return jsonify({
+    return {
         "customer_id": customer_id,
-        "transaction_count": len(rows),
-        "total_spend": round(total_spend, 2),
+        "transaction_count": summary.count,
+        "total_spend": round(summary.total_revenue, 2),
+        "avg_transaction": round(summary.avg_transaction, 2),
+        "spend_by_category": {k: round(v, 2) for k, v in sorted(summary.revenue_by_category.items())},
+        "payment_methods": dict(sorted(summary.count_by_payment.items())),
         "transactions": [r.to_dict() for r in rows],
-    })
+        "next_cursor": next_cursor,
+    }
+
+
+@customers_bp.route("/customers/<customer_id>")
+@conditional
+def get_customer(customer_id):
+    """Get a customer's totals and one page of their transactions, newest first.
+
+    Query parameters: ``limit`` (page size), ``cursor`` (the previous page's
+    ``next_cursor``), and ``start``/``end`` (YYYY-MM-DD, inclusive), which
+    also restrict the totals.
+    """
+    args = request.args
+    try:
+        limit = args.get("limit")
+        if limit is None:
+            limit = current_app.config["CUSTOMER_PAGE_SIZE"]
+        elif not limit.isdigit():
+            raise ValueError(f"limit must be an integer, got {limit!r}")
+        limit = int(limit)
+        if not 1 <= limit <= current_app.config["CUSTOMER_PAGE_MAX"]:
+            raise ValueError(f"limit must be between 1 and {current_app.config['CUSTOMER_PAGE_MAX']}")
+        cursor = args.get("cursor") or None
+        if cursor is not None:
+            decode_cursor(cursor)
+        start, end = _parse_date(args.get("start")), _parse_date(args.get("end"))
+        if start and end and start > end:
+            raise ValueError(f"start {start} is after end {end}")
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    payload = _customer_payload(
+        customer_id, limit, cursor,
+        start.isoformat() if start else None, end.isoformat() if end else None,
+    )
+    if payload is None:
+        return jsonify({"error": f"No transactions found for customer {customer_id}"}), 404
+    return jsonify(payload)
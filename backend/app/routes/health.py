@@ -1,4 +1,6 @@
 from flask import Blueprint, jsonify
+from app.services import metrics
+from app.services.cache import cache_stats
 
 health_bp = Blueprint("health", __name__)
 
@@ -6,3 +8,14 @@ health_bp = Blueprint("health", __name__)
 @health_bp.route("/api/health")
 def health_check():
     return jsonify({"status": "ok"})
+
+
+@health_bp.route("/api/metrics")
+def metrics_view():
+    return jsonify({
+        "counters": metrics.snapshot(),
+        "classifier": {
+            "rule_hit_rate": metrics.ratio("classifier.rule_hits", "classifier.llm_fallbacks"),
+        },
+        "caches": cache_stats(),
+    })
@@ -0,0 +1,273 @@
+"""Shared per-request aggregation over a set of transactions.
+
+A TransactionSummary holds every sum, count, distinct set and group-by that the
+text formatters in data_service and the chart builders in chart_service need,
+so one request aggregates its rows once no matter how many consumers render it.
+"""
+
+from sqlalchemy import distinct, func
+from app.extensions import db
+from app.models import CustomerProfile, Transaction, TransactionRollup
+from app.services.sketch import HyperLogLog
+
+# Leading values kept for the "= a + b + ..." calculation breakdowns
+SAMPLE_SIZE = 8
+# Sorted store locations kept for listings
+STORE_SAMPLE_SIZE = 20
+
+
+class TransactionSummary:
+    """Aggregates for one slice of the transactions table."""
+
+    def __init__(self):
+        self.count = 0
+        self.total_quantity = 0
+        self.total_revenue = 0.0
+        self.sum_price = 0.0
+        self.sum_discount = 0.0
+        self.unique_customers = 0
+        self.unique_products = 0
+        self.revenue_by_category = {}
+        self.count_by_category = {}
+        self.revenue_by_payment = {}
+        self.count_by_payment = {}
+        self.store_count = None
+        self.stores = []
+        self.sample_quantities = []
+        self.sample_amounts = []
+
+    def __bool__(self):
+        return self.count > 0
+
+    @property
+    def categories(self):
+        return sorted(self.revenue_by_category)
+
+    @property
+    def avg_price(self):
+        return self.sum_price / self.count
+
+    @property
+    def avg_discount(self):
+        return self.sum_discount / self.count
+
+    @property
+    def avg_transaction(self):
+        return self.total_revenue / self.count
+
+    def to_dict(self) -> dict:
+        """JSON-serializable fields, for the result cache."""
+        return dict(vars(self))
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a summary from to_dict(), copying containers so cached entries stay intact."""
+        s = cls()
+        for key, value in data.items():
+            setattr(s, key, type(value)(value) if isinstance(value, (dict, list)) else value)
+        return s
+
+    @classmethod
+    def from_rows(cls, rows, with_stores=True):
+        """Aggregate pre-loaded Transaction rows in a single pass."""
+        s = cls()
+        customers, products, stores = set(), set(), set()
+        for r in rows:
+            s.count += 1
+            s.total_quantity += r.quantity
+            s.total_revenue += r.total_amount
+            s.sum_price += r.price
+            s.sum_discount += r.discount_applied
+            customers.add(r.customer_id)
+            products.add(r.product_id)
+            if with_stores:
+                stores.add(r.store_location)
+            cat, pm = r.product_category, r.payment_method
+            s.revenue_by_category[cat] = s.revenue_by_category.get(cat, 0) + r.total_amount
+            s.count_by_category[cat] = s.count_by_category.get(cat, 0) + 1
+            s.revenue_by_payment[pm] = s.revenue_by_payment.get(pm, 0) + r.total_amount
+            s.count_by_payment[pm] = s.count_by_payment.get(pm, 0) + 1
+            if s.count <= SAMPLE_SIZE:
+                s.sample_quantities.append(r.quantity)
+                s.sample_amounts.append(r.total_amount)
+
+        s.unique_customers = len(customers)
+        s.unique_products = len(products)
+        if with_stores:
+            s.store_count = len(stores)
+            s.stores = sorted(stores)[:STORE_SAMPLE_SIZE]
+        return s
+
+    @classmethod
+    def from_query(cls, *criteria, with_stores=True):
+        """Aggregate the rows matching ``criteria`` in SQL, without loading them."""
+        s = cls()
+
+        (s.count, total_qty, total_rev, sum_price, sum_disc,
+         s.unique_customers, s.unique_products) = (
+            db.session.query(
+                func.count(Transaction.id),
+                func.sum(Transaction.quantity),
+                func.sum(Transaction.total_amount),
+                func.sum(Transaction.price),
+                func.sum(Transaction.discount_applied),
+                func.count(distinct(Transaction.customer_id)),
+                func.count(distinct(Transaction.product_id)),
+            )
+            .filter(*criteria)
+            .one()
+        )
+        if not s.count:
+            return s
+
+        s.total_quantity = total_qty
+        s.total_revenue = total_rev
+        s.sum_price = sum_price
+        s.sum_discount = sum_disc
+
+        for cat, rev, cnt in (
+            db.session.query(
+                Transaction.product_category,
+                func.sum(Transaction.total_amount),
+                func.count(Transaction.id),
+            )
+            .filter(*criteria)
+            .group_by(Transaction.product_category)
+        ):
+            s.revenue_by_category[cat] = rev
+            s.count_by_category[cat] = cnt
+
+        for pm, rev, cnt in (
+            db.session.query(
+                Transaction.payment_method,
+                func.sum(Transaction.total_amount),
+                func.count(Transaction.id),
+            )
+            .filter(*criteria)
+            .group_by(Transaction.payment_method)
+        ):
+            s.revenue_by_payment[pm] = rev
+            s.count_by_payment[pm] = cnt
+
+        if with_stores:
+            s.store_count = (
+                db.session.query(func.count(distinct(Transaction.store_location)))
+                .filter(*criteria)
+                .scalar()
+            )
+            s.stores = [
+                loc for (loc,) in
+                db.session.query(Transaction.store_location)
+                .filter(*criteria)
+                .distinct()
+                .order_by(Transaction.store_location)
+                .limit(STORE_SAMPLE_SIZE)
+            ]
+
+        for qty, amount in (
+            db.session.query(Transaction.quantity, Transaction.total_amount)
+            .filter(*criteria)
+            .order_by(Transaction.id)
+            .limit(SAMPLE_SIZE)
+        ):
+            s.sample_quantities.append(qty)
+            s.sample_amounts.append(amount)
+
+        return s
+
+
+    @classmethod
+    def from_rollups(cls, **filters):
+        """Aggregate from the rollup cube (see app.services.rollups).
+
+        ``filters`` may restrict product_category, payment_method or
+        product_id. Stores and samples are not in the cube and stay empty;
+        distinct customers come from the customer profiles when unfiltered,
+        otherwise from the transactions table.
+        """
+        R = TransactionRollup
+        criteria = [getattr(R, col) == val for col, val in filters.items()]
+        s = cls()
+
+        for cat, pm, cnt, qty, rev, price, disc in (
+            db.session.query(
+                R.product_category, R.payment_method,
+                func.sum(R.tx_count), func.sum(R.total_quantity), func.sum(R.revenue),
+                func.sum(R.sum_price), func.sum(R.sum_discount),
+            )
+            .filter(*criteria)
+            .group_by(R.product_category, R.payment_method)
+        ):
+            s.count += cnt
+            s.total_quantity += qty
+            s.total_revenue += rev
+            s.sum_price += price
+            s.sum_discount += disc
+            s.revenue_by_category[cat] = s.revenue_by_category.get(cat, 0) + rev
+            s.count_by_category[cat] = s.count_by_category.get(cat, 0) + cnt
+            s.revenue_by_payment[pm] = s.revenue_by_payment.get(pm, 0) + rev
+            s.count_by_payment[pm] = s.count_by_payment.get(pm, 0) + cnt
+        if not s.count:
+            return s
+
+        s.unique_products = (
+            db.session.query(func.count(distinct(R.product_id))).filter(*criteria).scalar()
+        )
+        if not filters:
+            # One profile per customer, once app.services.profiles has built them
+            s.unique_customers = db.session.query(func.count(CustomerProfile.customer_id)).scalar()
+        if not s.unique_customers:
+            tx_criteria = [getattr(Transaction, col) == val for col, val in filters.items()]
+            s.unique_customers = (
+                db.session.query(func.count(distinct(Transaction.customer_id))).filter(*tx_criteria).scalar()
+            )
+        return s
+
+    @classmethod
+    def from_product_summary(cls, row):
+        """Summary of one product from its ProductSummary.
+
+        Distinct customers are a HyperLogLog estimate; stores are not kept
+        (data_service.product_summary fills them from the store index).
+        """
+        s = cls()
+        s.count = row.tx_count
+        s.total_quantity = row.total_quantity
+        s.total_revenue = row.revenue
+        s.sum_price = row.sum_price
+        s.sum_discount = row.sum_discount
+        s.unique_customers = HyperLogLog.from_bytes(row.customer_sketch).count()
+        s.unique_products = 1
+        s.revenue_by_category = dict(row.revenue_by_category)
+        s.count_by_category = dict(row.count_by_category)
+        s.revenue_by_payment = dict(row.revenue_by_payment)
+        s.count_by_payment = dict(row.count_by_payment)
+        s.sample_quantities = list(row.sample_quantities)
+        s.sample_amounts = list(row.sample_amounts)
+        return s
+
+    @classmethod
+    def from_profile(cls, profile):
+        """Summary of one customer from their CustomerProfile (stores are not kept)."""
+        s = cls()
+        s.count = profile.tx_count
+        s.total_quantity = profile.total_quantity
+        s.total_revenue = profile.total_spend
+        s.sum_price = profile.sum_price
+        s.sum_discount = profile.sum_discount
+        s.unique_customers = 1
+        s.unique_products = profile.product_count
+        s.revenue_by_category = dict(profile.spend_by_category)
+        s.count_by_category = dict(profile.count_by_category)
+        s.revenue_by_payment = dict(profile.spend_by_payment)
+        s.count_by_payment = dict(profile.count_by_payment)
+        s.sample_quantities = list(profile.sample_quantities)
+        s.sample_amounts = list(profile.sample_amounts)
+        return s
+
+
+def summarize(rows, with_stores=True):
+    """Return a TransactionSummary for pre-loaded rows (summaries pass through)."""
+    if isinstance(rows, TransactionSummary):
+        return rows
+    return TransactionSummary.from_rows(rows, with_stores=with_stores)
@@ -0,0 +1,178 @@
+"""Deterministic natural-language answers rendered straight from aggregates.
+
+Well-understood metric questions ("How many unique customers are there?",
+"Total revenue by category") are answered from the TransactionSummary that
+retrieval already computed, skipping GPT-4o entirely. Templates are keyed on
+(intent, metric_type) and enabled per key with ``TEMPLATED_ANSWERS``. A
+template returns None whenever the question asks for something it does not
+cover, and the caller falls back to the LLM.
+"""
+
+import re
+
+from app.services.approximate import ApproximateSummary
+from app.services.data_service import _fmt
+
+# Questions with these words need reasoning or data the templates don't have
+UNSUPPORTED_RE = re.compile(
+    r"\b(why|trend\w*|month\w*|year\w*|week\w*|daily|growth|grow\w*|forecast\w*|predict\w*|"
+    r"over time|season\w*|last|recent\w*|compare\w*|correlat\w*|recommend\w*|should|"
+    r"store\w*|location\w*|discount\w*|per customer|each customer|quantity|units?)\b",
+    re.I,
+)
+
+# Questions narrowed to a category, payment method, product, customer or
+# period; the templates only hold dataset-wide totals
+FILTER_RE = re.compile(
+    r"\b(books|electronics|clothing|home decor|paypal|cash|credit\s*cards?|debit\s*cards?|"
+    r"products?\s+(?:id\s*)?[a-z0-9]|customers?\s*(?:id\s*)?#?\s*\d+|\d{4,}|"
+    r"january|february|march|april|may|june|july|august|september|october|november|december|"
+    r"jan|feb|mar|apr|jun|jul|aug|sept?|oct|nov|dec|q[1-4]|quarters?|today|yesterday|"
+    r"since|before|after|between|during)\b",
+    re.I,
+)
+
+COUNT_SUBJECTS = (
+    ("customers", re.compile(r"\bcustomers?\b", re.I)),
+    ("products", re.compile(r"\bproducts?\b", re.I)),
+    ("transactions", re.compile(r"\b(transactions?|purchases?|orders?|sales)\b", re.I)),
+    ("categories", re.compile(r"\bcategor(y|ies)\b", re.I)),
+    ("payment_methods", re.compile(r"\bpayment methods?\b", re.I)),
+)
+
+BY_CATEGORY_RE = re.compile(r"\bcategor(y|ies)\b", re.I)
+BY_PAYMENT_RE = re.compile(r"\bpayment\b", re.I)
+AVERAGE_RE = re.compile(r"\b(average|avg|mean|per transaction)\b", re.I)
+# Plain-total templates do not answer rankings or breakdowns
+BREAKDOWN_RE = re.compile(r"\b(which|who|per(?! transaction)|by|each|top|most|least|highest|lowest)\b", re.I)
+TOP_RE = re.compile(r"\b(top|highest|most|best|largest|biggest)\b", re.I)
+BOTTOM_RE = re.compile(r"\b(lowest|least|worst|smallest)\b", re.I)
+
+
+def _plural(n, word):
+    return f"{n:,} {word}" if n == 1 else f"{n:,} {word}s"
+
+
+def _count_answer(question, s):
+    if BREAKDOWN_RE.search(question):
+        return None
+    asked = [name for name, pattern in COUNT_SUBJECTS if pattern.search(question)]
+    if not asked:
+        return None
+
+    values = {
+        "customers": (s.unique_customers, "unique customers"),
+        "products": (s.unique_products, "unique products"),
+        "transactions": (s.count, "transactions"),
+        "categories": (len(s.revenue_by_category), "product categories"),
+        "payment_methods": (len(s.revenue_by_payment), "payment methods"),
+    }
+    if len(asked) == 1:
+        value, label = values[asked[0]]
+        return f"There are **{value:,}** {label} in the dataset."
+
+    lines = ["Here are the counts from the dataset:", ""]
+    for name in asked:
+        value, label = values[name]
+        lines.append(f"- **{label.capitalize()}:** {value:,}")
+    return "\n".join(lines)
+
+
+def _ranked(breakdown, question):
+    """Return the single top/bottom entry if the question asks for one."""
+    ordered = sorted(breakdown.items(), key=lambda x: -x[1])
+    if TOP_RE.search(question):
+        return ordered[0]
+    if BOTTOM_RE.search(question):
+        return ordered[-1]
+    return None
+
+
+def _revenue_answer(question, s):
+    by_category = bool(BY_CATEGORY_RE.search(question))
+    by_payment = bool(BY_PAYMENT_RE.search(question))
+    if by_category and by_payment:
+        return None
+
+    for enabled, breakdown, label in (
+        (by_category, s.revenue_by_category, "category"),
+        (by_payment, s.revenue_by_payment, "payment method"),
+    ):
+        if not enabled:
+            continue
+        ranked = _ranked(breakdown, question)
+        if ranked is not None:
+            name, rev = ranked
+            share = rev / s.total_revenue * 100 if s.total_revenue else 0
+            return (
+                f"**{name}** is the {'top' if TOP_RE.search(question) else 'lowest'} {label} "
+                f"by revenue with **{_fmt(rev)}** ({share:.1f}% of the {_fmt(s.total_revenue)} total)."
+            )
+
+        lines = [f"Total revenue is **{_fmt(s.total_revenue)}** across {_plural(s.count, 'transaction')}.", ""]
+        lines.append(f"**Revenue by {label}:**")
+        for name, rev in sorted(breakdown.items(), key=lambda x: -x[1]):
+            if label == "category":
+                cnt = s.count_by_category[name]
+                lines.append(f"- {name}: {_fmt(rev)} ({_plural(cnt, 'transaction')}, avg {_fmt(rev / cnt)})")
+            else:
+                lines.append(f"- {name}: {_fmt(rev)}")
+        return "\n".join(lines)
+
+    # Rankings or breakdowns by anything else (product, customer, ...)
+    if BREAKDOWN_RE.search(question):
+        return None
+    if AVERAGE_RE.search(question):
+        return (
+            f"The average transaction value is **{_fmt(s.avg_transaction)}** "
+            f"({_fmt(s.total_revenue)} total revenue / {_plural(s.count, 'transaction')})."
+        )
+    return f"Total revenue is **{_fmt(s.total_revenue)}** across {_plural(s.count, 'transaction')}."
+
+
+TEMPLATES = {
+    "business_metric:count": _count_answer,
+    "business_metric:revenue": _revenue_answer,
+}
+
+
+def template_key(classification: dict) -> str:
+    return f"{classification.get('intent')}:{classification.get('metric_type')}"
+
+
+def render_answer(question: str, classification: dict, summary, enabled) -> str:
+    """Render a templated answer, or return None to fall back to the LLM.
+
+    ``enabled`` is the collection of template keys switched on in config.
+    """
+    key = template_key(classification)
+    template = TEMPLATES.get(key)
+    if template is None or key not in enabled or not summary:
+        return None
+    # Estimates need their error bounds, which the templates don't state
+    if isinstance(summary, ApproximateSummary):
+        return None
+    if UNSUPPORTED_RE.search(question) or FILTER_RE.search(question):
+        return None
+    return template(question, summary)
+
+
+DEGRADED_PREFIX = "The full answer is taking too long, so here is a quick summary of the data:\n\n"
+
+
+def fallback_summary(retrieved_data: str, summary=None) -> str:
+    """Short data-only summary used when the LLM answer isn't ready in time."""
+    if summary and not isinstance(summary, ApproximateSummary):
+        lines = [
+            f"- {_plural(summary.count, 'transaction')} totalling **{_fmt(summary.total_revenue)}** "
+            f"(avg {_fmt(summary.avg_transaction)})",
+        ]
+        if summary.revenue_by_category:
+            name, rev = max(summary.revenue_by_category.items(), key=lambda x: x[1])
+            lines.append(f"- Top category: {name} ({_fmt(rev)})")
+        return DEGRADED_PREFIX + "\n".join(lines)
+
+    # Headline plus any total lines of the formatted data
+    lines = [line.strip() for line in retrieved_data.split("\n") if line.strip()]
+    keep = lines[:1] + [line for line in lines[1:] if line.startswith("Total")]
+    return DEGRADED_PREFIX + "\n".join(keep)
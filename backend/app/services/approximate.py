@@ -0,0 +1,128 @@
+"""Approximate business metrics for exploratory questions.
+
+Opt-in (``METRICS_MODE=approximate`` or "roughly"/"approximately" in the
+question): instead of aggregating every transaction, sums and averages are
+estimated from a uniform random sample of transaction ids, looked up through
+the primary key so the cost depends on the sample size, not the table size.
+Distinct customers come from merging the per-product HyperLogLog sketches
+(app.services.product_summaries). Every estimate carries a 95% margin that
+the business-metrics text reports.
+"""
+
+import math
+import random
+
+from sqlalchemy import distinct, func
+
+from app.extensions import db
+from app.models import ProductSummary, Transaction
+from app.services.aggregates import TransactionSummary
+from app.services.sketch import HyperLogLog
+
+DEFAULT_SAMPLE_SIZE = 2000
+# ids per IN (...) list when fetching the sample
+FETCH_BATCH_SIZE = 1000
+Z_95 = 1.96
+
+
+class ApproximateSummary(TransactionSummary):
+    """TransactionSummary whose figures are estimates with 95% margins."""
+
+    def __init__(self):
+        super().__init__()
+        self.sample_size = 0
+        self.count_margin = 0
+        self.revenue_margin = 0.0
+        self.avg_transaction_margin = 0.0
+        self.avg_price_margin = 0.0
+        self.avg_discount_margin = 0.0
+        self.customers_error = None  # relative standard error, None when exact
+
+
+def _margin(values, population):
+    """95% half-width for the mean of ``values`` drawn without replacement."""
+    n = len(values)
+    if n < 2:
+        return 0.0
+    mean = sum(values) / n
+    var = sum((v - mean) ** 2 for v in values) / (n - 1)
+    fpc = math.sqrt(max(population - n, 0) / (population - 1)) if population > 1 else 0.0
+    return Z_95 * math.sqrt(var / n) * fpc
+
+
+def _sample(size):
+    """Return (rows, ids_probed, id_span) for a uniform sample of transactions."""
+    T = Transaction
+    lo, hi = db.session.query(func.min(T.id), func.max(T.id)).one()
+    if lo is None:
+        return [], 0, 0
+    span = hi - lo + 1
+    ids = random.sample(range(lo, hi + 1), min(size, span))
+    rows = []
+    for i in range(0, len(ids), FETCH_BATCH_SIZE):
+        rows += (
+            db.session.query(T.product_category, T.payment_method, T.quantity,
+                             T.total_amount, T.price, T.discount_applied)
+            .filter(T.id.in_(ids[i:i + FETCH_BATCH_SIZE]))
+            .all()
+        )
+    return rows, len(ids), span
+
+
+def unique_customers_estimate():
+    """(estimate, relative error) from the merged product sketches, or None."""
+    sketches = [row for (row,) in db.session.query(ProductSummary.customer_sketch)]
+    if not sketches:
+        return None
+    merged = HyperLogLog.from_bytes(sketches[0])
+    for data in sketches[1:]:
+        merged.merge(HyperLogLog.from_bytes(data))
+    return merged.count(), merged.relative_error
+
+
+def approximate_summary(sample_size=DEFAULT_SAMPLE_SIZE) -> ApproximateSummary:
+    """Estimate the business-metrics summary from a random sample."""
+    s = ApproximateSummary()
+    rows, probed, span = _sample(sample_size)
+    if not rows:
+        return s
+
+    # Ids are probed uniformly over [min, max]; the hit rate scales the span
+    # to the number of rows, and a gap-free table gives the exact count.
+    hit_rate = len(rows) / probed
+    population = round(span * hit_rate)
+    scale = population / len(rows)
+    s.sample_size = len(rows)
+    s.count = population
+    s.count_margin = round(span * _margin([1] * len(rows) + [0] * (probed - len(rows)), span))
+
+    amounts = [r.total_amount for r in rows]
+    s.total_quantity = round(sum(r.quantity for r in rows) * scale)
+    s.total_revenue = sum(amounts) * scale
+    s.sum_price = sum(r.price for r in rows) * scale
+    s.sum_discount = sum(r.discount_applied for r in rows) * scale
+    s.avg_transaction_margin = _margin(amounts, population)
+    s.avg_price_margin = _margin([r.price for r in rows], population)
+    s.avg_discount_margin = _margin([r.discount_applied for r in rows], population)
+    # Total = count x mean; combine both relative errors
+    rel = math.hypot(s.count_margin / population, s.avg_transaction_margin / s.avg_transaction)
+    s.revenue_margin = s.total_revenue * rel
+
+    for r in rows:
+        cat, pm = r.product_category, r.payment_method
+        s.revenue_by_category[cat] = s.revenue_by_category.get(cat, 0) + r.total_amount * scale
+        s.count_by_category[cat] = s.count_by_category.get(cat, 0) + scale
+        s.revenue_by_payment[pm] = s.revenue_by_payment.get(pm, 0) + r.total_amount * scale
+        s.count_by_payment[pm] = s.count_by_payment.get(pm, 0) + scale
+    s.count_by_category = {k: round(v) for k, v in s.count_by_category.items()}
+    s.count_by_payment = {k: round(v) for k, v in s.count_by_payment.items()}
+
+    estimate = unique_customers_estimate()
+    if estimate is not None:
+        s.unique_customers, s.customers_error = estimate
+        s.unique_products = db.session.query(func.count(ProductSummary.product_id)).scalar()
+    else:
+        s.unique_customers, s.unique_products = db.session.query(
+            func.count(distinct(Transaction.customer_id)), func.count(distinct(Transaction.product_id))
+        ).one()
+    return s
@@ -0,0 +1,154 @@
+"""Bounded caches with TTL and hit/miss/eviction stats.
+
+Each named cache is created per app from config:
+
+    <NAME>_CACHE_SIZE   max entries (in-process backend)
+    <NAME>_CACHE_TTL    seconds before an entry expires
+
+``CACHE_BACKEND="redis"`` (with ``REDIS_URL``) stores entries in Redis instead,
+so all gunicorn workers share them. The ``redis`` package is only imported
+when that backend is selected.
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+_EXTENSION_KEY = "caches"
+_create_lock = threading.Lock()
+
+
+class LRUCache:
+    """Thread-safe in-process LRU cache with per-entry TTL."""
+
+    def __init__(self, max_size=1024, ttl=3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def get(self, key):
+        """Return the cached value, or None on a miss."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class RedisCache:
+    """Cache shared between workers through Redis. Values must be JSON-serializable.
+
+    Size is bounded by the Redis server's maxmemory policy, so evictions are
+    not visible here; hits and misses are counted per process.
+    """
+
+    def __init__(self, url, namespace, ttl=3600, client=None):
+        if client is None:
+            import redis  # optional dependency, only needed for this backend
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.namespace = namespace
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def _key(self, key):
+        return f"cache:{self.namespace}:{key}"
+
+    def get(self, key):
+        raw = self.client.get(self._key(key))
+        with self._lock:
+            if raw is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        self.client.set(self._key(key), json.dumps(value), ex=ttl or None)
+
+    def clear(self):
+        for key in self.client.scan_iter(self._key("*")):
+            self.client.delete(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": "redis",
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": None,
+                "expirations": None,
+            }
+
+
+def make_cache(config, name):
+    """Build the cache called ``name`` from an app config mapping."""
+    prefix = name.upper()
+    ttl = config.get(f"{prefix}_CACHE_TTL", 3600)
+    if config.get("CACHE_BACKEND") == "redis":
+        return RedisCache(config["REDIS_URL"], name, ttl=ttl)
+    return LRUCache(max_size=config.get(f"{prefix}_CACHE_SIZE", 1024), ttl=ttl)
+
+
+def get_cache(name):
+    """Return the current app's cache called ``name``, creating it on first use."""
+    app = current_app._get_current_object()
+    caches = app.extensions.setdefault(_EXTENSION_KEY, {})
+    cache = caches.get(name)
+    if cache is None:
+        with _create_lock:
+            cache = caches.get(name)
+            if cache is None:
+                cache = caches[name] = make_cache(app.config, name)
+    return cache
+
+
+def cache_stats() -> dict:
+    """Stats for every cache created in the current app."""
+    caches = current_app.extensions.get(_EXTENSION_KEY, {})
+    return {name: cache.stats() for name, cache in sorted(caches.items())}
@@ -1,76 +1,117 @@
 """Build structured chart data for frontend visualizations.
 
-All functions accept pre-loaded rows to avoid duplicate DB queries.
+The build_* functions accept pre-loaded rows or the TransactionSummary already
+built for the request, so text and charts share one aggregation. The *_charts
+functions at the end load by id and cache their payload per dataset version
+(see app.services.result_cache).
 """
 
+from app.services.aggregates import summarize
+from app.services.data_service import customer_summary, product_summary, summarize_business_metrics
+from app.services.result_cache import cached_result
+from app.services.rollups import trend
+
 
 def build_product_charts(product_id, rows):
-    """Return chart data for a product query from pre-loaded rows."""
-    if not rows:
+    """Return chart data for a product query from pre-loaded rows or a summary."""
+    s = summarize(rows)
+    if not s:
         return None
 
-    cat_rev = {}
-    pm_counts = {}
-    for r in rows:
-        cat_rev[r.product_category] = cat_rev.get(r.product_category, 0) + r.total_amount
-        pm_counts[r.payment_method] = pm_counts.get(r.payment_method, 0) + 1
-
     return [
         {
             "type": "bar",
             "title": f"Product {product_id} — Revenue by Category",
-            "data": [{"name": k, "value": round(v, 2)} for k, v in sorted(cat_rev.items())],
+            "data": [{"name": k, "value": round(v, 2)} for k, v in sorted(s.revenue_by_category.items())],
             "dataKey": "value",
             "color": "#6c63ff",
         },
         {
             "type": "pie",
             "title": f"Product {product_id} — Payment Methods",
-            "data": [{"name": k, "value": v} for k, v in sorted(pm_counts.items())],
+            "data": [{"name": k, "value": v} for k, v in sorted(s.count_by_payment.items())],
         },
     ]
 
 
 def build_business_charts(rows):
-    """Return chart data for business metrics from pre-loaded rows."""
-    if not rows:
+    """Return chart data for business metrics from pre-loaded rows or a summary."""
+    s = summarize(rows, with_stores=False)
+    if not s:
         return None
 
-    cat_rev = {}
-    pm_rev = {}
-    for r in rows:
-        cat_rev[r.product_category] = cat_rev.get(r.product_category, 0) + r.total_amount
-        pm_rev[r.payment_method] = pm_rev.get(r.payment_method, 0) + r.total_amount
-
     return [
         {
             "type": "bar",
             "title": "Revenue by Category",
-            "data": [{"name": k, "value": round(v, 2)} for k, v in sorted(cat_rev.items(), key=lambda x: -x[1])],
+            "data": [{"name": k, "value": round(v, 2)} for k, v in sorted(s.revenue_by_category.items(), key=lambda x: -x[1])],
             "dataKey": "value",
             "color": "#6c63ff",
         },
         {
             "type": "pie",
             "title": "Revenue by Payment Method",
-            "data": [{"name": k, "value": round(v, 2)} for k, v in sorted(pm_rev.items())],
+            "data": [{"name": k, "value": round(v, 2)} for k, v in sorted(s.revenue_by_payment.items())],
+        },
+    ]
+
+
+def build_trend_charts(periods, granularity="month"):
+    """Return chart data for a revenue trend from rollups.trend() rows."""
+    if not periods:
+        return None
+
+    fmt = "%Y-%m-%d" if granularity == "day" else "%Y-%m"
+    label = "Day" if granularity == "day" else "Month"
+    return [
+        {
+            "type": "bar",
+            "title": f"Revenue by {label}",
+            "data": [{"name": p.strftime(fmt), "value": round(rev, 2)} for p, _, _, rev, _ in periods],
+            "dataKey": "value",
+            "color": "#6c63ff",
+        },
+        {
+            "type": "bar",
+            "title": f"Transactions by {label}",
+            "data": [{"name": p.strftime(fmt), "value": cnt} for p, cnt, _, _, _ in periods],
+            "dataKey": "value",
+            "color": "#00c49f",
+        },
+    ]
+
+
+def build_store_charts(membership):
+    """Return chart data for a store membership lookup (see data_service.store_membership)."""
+    labels = membership["labels"]
+    if len(labels) < 2:
+        return None
+
+    combined = (" ∩ " if membership["match_all"] else " ∪ ").join(labels)
+    return [
+        {
+            "type": "bar",
+            "title": "Stores Selling Each Item",
+            "data": [
+                *({"name": label, "value": count} for label, count in zip(labels, membership["counts"])),
+                {"name": combined, "value": membership["store_count"]},
+            ],
+            "dataKey": "value",
+            "color": "#6c63ff",
         },
     ]
 
 
 def build_comparison_charts(kind, id1, id2, rows1, rows2):
     """Return chart data for comparison queries."""
+    s1, s2 = summarize(rows1), summarize(rows2)
     if kind == "customer":
-        return _customer_comparison_charts(id1, id2, rows1, rows2)
-    return _product_comparison_charts(id1, id2, rows1, rows2)
+        return _customer_comparison_charts(id1, id2, s1, s2)
+    return _product_comparison_charts(id1, id2, s1, s2)
 
 
-def _customer_comparison_charts(id1, id2, rows1, rows2):
-    cats1, cats2 = {}, {}
-    for r in rows1:
-        cats1[r.product_category] = cats1.get(r.product_category, 0) + r.total_amount
-    for r in rows2:
-        cats2[r.product_category] = cats2.get(r.product_category, 0) + r.total_amount
+def _customer_comparison_charts(id1, id2, s1, s2):
+    cats1, cats2 = s1.revenue_by_category, s2.revenue_by_category
     all_cats = sorted(set(list(cats1) + list(cats2)))
 
     return [
@@ -87,24 +128,13 @@ def _customer_comparison_charts(id1, id2, rows1, rows2):
     ]
 
 
-def _product_comparison_charts(id1, id2, rows1, rows2):
-    def _s(rows):
-        n = len(rows)
-        return {
-            "transactions": n,
-            "qty": sum(r.quantity for r in rows),
-            "revenue": round(sum(r.total_amount for r in rows), 2),
-            "avg_price": round(sum(r.price for r in rows) / n, 2),
-        }
-
-    s1, s2 = _s(rows1), _s(rows2)
-
+def _product_comparison_charts(id1, id2, s1, s2):
     return [
         {
             "type": "grouped_bar",
             "title": f"Product {id1} vs {id2} — Revenue & Avg Price",
             "data": [
-                {"name": "Total Revenue", f"Product {id1}": s1["revenue"], f"Product {id2}": s2["revenue"]},
+                {"name": "Total Revenue", f"Product {id1}": round(s1.total_revenue, 2), f"Product {id2}": round(s2.total_revenue, 2)},
             ],
             "keys": [f"Product {id1}", f"Product {id2}"],
             "colors": ["#6c63ff", "#a78bfa"],
@@ -113,10 +143,38 @@ def _product_comparison_charts(id1, id2, rows1, rows2):
             "type": "grouped_bar",
             "title": f"Product {id1} vs {id2} — Volume",
             "data": [
-                {"name": "Transactions", f"Product {id1}": s1["transactions"], f"Product {id2}": s2["transactions"]},
-                {"name": "Qty Sold", f"Product {id1}": s1["qty"], f"Product {id2}": s2["qty"]},
+                {"name": "Transactions", f"Product {id1}": s1.count, f"Product {id2}": s2.count},
+                {"name": "Qty Sold", f"Product {id1}": s1.total_quantity, f"Product {id2}": s2.total_quantity},
             ],
             "keys": [f"Product {id1}", f"Product {id2}"],
             "colors": ["#6c63ff", "#a78bfa"],
         },
     ]
+
+
+@cached_result("charts.product")
+def product_charts(product_id):
+    """Chart data for a product query, loaded by id."""
+    return build_product_charts(product_id, product_summary(product_id))
+
+
+@cached_result("charts.business")
+def business_charts():
+    """Chart data for the exact business metrics."""
+    return build_business_charts(summarize_business_metrics())
+
+
+@cached_result("charts.trend")
+def trend_charts(granularity="month", **filters):
+    """Chart data for the revenue trend at ``granularity``, narrowed by ``filters``."""
+    return build_trend_charts(trend(granularity, **filters), granularity)
+
+
+@cached_result("charts.comparison")
+def comparison_charts(kind, id1, id2):
+    """Chart data for a customer or product comparison, or None if either has no data."""
+    load = customer_summary if kind == "customer" else product_summary
+    s1, s2 = load(id1), load(id2)
+    if not (s1 and s2):
+        return None
+    return build_comparison_charts(kind, id1, id2, s1, s2)
@@ -0,0 +1,127 @@
+"""Shrink the [DATA] payload sent to GPT-4o to a token budget.
+
+The formatters in data_service write for humans (box-drawing rules, sample
+sums, up to 15 full store addresses). Before the text goes into
+RESPONSE_PROMPT it is compacted in stages, cheapest loss first, until it fits
+``DATA_TOKEN_BUDGET``:
+
+1. drop decorative rules, explanatory notes and repeated blank lines (always)
+2. abbreviate street addresses to "City, ST"
+3. drop the "= a + b + ..." sample lines of sum breakdowns
+4. shorten the store location list
+5. shorten per-transaction listings
+
+Totals, averages and counts are never touched. The full text is still
+returned to the client as source_data.
+"""
+
+import math
+import re
+
+# Approximate BPE tokens per character for English text and numbers
+CHARS_PER_TOKEN = 4
+
+RULE_RE = re.compile(r"^[═─━=\-]{5,}$")
+NOTE_RE = re.compile(r"^\s*\(each = .*\)$")
+# "176 Andrew Cliffs\nBaileyfort, HI 93354" -> "Baileyfort, HI"
+ADDRESS_RE = re.compile(
+    r"(?<=• |\| )[^\n|]*\n((?:[^\n,|]+, [A-Z]{2})|(?:[AFD]PO [A-Z]{2})) \d{5}(?:-\d{4})?"
+)
+SAMPLE_TERMS_RE = re.compile(r"^\s*= .* \+ .*$")
+MORE_STORES_RE = re.compile(r"^\s*\.\.\. and (\d+) more$")
+
+STORE_LIST_KEEP = 5
+TRANSACTIONS_KEEP = 8
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of ``text``."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _drop_redundant_lines(text):
+    lines = []
+    for line in text.split("\n"):
+        if RULE_RE.match(line.strip()) or NOTE_RE.match(line):
+            continue
+        if not line.strip() and (not lines or not lines[-1].strip()):
+            continue
+        lines.append(line)
+    return "\n".join(lines).strip()
+
+
+def _abbreviate_addresses(text):
+    return ADDRESS_RE.sub(r"\1", text)
+
+
+def _drop_sample_terms(text):
+    return "\n".join(line for line in text.split("\n") if not SAMPLE_TERMS_RE.match(line))
+
+
+def _trim_store_list(text):
+    lines = text.split("\n")
+    try:
+        start = lines.index("Sample store locations:") + 1
+    except ValueError:
+        return text
+
+    end = start
+    while end < len(lines) and lines[end].startswith("  • "):
+        end += 1
+    shown = end - start
+    more = 0
+    if end < len(lines):
+        m = MORE_STORES_RE.match(lines[end])
+        if m:
+            more = int(m.group(1))
+            end += 1
+    if shown <= STORE_LIST_KEEP:
+        return text
+
+    kept = lines[start:start + STORE_LIST_KEEP]
+    kept.append(f"  ... and {shown - STORE_LIST_KEEP + more} more")
+    return "\n".join(lines[:start] + kept + lines[end:])
+
+
+def _trim_transactions(text):
+    lines = text.split("\n")
+    rows = [i for i, line in enumerate(lines) if line.startswith("- ")]
+    if len(rows) <= TRANSACTIONS_KEEP:
+        return text
+
+    drop = set(rows[TRANSACTIONS_KEEP:])
+    out = []
+    for i, line in enumerate(lines):
+        if i in drop:
+            if i == rows[TRANSACTIONS_KEEP]:
+                out.append(f"- ... ({len(rows) - TRANSACTIONS_KEEP} more transactions not shown)")
+            continue
+        out.append(line)
+    return "\n".join(out)
+
+
+LOSSY_STAGES = (
+    _abbreviate_addresses,
+    _drop_sample_terms,
+    _trim_store_list,
+    _trim_transactions,
+)
+
+
+def compact_payload(text: str, budget: int) -> tuple:
+    """Compact ``text`` towards ``budget`` tokens.
+
+    Returns (compacted_text, tokens_before, tokens_after). A budget of 0
+    disables compaction. The result may still exceed the budget when only
+    key figures remain.
+    """
+    before = estimate_tokens(text)
+    if not budget:
+        return text, before, before
+
+    text = _drop_redundant_lines(text)
+    for stage in LOSSY_STAGES:
+        if estimate_tokens(text) <= budget:
+            break
+        text = stage(text)
+    return text, before, estimate_tokens(text)
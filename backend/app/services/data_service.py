@@ -1,8 +1,19 @@
-"""Data access service — queries the PostgreSQL transactions table."""
+"""Data access service — queries the PostgreSQL transactions table (or its snapshot)."""
 
+import base64
 import json
-from app.extensions import db
+from datetime import date, datetime, timedelta
+from flask import current_app
+from sqlalchemy import tuple_
 from app.models import Transaction
+from app.services.approximate import ApproximateSummary, approximate_summary
+from app.services.aggregates import STORE_SAMPLE_SIZE, TransactionSummary, summarize
+from app.services.product_summaries import get_product_summary, product_summaries_ready
+from app.services.profiles import get_profile, profiles_ready
+from app.services.result_cache import cached_result
+from app.services.rollups import rollups_ready, trend
+from app.services.snapshot import get_snapshot, snapshot_enabled
+from app.services.store_index import get_store_index
 
 
 def _fmt(val):
@@ -10,15 +21,139 @@ def _fmt(val):
     return f"${val:,.2f}"
 
 
-def get_customer_transactions(customer_id: str, limit: int = 20) -> str:
-    """Get recent transactions for a customer, formatted as a string for the LLM."""
-    rows = (
-        Transaction.query
-        .filter_by(customer_id=customer_id)
-        .order_by(Transaction.transaction_date.desc())
-        .limit(limit)
-        .all()
-    )
+def _sum_terms(values, n, fmt=str, more="more"):
+    """Render the "a + b + ..." side of a sum breakdown from sample values."""
+    if n <= 8:
+        return " + ".join(fmt(v) for v in values)
+    return " + ".join(fmt(v) for v in values[:5]) + f" + ... ({n - 5} {more})"
+
+
+def load_summary(with_stores=True, since=None, until=None, **filters) -> TransactionSummary:
+    """Aggregate the transactions matching ``filters`` (column=value).
+
+    ``since``/``until`` bound transaction_date (datetimes, ``until``
+    exclusive). This is the scan path: questions the derived tables can't
+    answer (date ranges, or anything before they are built) come here, and
+    run against the in-process columnar snapshot when ANALYTICS_ENGINE is
+    "snapshot", otherwise in SQL.
+    """
+    if snapshot_enabled():
+        return get_snapshot().summarize(with_stores=with_stores, since=since, until=until, **filters)
+    criteria = [getattr(Transaction, col) == val for col, val in filters.items()]
+    if since is not None:
+        criteria.append(Transaction.transaction_date >= since)
+    if until is not None:
+        criteria.append(Transaction.transaction_date < until)
+    return TransactionSummary.from_query(*criteria, with_stores=with_stores)
+
+
+def _cached_summary(name):
+    """cached_result for functions returning a TransactionSummary."""
+    return cached_result(name, encode=TransactionSummary.to_dict, decode=TransactionSummary.from_dict)
+
+
+@_cached_summary("customer_summary")
+def customer_summary(customer_id: str) -> TransactionSummary:
+    """Aggregate one customer, from their profile once profiles are built."""
+    if profiles_ready():
+        profile = get_profile(customer_id)
+        return TransactionSummary.from_profile(profile) if profile else TransactionSummary()
+    return load_summary(customer_id=customer_id)
+
+
+@_cached_summary("product_summary")
+def product_summary(product_id: str) -> TransactionSummary:
+    """Aggregate one product, from its precomputed summary once summaries are built.
+
+    Until then the product is aggregated in SQL. Either way its stores are
+    taken from the store index.
+    """
+    if product_summaries_ready():
+        row = get_product_summary(product_id)
+        s = TransactionSummary.from_product_summary(row) if row else TransactionSummary()
+    else:
+        s = load_summary(with_stores=False, product_id=product_id)
+    if s:
+        index = get_store_index()
+        bits = index.stores_for(products=[product_id])
+        s.store_count = index.count(bits)
+        s.stores = index.names(bits, limit=STORE_SAMPLE_SIZE)
+    return s
+
+
+def encode_cursor(row) -> str:
+    """Opaque cursor pointing just past ``row`` in a customer's history."""
+    raw = f"{row.transaction_date.isoformat()}|{row.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """Return the (transaction_date, id) of a cursor; ValueError if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        when, tx_id = raw.split("|")
+        return datetime.fromisoformat(when), int(tx_id)
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise ValueError(f"invalid cursor {cursor!r}") from exc
+
+
+def _date_bounds(start=None, end=None):
+    """(since, until) datetimes covering ``start`` to ``end`` (inclusive dates); until is exclusive.
+
+    An ``end`` of date.max leaves the range open, as there is no next day.
+    """
+    since = datetime.combine(start, datetime.min.time()) if start is not None else None
+    until = None
+    if end is not None and end < date.max:
+        until = datetime.combine(end + timedelta(days=1), datetime.min.time())
+    return since, until
+
+
+def _history_criteria(customer_id, start=None, end=None):
+    """Criteria for a customer's transactions between ``start`` and ``end`` (inclusive dates)."""
+    criteria = [Transaction.customer_id == customer_id]
+    since, until = _date_bounds(start, end)
+    if since is not None:
+        criteria.append(Transaction.transaction_date >= since)
+    if until is not None:
+        criteria.append(Transaction.transaction_date < until)
+    return criteria
+
+
+def customer_history(customer_id: str, limit: int, cursor=None, start: date = None, end: date = None):
+    """Return one page of a customer's transactions, newest first, and the next cursor.
+
+    Pages are keyset-paginated on (transaction_date, id): ``cursor`` comes from
+    the previous page and the query seeks to it through the
+    (customer_id, transaction_date, id) index, so a deep page costs the same
+    as the first. The next cursor is None on the last page.
+    """
+    T = Transaction
+    query = T.query.filter(*_history_criteria(customer_id, start, end))
+    if cursor is not None:
+        query = query.filter(tuple_(T.transaction_date, T.id) < tuple_(*decode_cursor(cursor)))
+    rows = query.order_by(T.transaction_date.desc(), T.id.desc()).limit(limit + 1).all()
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def customer_history_summary(customer_id: str, start: date = None, end: date = None) -> TransactionSummary:
+    """Totals over a customer's whole history (from their profile), or the ``start``..``end`` range of it."""
+    if start is None and end is None:
+        return customer_summary(customer_id)
+    since, until = _date_bounds(start, end)
+    return load_summary(with_stores=False, since=since, until=until, customer_id=customer_id)
+
+
+@cached_result("customer_transactions")
+def get_customer_transactions(customer_id: str, limit: int = None) -> str:
+    """Get recent transactions for a customer, formatted as a string for the LLM.
+
+    ``limit`` defaults to ``CUSTOMER_LLM_TRANSACTIONS``; totals cover the
+    customer's full history.
+    """
+    limit = limit or current_app.config["CUSTOMER_LLM_TRANSACTIONS"]
+    rows, _ = customer_history(customer_id, limit)
     if not rows:
         return f"No transactions found for customer {customer_id}."
 
@@ -35,42 +170,35 @@ def get_customer_transactions(customer_id: str, limit: int = 20) -> str:
         )
         total_spend += r.total_amount
 
-    lines.append(f"\nTotal spend: ${total_spend:.2f}")
+    s = customer_summary(customer_id)
+    if s.count > len(rows):
+        lines.append(
+            f"\nTotal spend: ${s.total_revenue:.2f} over all {s.count} transactions "
+            f"(${total_spend:.2f} in the {len(rows)} shown)"
+        )
+    else:
+        lines.append(f"\nTotal spend: ${total_spend:.2f}")
     return "\n".join(lines)
 
 
+@cached_result("product_info")
 def get_product_info(product_id: str, rows=None) -> str:
-    """Get aggregated info about a product ID with calculation breakdowns."""
-    if rows is None:
-        rows = Transaction.query.filter_by(product_id=product_id).all()
+    """Get aggregated info about a product ID with calculation breakdowns.
 
-    if not rows:
-        return f"No transactions found for product {product_id}."
+    ``rows`` may be pre-loaded rows or a TransactionSummary; when omitted the
+    product is aggregated in SQL.
+    """
+    s = product_summary(product_id) if rows is None else summarize(rows)
 
-    n = len(rows)
-    prices = [r.price for r in rows]
-    amounts = [r.total_amount for r in rows]
-    quantities = [r.quantity for r in rows]
-    discounts = [r.discount_applied for r in rows]
-    stores = sorted(set(r.store_location for r in rows))
-    categories = sorted(set(r.product_category for r in rows))
-
-    total_qty = sum(quantities)
-    total_revenue = sum(amounts)
-    sum_prices = sum(prices)
-    avg_price = sum_prices / n
-    sum_discounts = sum(discounts)
-    avg_discount = sum_discounts / n
-
-    payment_methods = {}
-    for r in rows:
-        payment_methods[r.payment_method] = payment_methods.get(r.payment_method, 0) + 1
+    if not s:
+        return f"No transactions found for product {product_id}."
 
+    n = s.count
     lines = [
         f"Product {product_id} — {n} transactions",
         f"═══════════════════════════════════════",
         f"",
-        f"Categories: {', '.join(categories)}",
+        f"Categories: {', '.join(s.categories)}",
         f"",
         f"[Calculation Breakdown]",
         f"",
@@ -78,76 +206,78 @@ def get_product_info(product_id: str, rows=None) -> str:
     ]
 
     # Show sample quantities for breakdown (up to 8 values)
-    if n <= 8:
-        qty_str = " + ".join(str(q) for q in quantities)
-        lines.append(f"  = {qty_str}")
-    else:
-        sample = quantities[:5]
-        qty_str = " + ".join(str(q) for q in sample)
-        lines.append(f"  = {qty_str} + ... ({n - 5} more values)")
-    lines.append(f"  = {total_qty}")
+    lines.append(f"  = {_sum_terms(s.sample_quantities, n, more='more values')}")
+    lines.append(f"  = {s.total_quantity}")
 
     lines.append(f"")
     lines.append(f"Total Revenue = sum of all transaction amounts")
-    if n <= 8:
-        amt_str = " + ".join(f"${a:.2f}" for a in amounts)
-        lines.append(f"  = {amt_str}")
-    else:
-        sample = amounts[:5]
-        amt_str = " + ".join(f"${a:.2f}" for a in sample)
-        lines.append(f"  = {amt_str} + ... ({n - 5} more)")
-    lines.append(f"  = {_fmt(total_revenue)}")
+    lines.append(f"  = {_sum_terms(s.sample_amounts, n, fmt=lambda a: f'${a:.2f}')}")
+    lines.append(f"  = {_fmt(s.total_revenue)}")
 
     lines.append(f"")
     lines.append(f"Avg Price = sum(all prices) / count(transactions)")
-    lines.append(f"  = {_fmt(sum_prices)} / {n}")
-    lines.append(f"  = {_fmt(avg_price)}")
+    lines.append(f"  = {_fmt(s.sum_price)} / {n}")
+    lines.append(f"  = {_fmt(s.avg_price)}")
 
     lines.append(f"")
     lines.append(f"Avg Discount = sum(all discounts) / count(transactions)")
-    lines.append(f"  = {sum_discounts:.2f} / {n}")
-    lines.append(f"  = {avg_discount:.1f}%")
+    lines.append(f"  = {s.sum_discount:.2f} / {n}")
+    lines.append(f"  = {s.avg_discount:.1f}%")
 
     lines.append(f"")
-    lines.append(f"Payment Methods: {json.dumps(payment_methods)}")
+    lines.append(f"Payment Methods: {json.dumps(s.count_by_payment)}")
     lines.append(f"")
-    lines.append(f"Total Stores Selling This Product: {len(stores)}")
+    lines.append(f"Total Stores Selling This Product: {s.store_count}")
     lines.append(f"Sample store locations:")
-    for s in stores[:15]:
-        lines.append(f"  • {s}")
-    if len(stores) > 15:
-        lines.append(f"  ... and {len(stores) - 15} more")
+    for loc in s.stores[:15]:
+        lines.append(f"  • {loc}")
+    if s.store_count > 15:
+        lines.append(f"  ... and {s.store_count - 15} more")
 
     return "\n".join(lines)
 
 
-def get_business_metrics(rows=None) -> str:
-    """Get general business metrics with calculation breakdowns."""
+def summarize_business_metrics(rows=None, approximate=False) -> TransactionSummary:
+    """Aggregate the numbers behind the business-metrics breakdown.
+
+    With no rows the numbers come from the rollup cube once it is built,
+    otherwise the aggregation runs in SQL (GROUP BY category and payment
+    method, COUNT(DISTINCT) for customers and products) so no Transaction
+    objects are loaded. Pre-loaded rows are aggregated in Python instead.
+    ``approximate`` estimates the whole table from a sample of
+    ``APPROX_SAMPLE_SIZE`` rows (see app.services.approximate).
+    """
     if rows is None:
-        rows = Transaction.query.all()
+        if approximate:
+            return approximate_summary(current_app.config["APPROX_SAMPLE_SIZE"])
+        return _business_summary()
+    return summarize(rows, with_stores=False)
 
-    if not rows:
-        return "No transaction data available."
 
-    n = len(rows)
-    amounts = [r.total_amount for r in rows]
-    total_revenue = sum(amounts)
-    avg_transaction = total_revenue / n
+@_cached_summary("business_summary")
+def _business_summary() -> TransactionSummary:
+    """The exact whole-table summary, from the rollup cube once it is built."""
+    if rollups_ready():
+        return TransactionSummary.from_rollups()
+    return load_summary(with_stores=False)
 
-    by_category = {}
-    cat_counts = {}
-    for r in rows:
-        cat = r.product_category
-        by_category[cat] = by_category.get(cat, 0) + r.total_amount
-        cat_counts[cat] = cat_counts.get(cat, 0) + 1
 
-    by_payment = {}
-    for r in rows:
-        pm = r.payment_method
-        by_payment[pm] = by_payment.get(pm, 0) + r.total_amount
+@cached_result("business_metrics")
+def get_business_metrics(rows=None) -> str:
+    """Get general business metrics with calculation breakdowns.
 
-    unique_customers = len(set(r.customer_id for r in rows))
-    unique_products = len(set(r.product_id for r in rows))
+    ``rows`` may be pre-loaded rows or a TransactionSummary; when omitted the
+    whole table is aggregated in SQL.
+    """
+    s = summarize_business_metrics(rows)
+
+    if not s:
+        return "No transaction data available."
+    if isinstance(s, ApproximateSummary):
+        return _approximate_business_metrics(s)
+
+    n = s.count
+    total_revenue = s.total_revenue
 
     lines = [
         f"Business Metrics — {n} transactions",
@@ -160,72 +290,148 @@ def get_business_metrics(rows=None) -> str:
         f"",
         f"Avg Transaction Value = Total Revenue / Transaction Count",
         f"  = {_fmt(total_revenue)} / {n}",
-        f"  = {_fmt(avg_transaction)}",
+        f"  = {_fmt(s.avg_transaction)}",
         f"",
-        f"Unique Customers = count(distinct CustomerID) = {unique_customers}",
-        f"Unique Products = count(distinct ProductID) = {unique_products}",
+        f"Unique Customers = count(distinct CustomerID) = {s.unique_customers}",
+        f"Unique Products = count(distinct ProductID) = {s.unique_products}",
         f"",
         f"Revenue by Category:",
         f"  (each = sum of TotalAmount WHERE ProductCategory = X)",
     ]
-    for cat, rev in sorted(by_category.items(), key=lambda x: -x[1]):
-        cnt = cat_counts[cat]
+    for cat, rev in sorted(s.revenue_by_category.items(), key=lambda x: -x[1]):
+        cnt = s.count_by_category[cat]
         lines.append(f"  • {cat}: {_fmt(rev)}  ({cnt} transactions, avg {_fmt(rev/cnt)})")
 
     lines.append(f"\nRevenue by Payment Method:")
-    for pm, rev in sorted(by_payment.items(), key=lambda x: -x[1]):
+    for pm, rev in sorted(s.revenue_by_payment.items(), key=lambda x: -x[1]):
         lines.append(f"  • {pm}: {_fmt(rev)}")
 
     return "\n".join(lines)
 
 
+def _approximate_business_metrics(s: ApproximateSummary) -> str:
+    """Business metrics text for an ApproximateSummary, with 95% margins."""
+    if s.customers_error is None:
+        customers = f"Unique Customers = count(distinct CustomerID) = {s.unique_customers}"
+    else:
+        customers = (
+            f"Unique Customers ≈ {s.unique_customers} "
+            f"(HyperLogLog sketch, ±{s.customers_error * 100:.1f}% standard error)"
+        )
+    lines = [
+        f"Business Metrics (approximate) — ~{s.count} transactions",
+        f"═══════════════════════════════════════",
+        f"",
+        f"[Calculation Breakdown]",
+        f"",
+        f"Estimated from a uniform random sample of {s.sample_size} transactions;",
+        f"± values are 95% confidence margins.",
+        f"",
+        f"Transaction Count ≈ {s.count} ± {s.count_margin}",
+        f"",
+        f"Total Revenue ≈ Transaction Count × mean(TotalAmount in sample)",
+        f"  ≈ {_fmt(s.total_revenue)} ± {_fmt(s.revenue_margin)}",
+        f"",
+        f"Avg Transaction Value ≈ mean(TotalAmount in sample)",
+        f"  ≈ {_fmt(s.avg_transaction)} ± {_fmt(s.avg_transaction_margin)}",
+        f"Avg Price ≈ {_fmt(s.avg_price)} ± {_fmt(s.avg_price_margin)}",
+        f"Avg Discount ≈ {s.avg_discount:.1f}% ± {s.avg_discount_margin:.1f}%",
+        f"",
+        customers,
+        f"Unique Products = {s.unique_products}",
+        f"",
+        f"Revenue by Category (estimated from the sample):",
+    ]
+    for cat, rev in sorted(s.revenue_by_category.items(), key=lambda x: -x[1]):
+        lines.append(f"  • {cat}: ~{_fmt(rev)}  (~{s.count_by_category[cat]} transactions)")
+
+    lines.append(f"\nRevenue by Payment Method (estimated from the sample):")
+    for pm, rev in sorted(s.revenue_by_payment.items(), key=lambda x: -x[1]):
+        lines.append(f"  • {pm}: ~{_fmt(rev)}")
+
+    return "\n".join(lines)
+
+
+@cached_result("revenue_trend")
+def get_revenue_trend(granularity: str = "month", rows=None, **filters) -> str:
+    """Get revenue and transaction counts per day or month.
+
+    ``rows`` may be the list returned by rollups.trend(); when omitted it is
+    loaded (from the rollup cube once built) with ``filters``.
+    """
+    periods = trend(granularity, **filters) if rows is None else rows
+    if not periods:
+        return "No transaction data available."
+
+    label = "Day" if granularity == "day" else "Month"
+    fmt = "%Y-%m-%d" if granularity == "day" else "%Y-%m"
+    scope = ", ".join(f"{col.replace('_', ' ')} {val}" for col, val in filters.items())
+    lines = [
+        f"Revenue Trend by {label}{f' ({scope})' if scope else ''} — {len(periods)} periods",
+        f"═══════════════════════════════════════",
+        f"",
+        f"[Calculation Breakdown]",
+        f"",
+        f"Revenue per {label.lower()} = sum of TotalAmount WHERE TransactionDate in that {label.lower()}",
+    ]
+    for period, cnt, qty, rev, _ in periods:
+        lines.append(
+            f"  • {period.strftime(fmt)}: {_fmt(rev)}  ({cnt} transactions, {qty} units, avg {_fmt(rev / cnt)})"
+        )
+
+    first, last = periods[0], periods[-1]
+    best = max(periods, key=lambda p: p[3])
+    worst = min(periods, key=lambda p: p[3])
+    lines += [
+        f"",
+        f"Total Revenue = {_fmt(sum(p[3] for p in periods))} over {sum(p[1] for p in periods)} transactions",
+        f"Highest {label.lower()}: {best[0].strftime(fmt)} ({_fmt(best[3])})",
+        f"Lowest {label.lower()}: {worst[0].strftime(fmt)} ({_fmt(worst[3])})",
+    ]
+    if len(periods) > 1 and first[3]:
+        change = (last[3] - first[3]) / first[3] * 100
+        lines.append(
+            f"Change from first to last {label.lower()} = "
+            f"({_fmt(last[3])} - {_fmt(first[3])}) / {_fmt(first[3])} = {change:+.1f}%"
+        )
+    return "\n".join(lines)
+
+
+@cached_result("compare_customers")
 def compare_customers(id1: str, id2: str, rows1=None, rows2=None) -> str:
-    """Compare two customers with calculation breakdowns."""
-    if rows1 is None:
-        rows1 = Transaction.query.filter_by(customer_id=id1).all()
-    if rows2 is None:
-        rows2 = Transaction.query.filter_by(customer_id=id2).all()
+    """Compare two customers with calculation breakdowns.
 
-    if not rows1 and not rows2:
+    ``rows1``/``rows2`` may be pre-loaded rows or TransactionSummary objects.
+    """
+    s1 = customer_summary(id1) if rows1 is None else summarize(rows1)
+    s2 = customer_summary(id2) if rows2 is None else summarize(rows2)
+
+    if not s1 and not s2:
         return f"No transactions found for either customer {id1} or customer {id2}."
-    if not rows1:
+    if not s1:
         return f"No transactions found for customer {id1}. Customer {id2} has data."
-    if not rows2:
+    if not s2:
         return f"Customer {id1} has data. No transactions found for customer {id2}."
 
-    def _breakdown(cid, rows):
-        amounts = [r.total_amount for r in rows]
-        n = len(rows)
-        total = sum(amounts)
-        avg = total / n
-        categories = {}
-        for r in rows:
-            categories[r.product_category] = categories.get(r.product_category, 0) + r.total_amount
-        payment_methods = {}
-        for r in rows:
-            payment_methods[r.payment_method] = payment_methods.get(r.payment_method, 0) + 1
+    def _breakdown(cid, s):
+        n = s.count
+        total = s.total_revenue
 
         lines = [
             f"  Customer {cid}: {n} transaction(s)",
             f"  Total Spend = sum(TotalAmount)",
         ]
-        if n <= 8:
-            amt_str = " + ".join(f"${a:.2f}" for a in amounts)
-            lines.append(f"    = {amt_str}")
-        else:
-            sample = amounts[:5]
-            amt_str = " + ".join(f"${a:.2f}" for a in sample)
-            lines.append(f"    = {amt_str} + ... ({n - 5} more)")
+        lines.append(f"    = {_sum_terms(s.sample_amounts, n, fmt=lambda a: f'${a:.2f}')}")
         lines.append(f"    = {_fmt(total)}")
 
-        lines.append(f"  Avg per Transaction = {_fmt(total)} / {n} = {_fmt(avg)}")
+        lines.append(f"  Avg per Transaction = {_fmt(total)} / {n} = {_fmt(s.avg_transaction)}")
 
         lines.append(f"  Categories:")
-        for cat, val in sorted(categories.items()):
+        for cat, val in sorted(s.revenue_by_category.items()):
             lines.append(f"    • {cat}: {_fmt(val)}")
 
         lines.append(f"  Payment Methods:")
-        for pm, cnt in sorted(payment_methods.items()):
+        for pm, cnt in sorted(s.count_by_payment.items()):
             lines.append(f"    • {pm}: {cnt}x")
 
         return "\n".join(lines)
@@ -236,50 +442,39 @@ def compare_customers(id1: str, id2: str, rows1=None, rows2=None) -> str:
         f"",
         f"[Calculation Breakdown]",
         f"",
-        _breakdown(id1, rows1),
+        _breakdown(id1, s1),
         f"",
-        _breakdown(id2, rows2),
+        _breakdown(id2, s2),
     ]
 
     return "\n".join(lines)
 
 
+@cached_result("compare_products")
 def compare_products(id1: str, id2: str, rows1=None, rows2=None) -> str:
-    """Compare two products with calculation breakdowns."""
-    if rows1 is None:
-        rows1 = Transaction.query.filter_by(product_id=id1).all()
-    if rows2 is None:
-        rows2 = Transaction.query.filter_by(product_id=id2).all()
+    """Compare two products with calculation breakdowns.
+
+    ``rows1``/``rows2`` may be pre-loaded rows or TransactionSummary objects.
+    """
+    s1 = product_summary(id1) if rows1 is None else summarize(rows1)
+    s2 = product_summary(id2) if rows2 is None else summarize(rows2)
 
-    if not rows1 and not rows2:
+    if not s1 and not s2:
         return f"No transactions found for either product {id1} or product {id2}."
-    if not rows1:
+    if not s1:
         return f"No transactions found for product {id1}. Product {id2} has data."
-    if not rows2:
+    if not s2:
         return f"Product {id1} has data. No transactions found for product {id2}."
 
-    def _breakdown(pid, rows):
-        n = len(rows)
-        quantities = [r.quantity for r in rows]
-        amounts = [r.total_amount for r in rows]
-        prices = [r.price for r in rows]
-        discounts = [r.discount_applied for r in rows]
-
-        total_qty = sum(quantities)
-        total_rev = sum(amounts)
-        sum_prices = sum(prices)
-        avg_price = sum_prices / n
-        sum_disc = sum(discounts)
-        avg_disc = sum_disc / n
-        store_count = len(set(r.store_location for r in rows))
-
+    def _breakdown(pid, s):
+        n = s.count
         lines = [
             f"  Product {pid}: {n} transactions",
-            f"  Total Qty = sum(Quantity) = {total_qty}",
-            f"  Total Revenue = sum(TotalAmount) = {_fmt(total_rev)}",
-            f"  Avg Price = sum(Price) / count = {_fmt(sum_prices)} / {n} = {_fmt(avg_price)}",
-            f"  Avg Discount = sum(Discount) / count = {sum_disc:.2f} / {n} = {avg_disc:.1f}%",
-            f"  Store Locations = count(distinct StoreLocation) = {store_count}",
+            f"  Total Qty = sum(Quantity) = {s.total_quantity}",
+            f"  Total Revenue = sum(TotalAmount) = {_fmt(s.total_revenue)}",
+            f"  Avg Price = sum(Price) / count = {_fmt(s.sum_price)} / {n} = {_fmt(s.avg_price)}",
+            f"  Avg Discount = sum(Discount) / count = {s.sum_discount:.2f} / {n} = {s.avg_discount:.1f}%",
+            f"  Store Locations = count(distinct StoreLocation) = {s.store_count}",
         ]
         return "\n".join(lines)
 
@@ -289,9 +484,61 @@ def compare_products(id1: str, id2: str, rows1=None, rows2=None) -> str:
         f"",
         f"[Calculation Breakdown]",
         f"",
-        _breakdown(id1, rows1),
+        _breakdown(id1, s1),
         f"",
-        _breakdown(id2, rows2),
+        _breakdown(id2, s2),
     ]
 
     return "\n".join(lines)
+
+
+def store_membership(products=(), categories=(), match_all=True) -> dict:
+    """Look up the stores selling all (or any) of ``products`` and ``categories``.
+
+    Returns the per-item and combined store counts and a sample of the
+    combined stores, read from the store index.
+    """
+    index = get_store_index()
+    labels = [f"product {p}" for p in products] + list(categories)
+    sets = [index.stores_for(products=[p]) for p in products]
+    sets += [index.stores_for(categories=[c]) for c in categories]
+    bits = index.stores_for(products, categories, match_all=match_all)
+    return {
+        "labels": labels,
+        "counts": [index.count(one) for one in sets],
+        "match_all": match_all,
+        "store_count": index.count(bits),
+        "total_stores": len(index.stores),
+        "stores": index.names(bits, limit=STORE_SAMPLE_SIZE),
+    }
+
+
+def get_store_membership(membership: dict) -> str:
+    """Format a store_membership() result with its calculation breakdown."""
+    labels = membership["labels"]
+    if not labels:
+        return "No product or category given."
+
+    n = membership["store_count"]
+    joined = (" and " if membership["match_all"] else " or ").join(labels)
+    lines = [
+        f"Stores selling {joined} — {n} stores",
+        f"═══════════════════════════════════════",
+        f"",
+    ]
+    if len(labels) > 1:
+        op = "∩" if membership["match_all"] else "∪"
+        lines.append(f"[Calculation Breakdown]")
+        lines.append(f"")
+        for label, count in zip(labels, membership["counts"]):
+            lines.append(f"  Stores selling {label} = {count}")
+        lines.append(f"  {f' {op} '.join(labels)} = {n}")
+        lines.append(f"")
+    lines.append(f"Total Stores: {n} of {membership['total_stores']}")
+    if n:
+        lines.append(f"Sample store locations:")
+        for loc in membership["stores"][:15]:
+            lines.append(f"  • {loc}")
+        if n > 15:
+            lines.append(f"  ... and {n - 15} more")
+    return "\n".join(lines)
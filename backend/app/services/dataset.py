@@ -0,0 +1,57 @@
+"""Dataset version token shared by every worker.
+
+The version changes whenever the transactions table is (re)loaded, so
+in-process snapshots and caches can tell when their copy is stale.
+"""
+
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app
+
+from app.extensions import db
+from app.models import DatasetVersion
+
+_EXTENSION_KEY = "dataset_version"
+_lock = threading.Lock()
+
+
+def get_dataset_version() -> int:
+    """Return the current dataset version (0 before the first load)."""
+    version = db.session.query(DatasetVersion.version).filter_by(id=1).scalar()
+    return version or 0
+
+
+def current_dataset_version() -> int:
+    """Return the dataset version, re-read at most once per ``SNAPSHOT_CHECK_INTERVAL``.
+
+    Cache keys include the version, so a load in another worker becomes
+    visible here within that interval; a load in this worker immediately.
+    """
+    app = current_app._get_current_object()
+    interval = app.config.get("SNAPSHOT_CHECK_INTERVAL", 5)
+    memo = app.extensions.get(_EXTENSION_KEY)
+    if memo is not None and time.monotonic() - memo[1] < interval:
+        return memo[0]
+
+    with _lock:
+        version = get_dataset_version()
+        app.extensions[_EXTENSION_KEY] = (version, time.monotonic())
+    return version
+
+
+def bump_dataset_version() -> int:
+    """Advance the dataset version after new transactions were written."""
+    now = datetime.now()
+    updated = (
+        DatasetVersion.query
+        .filter_by(id=1)
+        .update({"version": DatasetVersion.version + 1, "updated_at": now})
+    )
+    if not updated:
+        db.session.add(DatasetVersion(id=1, version=1, updated_at=now))
+    db.session.commit()
+    version = get_dataset_version()
+    current_app.extensions[_EXTENSION_KEY] = (version, time.monotonic())
+    return version
@@ -0,0 +1,62 @@
+"""End-to-end time budget for a chat request.
+
+A sync gunicorn worker is tied up for as long as a request runs, so each
+request gets a deadline (``CHAT_DEADLINE``) split into per-stage budgets
+(``CHAT_CLASSIFY_BUDGET``, ``CHAT_RETRIEVE_BUDGET``, ``CHAT_GENERATE_BUDGET``).
+A stage gets its own budget or whatever is left of the deadline, whichever is
+smaller. Stages that take longer than they were given count
+``deadline.<stage>_overruns``.
+"""
+
+import time
+
+from flask import current_app
+
+from app.services import metrics
+
+STAGES = ("classify", "retrieve", "generate")
+
+
+class Stage:
+    """Context manager timing one stage against its budget."""
+
+    def __init__(self, name, timeout):
+        self.name = name
+        self.timeout = timeout
+        self.started = None
+        self.expires = None
+
+    def __enter__(self):
+        self.started = time.monotonic()
+        self.expires = self.started + self.timeout
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.monotonic() - self.started
+        metrics.incr(f"deadline.{self.name}_ms", int(elapsed * 1000))
+        if elapsed > self.timeout:
+            metrics.incr(f"deadline.{self.name}_overruns")
+        return False
+
+
+class Deadline:
+    """Deadline for one request, handing out stage budgets."""
+
+    def __init__(self, total, budgets):
+        self.expires = time.monotonic() + total
+        self.budgets = budgets
+
+    @classmethod
+    def from_config(cls, config=None):
+        config = config or current_app.config
+        return cls(
+            config["CHAT_DEADLINE"],
+            {stage: config[f"CHAT_{stage.upper()}_BUDGET"] for stage in STAGES},
+        )
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires - time.monotonic())
+
+    def stage(self, name) -> Stage:
+        """Budget for stage ``name``, to be used as a context manager."""
+        return Stage(name, min(self.budgets[name], self.remaining()))
@@ -0,0 +1,49 @@
+"""HTTP validators for the read-only REST endpoints.
+
+Responses only change when data is loaded, so a strong ETag built from the
+dataset version and the request (endpoint, URL arguments, query string)
+identifies a response before it is computed. ``conditional`` answers a
+matching ``If-None-Match`` with 304 from the in-process version memo
+(app.services.dataset.current_dataset_version), without querying the
+database, and marks 200 responses cacheable for ``HTTP_CACHE_MAX_AGE``
+seconds so a reverse proxy can serve repeat polls.
+"""
+
+import functools
+import hashlib
+
+from flask import current_app, make_response, request
+
+from app.services import metrics
+from app.services.dataset import current_dataset_version
+
+
+def request_etag() -> str:
+    """Strong ETag for the current request at the current dataset version."""
+    version = current_dataset_version()
+    identity = f"{request.endpoint}:{sorted(request.view_args.items())}:{request.query_string.decode()}"
+    digest = hashlib.sha256(identity.encode()).hexdigest()[:16]
+    return f"{version}-{digest}"
+
+
+def _cache_control(response):
+    max_age = current_app.config["HTTP_CACHE_MAX_AGE"]
+    response.headers["Cache-Control"] = f"public, max-age={max_age}" if max_age else "public, no-cache"
+
+
+def conditional(view):
+    """Decorator adding ETag / If-None-Match handling and Cache-Control to a GET view."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        etag = request_etag()
+        if etag in request.if_none_match:
+            metrics.incr("http.not_modified")
+            response = current_app.response_class(status=304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag)
+        _cache_control(response)
+        return response
+    return wrapper
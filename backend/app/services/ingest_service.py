@@ -0,0 +1,374 @@
+"""Bulk and incremental CSV ingestion into the transactions table.
+
+The CSV is streamed in chunks; each chunk is parsed and validated in a process
+pool and written with PostgreSQL ``COPY FROM STDIN`` (multi-row INSERTs on
+other databases, e.g. SQLite in tests).
+
+``bulk_load`` fills an empty table, dropping secondary indexes during the load
+and rebuilding them afterwards. ``append_load`` ingests only data past each
+source's stored watermark, skips rows whose natural key already exists, and
+refreshes derived data for the affected keys only.
+"""
+
+import csv
+import glob
+import hashlib
+import io
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from app.extensions import db
+from app.models import IngestWatermark, Transaction
+from app.services.dataset import bump_dataset_version
+from app.services.product_summaries import refresh_product_summaries
+from app.services.profiles import refresh_profiles
+from app.services.rollups import refresh_rollups
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 20000
+# Rows per INSERT statement on the non-PostgreSQL fallback path
+INSERT_BATCH_SIZE = 500
+
+# Transaction column <- CSV header, in COPY column order
+COLUMNS = (
+    ("customer_id", "CustomerID"),
+    ("product_id", "ProductID"),
+    ("quantity", "Quantity"),
+    ("price", "Price"),
+    ("transaction_date", "TransactionDate"),
+    ("payment_method", "PaymentMethod"),
+    ("store_location", "StoreLocation"),
+    ("product_category", "ProductCategory"),
+    ("discount_applied", "DiscountApplied(%)"),
+    ("total_amount", "TotalAmount"),
+)
+COLUMN_NAMES = tuple(col for col, _ in COLUMNS)
+
+# Columns identifying a transaction, since the dataset has no transaction ID
+NATURAL_KEY = ("customer_id", "product_id", "transaction_date", "quantity", "total_amount", "store_location")
+_KEY_POSITIONS = tuple(COLUMN_NAMES.index(col) for col in NATURAL_KEY)
+# Customer IDs per duplicate-lookup query
+DEDUPE_BATCH_SIZE = 500
+
+
+class IngestResult:
+    """Counts and affected keys from one ingest run."""
+
+    def __init__(self):
+        self.inserted = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.customer_ids = set()
+        self.product_ids = set()
+        self.categories = set()
+        self.days = set()
+
+    def add(self, records):
+        self.inserted += len(records)
+        for rec in records:
+            self.customer_ids.add(rec[0])
+            self.product_ids.add(rec[1])
+            self.days.add(rec[4].date())
+            self.categories.add(rec[7])
+
+
+def parse_date(text: str) -> datetime:
+    """Parse "M/D/YYYY H:MM" or "M/D/YYYY" without going through strptime."""
+    date_part, _, time_part = text.strip().partition(" ")
+    month, day, year = date_part.split("/")
+    hour = minute = 0
+    if time_part:
+        h, m = time_part.split(":")[:2]
+        hour, minute = int(h), int(m)
+    return datetime(int(year), int(month), int(day), hour, minute)
+
+
+def parse_record(values) -> tuple:
+    """Convert one CSV row (values in COLUMNS order) into a typed tuple.
+
+    Raises ValueError for malformed or missing fields.
+    """
+    (customer_id, product_id, quantity, price, tx_date,
+     payment_method, store_location, category, discount, total) = values
+    customer_id = customer_id.strip()
+    product_id = product_id.strip()
+    if not customer_id or not product_id:
+        raise ValueError("missing CustomerID or ProductID")
+    return (
+        customer_id,
+        product_id,
+        int(quantity),
+        float(price),
+        parse_date(tx_date),
+        payment_method.strip(),
+        store_location.strip(),
+        category.strip(),
+        float(discount),
+        float(total),
+    )
+
+
+def parse_chunk(rows) -> tuple:
+    """Parse a chunk of raw rows. Returns (records, rejected_count).
+
+    Module-level so it can run in a ProcessPoolExecutor worker.
+    """
+    records = []
+    rejected = 0
+    for values in rows:
+        try:
+            records.append(parse_record(values))
+        except (ValueError, TypeError):
+            rejected += 1
+    return records, rejected
+
+
+def iter_csv_chunks(path: str, chunk_size: int = CHUNK_SIZE, start: int = 0):
+    """Yield lists of raw rows (values reordered to COLUMNS) from a CSV file.
+
+    The csv module is used for splitting because StoreLocation values contain
+    quoted newlines. ``start`` skips that many data rows.
+    """
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        order = [header.index(name) for _, name in COLUMNS]
+        chunk = []
+        for i, row in enumerate(reader):
+            if i < start:
+                continue
+            try:
+                chunk.append([row[j] for j in order])
+            except IndexError:
+                chunk.append(None)  # counted as rejected by parse_chunk
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def _parsed_chunks(chunks, workers: int):
+    """Parse chunks in a process pool (in order), or inline for one worker."""
+    if workers <= 1:
+        for chunk in chunks:
+            yield parse_chunk(chunk)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = []
+        for chunk in chunks:
+            pending.append(pool.submit(parse_chunk, chunk))
+            # Bound the number of chunks held in memory
+            if len(pending) >= workers * 2:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+
+def write_records(conn, records) -> None:
+    """Write typed records on an open connection (COPY on PostgreSQL)."""
+    if not records:
+        return
+    if conn.dialect.name == "postgresql":
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        for rec in records:
+            writer.writerow(rec[:4] + (rec[4].isoformat(sep=" "),) + rec[5:])
+        buf.seek(0)
+        cursor = conn.connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {Transaction.__tablename__} ({', '.join(COLUMN_NAMES)}) "
+                f"FROM STDIN WITH (FORMAT csv)",
+                buf,
+            )
+        finally:
+            cursor.close()
+    else:
+        table = Transaction.__table__
+        for i in range(0, len(records), INSERT_BATCH_SIZE):
+            batch = records[i:i + INSERT_BATCH_SIZE]
+            conn.execute(table.insert().values([dict(zip(COLUMN_NAMES, rec)) for rec in batch]))
+
+
+def bulk_load(path: str, workers: int = 1, chunk_size: int = CHUNK_SIZE,
+              rebuild_indexes: bool = True, log=print) -> int:
+    """Load a CSV file into the transactions table as fast as the database allows.
+
+    Returns the number of rows written. Must run inside an app context.
+    """
+    indexes = list(Transaction.__table__.indexes) if rebuild_indexes else []
+    loaded = rejected = 0
+    started = time.perf_counter()
+
+    with db.engine.connect() as conn:
+        for index in indexes:
+            index.drop(bind=conn, checkfirst=True)
+        conn.commit()
+
+        try:
+            for records, bad in _parsed_chunks(iter_csv_chunks(path, chunk_size), workers):
+                write_records(conn, records)
+                conn.commit()
+                loaded += len(records)
+                rejected += bad
+                elapsed = time.perf_counter() - started
+                log(f"  Loaded {loaded} rows ({loaded / elapsed:,.0f} rows/s)")
+        finally:
+            if indexes:
+                log("  Rebuilding indexes ...")
+                for index in indexes:
+                    index.create(bind=conn, checkfirst=True)
+                conn.commit()
+
+    elapsed = time.perf_counter() - started
+    if rejected:
+        log(f"  Skipped {rejected} malformed rows")
+    log(f"  {loaded} rows in {elapsed:.1f}s ({loaded / max(elapsed, 1e-9):,.0f} rows/s)")
+    refresh_derived()
+    return loaded
+
+
+def refresh_derived(result: IngestResult = None) -> None:
+    """Bring derived data up to date after an ingest.
+
+    ``result`` limits the refresh to the keys an append touched; None means
+    everything may have changed (e.g. after a full bulk load).
+    """
+    if result is not None and not result.inserted:
+        return
+    refresh_rollups(None if result is None else result.days)
+    refresh_profiles(None if result is None else result.customer_ids)
+    refresh_product_summaries(None if result is None else result.product_ids)
+    bump_dataset_version()
+
+
+def _file_digest(path: str, limit: int = None) -> str:
+    """SHA-256 of a file, or of its first ``limit`` bytes."""
+    digest = hashlib.sha256()
+    remaining = limit
+    with open(path, "rb") as f:
+        while remaining is None or remaining > 0:
+            block = f.read(1 << 20 if remaining is None else min(1 << 20, remaining))
+            if not block:
+                break
+            digest.update(block)
+            if remaining is not None:
+                remaining -= len(block)
+    return digest.hexdigest()
+
+
+def _existing_keys(conn, records, since) -> set:
+    """Natural keys among ``records`` that are already stored.
+
+    Rows dated after ``since`` (the latest stored transaction_date) cannot be
+    duplicates, so only older rows are looked up.
+    """
+    candidates = [rec for rec in records if since is None or rec[4] <= since]
+    if not candidates:
+        return set()
+
+    key_cols = [getattr(Transaction, col) for col in NATURAL_KEY]
+    customers = sorted({rec[0] for rec in candidates})
+    start = min(rec[4] for rec in candidates)
+    end = max(rec[4] for rec in candidates)
+    found = set()
+    for i in range(0, len(customers), DEDUPE_BATCH_SIZE):
+        query = (
+            db.select(*key_cols)
+            .where(Transaction.customer_id.in_(customers[i:i + DEDUPE_BATCH_SIZE]))
+            .where(Transaction.transaction_date.between(start, end))
+        )
+        found.update(tuple(row) for row in conn.execute(query))
+    return found
+
+
+def _dedupe(conn, records, since, run_keys):
+    """Drop records already stored or already seen earlier in this run.
+
+    ``run_keys`` accumulates the keys inserted by the current run, so memory
+    grows with the new data only.
+    """
+    stored = _existing_keys(conn, records, since)
+    fresh = []
+    for rec in records:
+        key = tuple(rec[i] for i in _KEY_POSITIONS)
+        if key not in stored and key not in run_keys:
+            run_keys.add(key)
+            fresh.append(rec)
+    return fresh
+
+
+def _csv_sources(paths):
+    """Expand directories to the CSV files they contain, in name order."""
+    for path in paths:
+        if os.path.isdir(path):
+            yield from sorted(glob.glob(os.path.join(path, "*.csv")))
+        else:
+            yield path
+
+
+def append_load(paths, workers: int = 1, chunk_size: int = CHUNK_SIZE, log=print) -> IngestResult:
+    """Ingest only new CSV files, or rows appended to already-seen files.
+
+    Each source's watermark records how many data rows were consumed and a
+    hash of the file at that point. An unchanged file is skipped; a file that
+    grew is resumed after the watermark; a rewritten file is re-read in full
+    and relies on natural-key deduplication. Must run inside an app context.
+    """
+    result = IngestResult()
+    run_keys = set()
+    since = db.session.query(db.func.max(Transaction.transaction_date)).scalar()
+
+    for path in _csv_sources(paths):
+        source = os.path.abspath(path)
+        size = os.path.getsize(path)
+        mark = db.session.get(IngestWatermark, source)
+
+        start = 0
+        if mark is not None:
+            if size == mark.size_bytes and _file_digest(path) == mark.content_hash:
+                log(f"  {path}: unchanged, skipping")
+                continue
+            if size > mark.size_bytes and _file_digest(path, mark.size_bytes) == mark.content_hash:
+                start = mark.rows_ingested
+        log(f"  {path}: ingesting from row {start}")
+
+        consumed = start
+        max_date = mark.max_transaction_date if mark is not None and start else None
+        started = time.perf_counter()
+        with db.engine.connect() as conn:
+            for records, bad in _parsed_chunks(iter_csv_chunks(path, chunk_size, start), workers):
+                consumed += len(records) + bad
+                fresh = _dedupe(conn, records, since, run_keys)
+                write_records(conn, fresh)
+                conn.commit()
+
+                result.add(fresh)
+                result.duplicates += len(records) - len(fresh)
+                result.rejected += bad
+                if records:
+                    chunk_max = max(rec[4] for rec in records)
+                    max_date = chunk_max if max_date is None else max(max_date, chunk_max)
+                elapsed = time.perf_counter() - started
+                log(f"  Processed {consumed - start} rows ({(consumed - start) / elapsed:,.0f} rows/s)")
+
+        if mark is None:
+            mark = IngestWatermark(source=source)
+            db.session.add(mark)
+        mark.rows_ingested = consumed
+        mark.size_bytes = size
+        mark.content_hash = _file_digest(path, size)
+        mark.max_transaction_date = max_date
+        mark.updated_at = datetime.now()
+        db.session.commit()
+
+    log(f"  Inserted {result.inserted} rows, skipped {result.duplicates} duplicates"
+        f" and {result.rejected} malformed rows")
+    refresh_derived(result)
+    return result
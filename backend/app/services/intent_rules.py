@@ -0,0 +1,268 @@
+"""Deterministic intent classifier that runs before the LLM.
+
+Recognises the common, trivially parseable question shapes ("What has customer
+109318 purchased?", "Compare product A vs product B", "Total revenue by
+category") with regexes and keyword lists, and returns a classification in the
+same JSON shape as QUERY_CLASSIFICATION_PROMPT. Anything it is not sure about
+returns None so the caller falls back to GPT-4o-mini.
+"""
+
+import re
+
+# "customer 109318", "customer id #109318", "customers 109318 and 993229"
+CUSTOMER_RE = re.compile(r"\bcustomers?\s*(?:id\s*)?#?\s*(\d+)\b", re.I)
+# Bare numbers long enough to be customer IDs ("customer 109318 vs 993229");
+# only trusted once a "customer N" mention has been seen
+BARE_ID_RE = re.compile(r"(?<![\d.$])\b(\d{5,7})\b(?![\d.%])")
+# "product B", "products A and C", "product A vs product B"
+PRODUCT_RE = re.compile(
+    r"\bproducts?\s*(?:id\s*)?([a-d])\b"
+    r"(?:\s*(?:,|and|vs\.?|versus|or|&|with|to|than|against)\s*(?:products?\s*(?:id\s*)?)?([a-d])\b)?",
+    re.I,
+)
+# Mentions of a product without a recognisable A-D letter ("product X", "product 7")
+UNKNOWN_PRODUCT_RE = re.compile(r"\bproducts?\s+(?:id\s+)?(?![a-d]\b)\w\b", re.I)
+
+COMPARISON_RE = re.compile(
+    r"\b(compare|comparing|comparison|vs\.?|versus|difference between|differ|than|against)\b", re.I
+)
+# A single product next to one of these is probably half of a comparison the
+# regexes missed ("Is product A more popular than B?")
+COMPARATIVE_RE = re.compile(r"\b(than|against|better|worse|more|less)\b", re.I)
+CATEGORY_RE = re.compile(r"\b(books|electronics|clothing|home decor)\b", re.I)
+CATEGORIES = {"books": "Books", "electronics": "Electronics", "clothing": "Clothing", "home decor": "Home Decor"}
+PAYMENT_RE = re.compile(r"\b(paypal|cash|(?:credit|debit)(?=\s*cards?\b))\b", re.I)
+PAYMENT_METHODS = {"paypal": "PayPal", "cash": "Cash", "credit": "Credit Card", "debit": "Debit Card"}
+STORE_RE = re.compile(r"\b(stores?|shops?|locations?)\b", re.I)
+ANY_RE = re.compile(r"\b(either|any of|or)\b", re.I)
+# Bare capital product letters after a selling verb ("stores that sell both A and C")
+SELLING_RE = re.compile(r"\b(?:sell|sells|selling|sold|carry|carries|stock|stocks)\b(.*)", re.I)
+BARE_PRODUCT_RE = re.compile(r"\b([A-D])\b")
+COUNT_RE = re.compile(r"\b(how many|number of|count|unique|distinct)\b", re.I)
+REVENUE_RE = re.compile(
+    r"\b(revenue|sales|spend|spending|spent|amount|income|earn\w*|money|"
+    r"by category|per category|categories|payment methods?)\b",
+    re.I,
+)
+METRIC_RE = re.compile(
+    r"\b(total|average|avg|mean|overall|breakdown|revenue|sales|how many|"
+    r"number of|count|unique|distinct|trend\w*)\b",
+    re.I,
+)
+TREND_RE = re.compile(
+    r"\b(trend\w*|over time|growth|daily|monthly|month over month|"
+    r"(?:per|by|each) (?:day|month))\b",
+    re.I,
+)
+APPROXIMATE_RE = re.compile(r"\b(roughly|approximately|approx|estimated?|ballpark|ish)\b", re.I)
+# Trend rows hold revenue, transactions and units per period, nothing per
+# customer, product, store or breakdown
+TREND_UNSUPPORTED_RE = re.compile(
+    r"\b(customers?|products?|stores?|locations?|discounts?|categories|payment methods|"
+    r"(?:by|per|each) (?:category|payment))\b",
+    re.I,
+)
+DAILY_RE = re.compile(r"\b(daily|(?:per|by|each) day|day by day)\b", re.I)
+METRIC_SUBJECT_RE = re.compile(
+    r"\b(customers?|products?|transactions?|purchases?|orders?|revenue|sales|"
+    r"categor(y|ies)|payment|stores?|discounts?)\b",
+    re.I,
+)
+
+
+def _classification(intent, summary, **fields):
+    result = {
+        "intent": intent,
+        "customer_id": None,
+        "customer_id_2": None,
+        "product_id": None,
+        "product_id_2": None,
+        "summary": summary,
+    }
+    result.update(fields)
+    return result
+
+
+def _unique(values):
+    seen = []
+    for v in values:
+        if v and v not in seen:
+            seen.append(v)
+    return seen
+
+
+def _entity_spans(question: str) -> list:
+    """Return (start, end, kind, value) for each entity mention, in text order."""
+    spans = [(m.start(1), m.end(1), "customer", m.group(1)) for m in CUSTOMER_RE.finditer(question)]
+    if spans:
+        spans += [(m.start(1), m.end(1), "customer", m.group(1)) for m in BARE_ID_RE.finditer(question)]
+    for m in PRODUCT_RE.finditer(question):
+        for g in (1, 2):
+            if m.group(g):
+                spans.append((m.start(g), m.end(g), "product", m.group(g).upper()))
+    return sorted(set(spans))
+
+
+def extract_entities(question: str) -> tuple:
+    """Return (customer_ids, product_ids) mentioned in the question, in order."""
+    spans = _entity_spans(question)
+    customers = _unique(value for _, _, kind, value in spans if kind == "customer")
+    products = _unique(value for _, _, kind, value in spans if kind == "product")
+    return customers, products
+
+
+# --------------- normalization for the classification cache ---------------
+
+PUNCTUATION_RE = re.compile(r"[^\w\s<>]")
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Lower-case, strip punctuation and collapse whitespace."""
+    text = PUNCTUATION_RE.sub(" ", text.lower())
+    return WHITESPACE_RE.sub(" ", text).strip()
+
+
+def normalize_question(question: str) -> tuple:
+    """Return (template, customer_ids, product_ids) for a question.
+
+    The template is lower-cased with punctuation and repeated whitespace
+    removed, and entity IDs replaced by positional placeholders (<c1>, <p1>),
+    so "Compare product A vs B?" and "compare product c vs d" share a template.
+    """
+    spans = _entity_spans(question)
+    customers, products = extract_entities(question)
+    text = question
+    for start, end, kind, value in reversed(spans):
+        if kind == "customer":
+            placeholder = f"<c{customers.index(value) + 1}>"
+        else:
+            placeholder = f"<p{products.index(value) + 1}>"
+        text = text[:start] + placeholder + text[end:]
+    return normalize_text(text), customers, products
+
+
+ID_FIELDS = {
+    "customer_id": "customer",
+    "customer_id_2": "customer",
+    "product_id": "product",
+    "product_id_2": "product",
+}
+
+
+def to_template(classification: dict, customers: list, products: list):
+    """Replace concrete IDs in a classification with placeholders.
+
+    Returns None if the classification names an ID that does not appear in
+    the question, since such a result cannot be re-bound safely.
+    """
+    template = dict(classification)
+    for field, kind in ID_FIELDS.items():
+        value = template.get(field)
+        if value is None:
+            continue
+        ids = customers if kind == "customer" else products
+        normalized = str(value).upper() if kind == "product" else str(value)
+        if normalized not in ids:
+            return None
+        template[field] = f"<{kind[0]}{ids.index(normalized) + 1}>"
+    template["summary"] = ""
+    return template
+
+
+def bind_template(template: dict, customers: list, products: list, summary: str = "") -> dict:
+    """Fill a cached classification template with a question's concrete IDs."""
+    result = dict(template)
+    for field, kind in ID_FIELDS.items():
+        value = result.get(field)
+        if value is None:
+            continue
+        ids = customers if kind == "customer" else products
+        result[field] = ids[int(value[2:-1]) - 1]
+    result["summary"] = summary
+    return result
+
+
+def classify_by_rules(question: str):
+    """Classify a question locally, or return None when not confident."""
+    text = question.strip()
+    customers, products = extract_entities(text)
+    comparing = bool(COMPARISON_RE.search(text))
+
+    if UNKNOWN_PRODUCT_RE.search(text) and not products:
+        return None
+    if len(customers) > 2 or len(products) > 2:
+        return None
+    if customers and products:
+        return None
+
+    categories = _unique(CATEGORIES[m.lower()] for m in CATEGORY_RE.findall(text))
+    selling = SELLING_RE.search(text)
+    if STORE_RE.search(text) and selling and not products and not customers:
+        products = _unique(BARE_PRODUCT_RE.findall(selling.group(1)))
+    if (STORE_RE.search(text) and not comparing and not customers
+            and len(products) + len(categories) <= 2
+            and (categories or len(products) == 2)):
+        product_ids = products + [None] * (2 - len(products))
+        category_ids = categories + [None] * (2 - len(categories))
+        match = "any" if ANY_RE.search(text) else "all"
+        labels = [f"product {p}" for p in products] + categories
+        return _classification(
+            "store_query", "Stores selling " + (" or " if match == "any" else " and ").join(labels),
+            product_id=product_ids[0], product_id_2=product_ids[1],
+            category=category_ids[0], category_2=category_ids[1],
+            match=match,
+        )
+
+    if comparing:
+        if len(customers) == 2:
+            return _classification(
+                "comparison", f"Compare customer {customers[0]} with customer {customers[1]}",
+                customer_id=customers[0], customer_id_2=customers[1],
+            )
+        if len(products) == 2:
+            return _classification(
+                "comparison", f"Compare product {products[0]} with product {products[1]}",
+                product_id=products[0], product_id_2=products[1],
+            )
+        return None
+
+    if len(customers) == 1:
+        return _classification(
+            "customer_query", f"Information about customer {customers[0]}",
+            customer_id=customers[0],
+        )
+    if len(products) == 1:
+        if COMPARATIVE_RE.search(text):
+            return None
+        return _classification(
+            "product_query", f"Information about product {products[0]}",
+            product_id=products[0],
+        )
+    if customers or products:
+        return None
+
+    if METRIC_RE.search(text) and METRIC_SUBJECT_RE.search(text):
+        if TREND_RE.search(text):
+            payments = _unique(PAYMENT_METHODS[m.lower()] for m in PAYMENT_RE.findall(text))
+            if TREND_UNSUPPORTED_RE.search(text) or len(categories) > 1 or len(payments) > 1:
+                return None
+            scope = categories + payments
+            return _classification(
+                "business_metric", "Revenue trend" + (f" for {' and '.join(scope)}" if scope else ""),
+                metric_type="trend",
+                granularity="day" if DAILY_RE.search(text) else "month",
+                category=categories[0] if categories else None,
+                payment_method=payments[0] if payments else None,
+            )
+        is_count = bool(COUNT_RE.search(text))
+        is_revenue = bool(REVENUE_RE.search(text))
+        if is_count == is_revenue:
+            return None
+        return _classification(
+            "business_metric", "Business metrics",
+            metric_type="count" if is_count else "revenue",
+            approximate=bool(APPROXIMATE_RE.search(text)),
+        )
+
+    return None
@@ -0,0 +1,271 @@
+"""asyncio counterparts of the LLM service, used by the ASGI chat path.
+
+``AsyncLLMGateway`` mirrors ``LLMGateway`` (pooled keep-alive transport,
+concurrency cap, deadline-aware retries with the same backoff rules) on top
+of ``AsyncOpenAI``, so a waiting LLM call costs a coroutine instead of a
+worker. Prompts, parsing, rules and the classification cache are shared with
+app.services.llm_service.
+"""
+
+import asyncio
+import logging
+import os
+import time
+
+import httpx
+from openai import AsyncOpenAI, RateLimitError
+
+from app.services import metrics
+from app.services.llm_service import (
+    BACKOFF_BASE,
+    BACKOFF_MAX,
+    GENERATE_ERROR_RESPONSE,
+    HEDGE_MIN_SAMPLES,
+    LLM_CLASSIFY_TIMEOUT,
+    LLM_CONNECT_TIMEOUT,
+    LLM_GENERATE_TIMEOUT,
+    LLM_HEDGE_MAX_RATIO,
+    LLM_HEDGE_MIN_DELAY,
+    LLM_HEDGE_PERCENTILE,
+    MAX_RETRIES,
+    RETRYABLE_ERRORS,
+    DeadlineExceeded,
+    _HedgePolicy,
+    _RetryPolicy,
+    _classification_request,
+    _fallback_classification,
+    _http_limits,
+    _local_classification,
+    _parse_classification,
+    _response_request,
+    deadline_failure,
+)
+
+logger = logging.getLogger(__name__)
+
+# A waiting coroutine costs far less than a waiting thread, so one event loop
+# keeps many more calls in flight than the sync gateway's thread-sized limits
+LLM_ASYNC_MAX_CONNECTIONS = int(os.environ.get("LLM_ASYNC_MAX_CONNECTIONS", "300"))
+LLM_ASYNC_MAX_CONCURRENCY = int(os.environ.get("LLM_ASYNC_MAX_CONCURRENCY", "256"))
+
+
+class AsyncLLMGateway(_RetryPolicy, _HedgePolicy):
+    """Event-loop access point for OpenAI calls. Create it inside the loop it serves.
+
+    ``hedging`` may be another gateway whose latency history and hedge
+    spend cap this one should use (see LLMGateway.hedged_text).
+    """
+
+    def __init__(self, api_key, base_url=None, max_connections=LLM_ASYNC_MAX_CONNECTIONS,
+                 max_concurrency=LLM_ASYNC_MAX_CONCURRENCY, max_retries=MAX_RETRIES,
+                 backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX,
+                 hedge_percentile=LLM_HEDGE_PERCENTILE, hedge_min_delay=LLM_HEDGE_MIN_DELAY,
+                 hedge_max_ratio=LLM_HEDGE_MAX_RATIO, hedge_min_samples=HEDGE_MIN_SAMPLES, hedging=None):
+        self.http_client = httpx.AsyncClient(
+            limits=_http_limits(max_connections),
+            timeout=httpx.Timeout(LLM_GENERATE_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+        )
+        self.client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            http_client=self.http_client,
+            max_retries=0,
+        )
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._init_hedging(hedge_percentile, hedge_min_delay, hedge_max_ratio, hedge_min_samples)
+        self._hedging = hedging or self
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    async def _acquire(self, timeout):
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout)
+        except asyncio.TimeoutError:
+            metrics.incr("llm.concurrency_rejected")
+            raise self._timeout_error() from None
+
+    async def _backoff(self, attempt, error, deadline):
+        """Sleep before the next attempt; re-raise when out of retries, DeadlineExceeded when out of time."""
+        if attempt == self.max_retries:
+            raise error
+        if isinstance(error, RateLimitError):
+            metrics.incr("llm.rate_limited")
+        delay = self.retry_delay(attempt, error)
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            raise DeadlineExceeded() from error
+        metrics.incr("llm.retries")
+        logger.warning(f"LLM call attempt {attempt + 1} failed ({error}); retrying in {delay:.2f}s")
+        await asyncio.sleep(delay)
+
+    async def chat(self, timeout=LLM_GENERATE_TIMEOUT, deadline=None, **kwargs):
+        """Create a chat completion."""
+        for attempt in range(self.max_retries + 1):
+            attempt_timeout = self._attempt_timeout(timeout, deadline)
+            await self._acquire(attempt_timeout)
+            try:
+                return await self.client.chat.completions.create(timeout=attempt_timeout, **kwargs)
+            except RETRYABLE_ERRORS as e:
+                error = e
+            finally:
+                self._slots.release()
+            await self._backoff(attempt, error, deadline)
+
+    async def stream_chat(self, timeout=LLM_GENERATE_TIMEOUT, deadline=None, **kwargs):
+        """Yield streamed chunks, holding a slot for the whole stream. Only opening is retried."""
+        for attempt in range(self.max_retries + 1):
+            attempt_timeout = self._attempt_timeout(timeout, deadline)
+            await self._acquire(attempt_timeout)
+            try:
+                stream = await self.client.chat.completions.create(
+                    timeout=attempt_timeout, stream=True, **kwargs
+                )
+                break
+            except RETRYABLE_ERRORS as e:
+                self._slots.release()
+                error = e
+            except BaseException:
+                self._slots.release()
+                raise
+            await self._backoff(attempt, error, deadline)
+        try:
+            async for chunk in stream:
+                yield chunk
+        finally:
+            await stream.close()
+            self._slots.release()
+
+    # --------------- hedging ---------------
+
+    async def _stream_text(self, timeout, deadline, kwargs):
+        """One attempt: stream the completion and return its text."""
+        started = time.monotonic()
+        parts = []
+        async for chunk in self.stream_chat(timeout=timeout, deadline=deadline, **kwargs):
+            if chunk.choices and chunk.choices[0].delta.content:
+                parts.append(chunk.choices[0].delta.content)
+        self._hedging._record_latency(time.monotonic() - started)
+        return "".join(parts)
+
+    async def hedged_text(self, timeout=LLM_GENERATE_TIMEOUT, deadline=None, **kwargs):
+        """Return a completion's text, racing a duplicate request if the first is slow.
+
+        The duplicate is sent once the first attempt is slower than the
+        ``hedge_percentile`` of recent latencies, within the spend cap. When
+        one attempt finishes the other is cancelled, which closes its
+        stream or pending request and releases its slot straight away.
+        """
+        policy = self._hedging
+        policy._count_hedged_call()
+        attempts = [asyncio.ensure_future(self._stream_text(timeout, deadline, kwargs))]
+        delay = policy.hedge_delay()
+        if delay is not None:
+            done, _ = await asyncio.wait(attempts, timeout=delay)
+            if not done and policy._claim_hedge():
+                metrics.incr("llm.hedges_issued")
+                attempts.append(asyncio.ensure_future(self._stream_text(timeout, deadline, kwargs)))
+
+        pending, winner, error = set(attempts), None, None
+        try:
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = task
+                        break
+                    error = task.exception()
+        finally:
+            for task in pending:
+                task.cancel()
+                metrics.incr("llm.hedges_cancelled")
+            if pending:
+                await asyncio.wait(pending)
+
+        if winner is None:
+            raise error
+        if len(attempts) > 1 and winner is attempts[1]:
+            metrics.incr("llm.hedges_won")
+        return winner.result()
+
+    async def aclose(self):
+        await self.http_client.aclose()
+
+
+_gateway = None
+
+
+def get_async_gateway() -> AsyncLLMGateway:
+    """Return the worker's async gateway, creating it on first use in the running loop."""
+    global _gateway
+    if _gateway is None:
+        api_key = os.environ.get("OPENAI_API_KEY")
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY environment variable is not set")
+        _gateway = AsyncLLMGateway(api_key, base_url=os.environ.get("OPENAI_BASE_URL"))
+    return _gateway
+
+
+async def aclassify_query(question: str, timeout: float = LLM_CLASSIFY_TIMEOUT) -> dict:
+    """Async classify_query: rules, then the classification cache, then GPT-4o-mini."""
+    result, remember = _local_classification(question)
+    if result is not None:
+        return result
+
+    try:
+        response = await get_async_gateway().chat(
+            **_classification_request(question),
+            timeout=timeout,
+            deadline=time.monotonic() + timeout,
+        )
+        result = _parse_classification(response.choices[0].message.content)
+        remember(result)
+        return result
+
+    except Exception as e:
+        logger.warning(f"aclassify_query failed: {e}")
+
+    return _fallback_classification(question)
+
+
+async def agenerate_response(question: str, data: str, deadline: float = None) -> str:
+    """Async generate_response; raises DeadlineExceeded when ``deadline`` caused the failure."""
+    request = _response_request(question, data, deadline)
+    try:
+        gateway = get_async_gateway()
+        if gateway.hedge_percentile:
+            return (await gateway.hedged_text(**request)).strip()
+        response = await gateway.chat(**request)
+        return response.choices[0].message.content.strip()
+
+    except Exception as e:
+        if deadline_failure(e, deadline):
+            raise DeadlineExceeded() from e
+        logger.warning(f"agenerate_response failed: {e}")
+
+    return GENERATE_ERROR_RESPONSE
+
+
+async def astream_response(question: str, data: str, deadline: float = None):
+    """Async stream_response: yields text deltas, with the same deadline rules."""
+    started = False
+    try:
+        async for chunk in get_async_gateway().stream_chat(**_response_request(question, data, deadline)):
+            if not chunk.choices:
+                continue
+            text = chunk.choices[0].delta.content
+            if text:
+                started = True
+                yield text
+            if deadline is not None and time.monotonic() >= deadline:
+                metrics.incr("llm.streams_truncated")
+                return
+        return
+
+    except Exception as e:
+        if not started and deadline_failure(e, deadline):
+            raise DeadlineExceeded() from e
+        logger.warning(f"astream_response failed: {e}")
+        if started:
+            return
+
+    yield GENERATE_ERROR_RESPONSE
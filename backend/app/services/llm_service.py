@@ -1,10 +1,34 @@
 """OpenAI LLM service for retail analytics chat."""
 
+import asyncio
 import os
 import json
 import logging
-from openai import OpenAI
+import random
+import re
+import threading
+import time
+from collections import deque
 
+import httpx
+from openai import (
+    OpenAI,
+    APIConnectionError,
+    APITimeoutError,
+    InternalServerError,
+    RateLimitError,
+)
+
+from flask import has_app_context
+
+from app.services import metrics
+from app.services.cache import get_cache
+from app.services.intent_rules import (
+    bind_template,
+    classify_by_rules,
+    normalize_question,
+    to_template,
+)
 from app.services.prompts import (
     SYSTEM_PROMPT,
     QUERY_CLASSIFICATION_PROMPT,
@@ -15,76 +39,396 @@ logger = logging.getLogger(__name__)
 
 MAX_RETRIES = 2
 
+# Gateway settings (environment overrides)
+LLM_MAX_CONNECTIONS = int(os.environ.get("LLM_MAX_CONNECTIONS", "20"))
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "16"))
+LLM_CONNECT_TIMEOUT = float(os.environ.get("LLM_CONNECT_TIMEOUT", "5"))
+LLM_CLASSIFY_TIMEOUT = float(os.environ.get("LLM_CLASSIFY_TIMEOUT", "10"))
+LLM_GENERATE_TIMEOUT = float(os.environ.get("LLM_GENERATE_TIMEOUT", "60"))
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
 
-def get_openai_client():
-    """Get configured OpenAI client."""
-    api_key = os.environ.get("OPENAI_API_KEY")
-    if not api_key:
-        raise ValueError("OPENAI_API_KEY environment variable is not set")
-    return OpenAI(api_key=api_key)
+# Hedging: a duplicate request is sent when the first is slower than this
+# percentile of recent call latencies (0 disables). Hedges are capped at
+# LLM_HEDGE_MAX_RATIO of calls to bound the extra spend.
+LLM_HEDGE_PERCENTILE = float(os.environ.get("LLM_HEDGE_PERCENTILE", "0"))
+LLM_HEDGE_MIN_DELAY = float(os.environ.get("LLM_HEDGE_MIN_DELAY", "0.5"))
+LLM_HEDGE_MAX_RATIO = float(os.environ.get("LLM_HEDGE_MAX_RATIO", "0.1"))
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
 
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
 
-def classify_query(question: str) -> dict:
-    """
-    Use GPT-4o-mini to classify user intent and extract entities.
 
-    Returns:
-        dict with keys: intent, customer_id, product_id, summary
+class DeadlineExceeded(Exception):
+    """The caller's deadline passed before the LLM produced an answer."""
+
+
+def deadline_failure(error, deadline) -> bool:
+    """True if ``error`` means a call gave up because ``deadline`` was reached."""
+    if deadline is None:
+        return False
+    return (
+        isinstance(error, (DeadlineExceeded, APITimeoutError, httpx.TimeoutException))
+        or time.monotonic() >= deadline
+    )
+
+
+class _RetryPolicy:
+    """Timeout and backoff rules shared by the sync and async gateways."""
+
+    def _timeout_error(self):
+        return APITimeoutError(request=httpx.Request("POST", str(self.client.base_url)))
+
+    def _attempt_timeout(self, timeout, deadline):
+        """Per-attempt timeout, shortened to what is left before ``deadline``."""
+        if deadline is None:
+            return timeout
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise self._timeout_error()
+        return min(timeout, remaining)
+
+    def retry_delay(self, attempt, error):
+        """Seconds to wait before retry ``attempt`` (0-based) after ``error``."""
+        hinted = _rate_limit_hint(getattr(error, "response", None))
+        if hinted is not None:
+            return min(hinted, self.backoff_max)
+        ceiling = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+
+class _HedgePolicy:
+    """Latency history, hedge delay and spend cap shared by the sync and async gateways."""
+
+    def _init_hedging(self, percentile, min_delay, max_ratio, min_samples):
+        self.hedge_percentile = percentile
+        self.hedge_min_delay = min_delay
+        self.hedge_max_ratio = max_ratio
+        self.hedge_min_samples = min_samples
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._hedge_lock = threading.Lock()
+        self._hedged_calls = self._hedges = 0
+
+    def hedge_delay(self):
+        """Seconds to wait before hedging, or None while there is too little history."""
+        with self._hedge_lock:
+            samples = sorted(self._latencies)
+        if len(samples) < self.hedge_min_samples:
+            return None
+        if not samples:
+            return self.hedge_min_delay
+        index = min(len(samples) - 1, int(len(samples) * self.hedge_percentile / 100))
+        return max(self.hedge_min_delay, samples[index])
+
+    def _claim_hedge(self):
+        """Reserve a hedge if it stays within the spend cap."""
+        with self._hedge_lock:
+            if self._hedges + 1 > self.hedge_max_ratio * self._hedged_calls:
+                metrics.incr("llm.hedges_capped")
+                return False
+            self._hedges += 1
+            return True
+
+    def _count_hedged_call(self):
+        with self._hedge_lock:
+            self._hedged_calls += 1
+
+    def _record_latency(self, seconds):
+        with self._hedge_lock:
+            self._latencies.append(seconds)
+
+
+def _http_limits(max_connections):
+    return httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+
+
+class LLMGateway(_RetryPolicy, _HedgePolicy):
+    """Process-wide access point for OpenAI calls.
+
+    Shares one pooled keep-alive HTTP transport between all requests, caps the
+    number of in-flight calls, applies a per-call timeout, and retries
+    transient failures with jittered exponential backoff that honours the
+    provider's rate-limit headers.
     """
-    client = get_openai_client()
 
-    VALID_INTENTS = {"customer_query", "product_query", "business_metric", "comparison", "off_topic", "general"}
+    def __init__(self, api_key, base_url=None, max_connections=LLM_MAX_CONNECTIONS,
+                 max_concurrency=LLM_MAX_CONCURRENCY, max_retries=MAX_RETRIES,
+                 backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX,
+                 hedge_percentile=LLM_HEDGE_PERCENTILE, hedge_min_delay=LLM_HEDGE_MIN_DELAY,
+                 hedge_max_ratio=LLM_HEDGE_MAX_RATIO, hedge_min_samples=HEDGE_MIN_SAMPLES):
+        self.http_client = httpx.Client(
+            limits=_http_limits(max_connections),
+            timeout=httpx.Timeout(LLM_GENERATE_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+        )
+        # Retries are handled here so backoff and the concurrency cap agree
+        self.client = OpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            http_client=self.http_client,
+            max_retries=0,
+        )
+        self.max_connections = max_connections
+        self.max_concurrency = max_concurrency
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._init_hedging(hedge_percentile, hedge_min_delay, hedge_max_ratio, hedge_min_samples)
+        self._hedge_loop = self._hedge_gateway = None
+
+    def _acquire(self, timeout):
+        if not self._slots.acquire(timeout=timeout):
+            metrics.incr("llm.concurrency_rejected")
+            raise self._timeout_error()
+
+    def _with_retries(self, call, timeout, deadline=None):
+        for attempt in range(self.max_retries + 1):
+            attempt_timeout = self._attempt_timeout(timeout, deadline)
+            self._acquire(attempt_timeout)
+            try:
+                return call(attempt_timeout)
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                if isinstance(e, RateLimitError):
+                    metrics.incr("llm.rate_limited")
+                delay = self.retry_delay(attempt, e)
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    raise DeadlineExceeded() from e
+                metrics.incr("llm.retries")
+                logger.warning(f"LLM call attempt {attempt + 1} failed ({e}); retrying in {delay:.2f}s")
+            finally:
+                self._slots.release()
+            time.sleep(delay)
+
+    def chat(self, timeout=LLM_GENERATE_TIMEOUT, deadline=None, **kwargs):
+        """Create a chat completion.
+
+        ``deadline`` (a time.monotonic() value) caps every attempt's timeout;
+        a retry that could not finish before it raises DeadlineExceeded.
+        """
+        return self._with_retries(
+            lambda t: self.client.chat.completions.create(timeout=t, **kwargs),
+            timeout,
+            deadline,
+        )
 
-    for attempt in range(MAX_RETRIES):
+    def stream_chat(self, timeout=LLM_GENERATE_TIMEOUT, deadline=None, **kwargs):
+        """Yield streamed chat completion chunks, holding a slot for the whole stream.
+
+        Only opening the stream is retried.
+        """
+        def _open():
+            attempt_timeout = self._attempt_timeout(timeout, deadline)
+            self._acquire(attempt_timeout)
+            try:
+                return self.client.chat.completions.create(timeout=attempt_timeout, stream=True, **kwargs)
+            except BaseException:
+                self._slots.release()
+                raise
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                stream = _open()
+                break
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.retry_delay(attempt, e)
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    raise DeadlineExceeded() from e
+                metrics.incr("llm.retries")
+                time.sleep(delay)
         try:
-            response = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are an intent classifier for a retail analytics system. "
-                                   "Always respond with valid JSON only.",
-                    },
-                    {
-                        "role": "user",
-                        "content": QUERY_CLASSIFICATION_PROMPT.format(question=question),
-                    },
-                ],
-                max_tokens=200,
-                temperature=0.1,
-                response_format={"type": "json_object"},
-            )
-
-            content = response.choices[0].message.content.strip()
-            logger.info(f"Classification raw response: {content}")
-            result = json.loads(content)
-
-            # Normalize intent — if LLM returns something unexpected, map it
-            intent = result.get("intent", "general").lower()
-            if intent not in VALID_INTENTS:
-                # Try to map common LLM-generated intents
-                if "customer" in intent:
-                    intent = "customer_query"
-                elif "product" in intent:
-                    intent = "product_query"
-                elif any(w in intent for w in ("metric", "revenue", "business", "aggregate", "total")):
-                    intent = "business_metric"
-                else:
-                    intent = "general"
-            result["intent"] = intent
-
-            # Normalize IDs to strings
-            for key in ("customer_id", "customer_id_2", "product_id", "product_id_2"):
-                if result.get(key) is not None:
-                    result[key] = str(result[key])
-
-            result.setdefault("summary", "")
-            return result
-
-        except Exception as e:
-            logger.warning(f"classify_query attempt {attempt + 1} failed: {e}")
-
-    # Fallback
+            yield from stream
+        finally:
+            stream.close()
+            self._slots.release()
+
+    # --------------- hedging ---------------
+
+    def _hedging_gateway(self):
+        """The async gateway that runs hedged races, on a private event-loop thread.
+
+        A blocked sync request can't be interrupted from another thread, but a
+        cancelled coroutine closes its connection and frees its slot at once,
+        so races run there. It shares this gateway's latency history and
+        spend cap, and has its own ``max_concurrency`` slots.
+        """
+        with self._hedge_lock:
+            if self._hedge_gateway is None:
+                from app.services.llm_async import AsyncLLMGateway
+
+                async def create():
+                    return AsyncLLMGateway(
+                        self.client.api_key, base_url=self.client.base_url,
+                        max_connections=self.max_connections, max_concurrency=self.max_concurrency,
+                        max_retries=self.max_retries,
+                        backoff_base=self.backoff_base, backoff_max=self.backoff_max, hedging=self,
+                    )
+
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="llm-hedge", daemon=True).start()
+                self._hedge_loop = loop
+                self._hedge_gateway = asyncio.run_coroutine_threadsafe(create(), loop).result()
+            return self._hedge_gateway
+
+    def hedged_text(self, timeout=LLM_GENERATE_TIMEOUT, deadline=None, **kwargs):
+        """Return a completion's text, racing a duplicate request if the first is slow.
+
+        See AsyncLLMGateway.hedged_text; the losing attempt is cancelled as
+        soon as the winner finishes.
+        """
+        gateway = self._hedging_gateway()
+        return asyncio.run_coroutine_threadsafe(
+            gateway.hedged_text(timeout=timeout, deadline=deadline, **kwargs), self._hedge_loop
+        ).result()
+
+    def close(self):
+        if self._hedge_gateway is not None:
+            asyncio.run_coroutine_threadsafe(self._hedge_gateway.aclose(), self._hedge_loop).result()
+            self._hedge_loop.call_soon_threadsafe(self._hedge_loop.stop)
+        self.http_client.close()
+
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def _rate_limit_hint(response):
+    """Read a server-suggested wait from Retry-After style headers, in seconds."""
+    if response is None:
+        return None
+    headers = response.headers
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    if headers.get("retry-after"):
+        try:
+            return float(headers["retry-after"])
+        except ValueError:
+            pass
+    for name in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens"):
+        value = headers.get(name)
+        if value:
+            parts = _DURATION_RE.findall(value)
+            if parts:
+                return sum(float(n) * _DURATION_UNITS[unit] for n, unit in parts)
+    return None
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway() -> LLMGateway:
+    """Return the process-wide LLM gateway, creating it on first use."""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                api_key = os.environ.get("OPENAI_API_KEY")
+                if not api_key:
+                    raise ValueError("OPENAI_API_KEY environment variable is not set")
+                _gateway = LLMGateway(api_key, base_url=os.environ.get("OPENAI_BASE_URL"))
+    return _gateway
+
+
+def get_openai_client():
+    """Get the shared, pooled OpenAI client."""
+    return get_gateway().client
+
+
+VALID_INTENTS = {
+    "customer_query", "product_query", "store_query", "business_metric", "comparison", "off_topic", "general",
+}
+
+
+def _local_classification(question: str) -> tuple:
+    """Classify without the LLM where possible.
+
+    Returns (result, remember): ``result`` comes from the rules or the
+    classification cache, or is None; ``remember(result)`` caches an LLM
+    classification for the question's template.
+    """
+    result = classify_by_rules(question)
+    if result is not None:
+        metrics.incr("classifier.rule_hits")
+        logger.info(f"Classification (rules): {result}")
+        return result, None
+    metrics.incr("classifier.llm_fallbacks")
+
+    cache = get_cache("classification") if has_app_context() else None
+    template_key, customers, products = normalize_question(question)
+    if cache is not None:
+        template = cache.get(template_key)
+        if template is not None:
+            return bind_template(template, customers, products, summary=question), None
+
+    def remember(result):
+        if cache is not None:
+            template = to_template(result, customers, products)
+            if template is not None:
+                cache.set(template_key, template)
+
+    return None, remember
+
+
+def _classification_request(question: str) -> dict:
+    return dict(
+        model="gpt-4o-mini",
+        messages=[
+            {
+                "role": "system",
+                "content": "You are an intent classifier for a retail analytics system. "
+                           "Always respond with valid JSON only.",
+            },
+            {
+                "role": "user",
+                "content": QUERY_CLASSIFICATION_PROMPT.format(question=question),
+            },
+        ],
+        max_tokens=200,
+        temperature=0.1,
+        response_format={"type": "json_object"},
+    )
+
+
+def _parse_classification(content: str) -> dict:
+    content = content.strip()
+    logger.info(f"Classification raw response: {content}")
+    result = json.loads(content)
+
+    # Normalize intent — if LLM returns something unexpected, map it
+    intent = result.get("intent", "general").lower()
+    if intent not in VALID_INTENTS:
+        # Try to map common LLM-generated intents
+        if "customer" in intent:
+            intent = "customer_query"
+        elif "store" in intent:
+            intent = "store_query"
+        elif "product" in intent:
+            intent = "product_query"
+        elif any(w in intent for w in ("metric", "revenue", "business", "aggregate", "total")):
+            intent = "business_metric"
+        else:
+            intent = "general"
+    result["intent"] = intent
+
+    # Normalize IDs to strings
+    for key in ("customer_id", "customer_id_2", "product_id", "product_id_2"):
+        if result.get(key) is not None:
+            result[key] = str(result[key])
+
+    result.setdefault("summary", "")
+    return result
+
+
+def _fallback_classification(question: str) -> dict:
     return {
         "intent": "general",
         "customer_id": None,
@@ -93,42 +437,123 @@ def classify_query(question: str) -> dict:
     }
 
 
-def generate_response(question: str, data: str) -> str:
+def classify_query(question: str, timeout: float = LLM_CLASSIFY_TIMEOUT) -> dict:
+    """
+    Classify user intent and extract entities.
+
+    Trivially parseable questions are answered by the local rule classifier.
+    Otherwise the normalized question is looked up in the classification
+    cache, and only on a miss does the question go to GPT-4o-mini.
+
+    Returns:
+        dict with keys: intent, customer_id, product_id, summary
+    """
+    result, remember = _local_classification(question)
+    if result is not None:
+        return result
+
+    try:
+        response = get_gateway().chat(
+            **_classification_request(question),
+            timeout=timeout,
+            deadline=time.monotonic() + timeout,
+        )
+        result = _parse_classification(response.choices[0].message.content)
+        remember(result)
+        return result
+
+    except Exception as e:
+        logger.warning(f"classify_query failed: {e}")
+
+    return _fallback_classification(question)
+
+
+def _response_messages(question: str, data: str) -> list:
+    return [
+        {
+            "role": "system",
+            "content": SYSTEM_PROMPT,
+        },
+        {
+            "role": "user",
+            "content": RESPONSE_PROMPT.format(
+                question=question, data=data
+            ),
+        },
+    ]
+
+
+def _response_request(question: str, data: str, deadline: float = None) -> dict:
+    return dict(
+        model="gpt-4o",
+        messages=_response_messages(question, data),
+        max_tokens=1000,
+        temperature=0.5,
+        timeout=LLM_GENERATE_TIMEOUT,
+        deadline=deadline,
+    )
+
+
+GENERATE_ERROR_RESPONSE = "Sorry, I couldn't generate a response right now. Please try again."
+
+
+def generate_response(question: str, data: str, deadline: float = None) -> str:
     """
     Use GPT-4o to generate a natural language response using retrieved data.
 
     Args:
         question: The user's original question
         data: Formatted string of data retrieved from the database
+        deadline: Optional time.monotonic() value to answer by; a failure
+            caused by it (a timeout, a retry or hedge that ran out of time)
+            raises DeadlineExceeded instead of returning an apology
 
     Returns:
         Natural language response string
     """
-    client = get_openai_client()
+    request = _response_request(question, data, deadline)
+    try:
+        gateway = get_gateway()
+        if gateway.hedge_percentile:
+            return gateway.hedged_text(**request).strip()
+        response = gateway.chat(**request)
+        return response.choices[0].message.content.strip()
 
-    for attempt in range(MAX_RETRIES):
-        try:
-            response = client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": SYSTEM_PROMPT,
-                    },
-                    {
-                        "role": "user",
-                        "content": RESPONSE_PROMPT.format(
-                            question=question, data=data
-                        ),
-                    },
-                ],
-                max_tokens=1000,
-                temperature=0.5,
-            )
-
-            return response.choices[0].message.content.strip()
-
-        except Exception as e:
-            logger.warning(f"generate_response attempt {attempt + 1} failed: {e}")
-
-    return "Sorry, I couldn't generate a response right now. Please try again."
+    except Exception as e:
+        if deadline_failure(e, deadline):
+            raise DeadlineExceeded() from e
+        logger.warning(f"generate_response failed: {e}")
+
+    return GENERATE_ERROR_RESPONSE
+
+
+def stream_response(question: str, data: str, deadline: float = None):
+    """
+    Stream a GPT-4o response as it is generated.
+
+    Yields text deltas. If the stream breaks after text has been sent, it
+    simply ends there; the same goes for ``deadline`` passing mid-stream. If
+    the deadline passes before any text, DeadlineExceeded is raised.
+    """
+    started = False
+    try:
+        for chunk in get_gateway().stream_chat(**_response_request(question, data, deadline)):
+            if not chunk.choices:
+                continue
+            text = chunk.choices[0].delta.content
+            if text:
+                started = True
+                yield text
+            if deadline is not None and time.monotonic() >= deadline:
+                metrics.incr("llm.streams_truncated")
+                return
+        return
+
+    except Exception as e:
+        if not started and deadline_failure(e, deadline):
+            raise DeadlineExceeded() from e
+        logger.warning(f"stream_response failed: {e}")
+        if started:
+            return
+
+    yield GENERATE_ERROR_RESPONSE
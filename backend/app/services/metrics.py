@@ -0,0 +1,36 @@
+"""Process-wide counters for the chat pipeline, exposed at /api/metrics."""
+
+import threading
+from collections import defaultdict
+
+_lock = threading.Lock()
+_counters = defaultdict(int)
+
+
+def incr(name: str, amount: int = 1) -> None:
+    """Increment a named counter."""
+    with _lock:
+        _counters[name] += amount
+
+
+def get(name: str) -> int:
+    with _lock:
+        return _counters.get(name, 0)
+
+
+def ratio(hits: str, misses: str):
+    """Return hits / (hits + misses) for two counters, or None before any traffic."""
+    with _lock:
+        h, m = _counters.get(hits, 0), _counters.get(misses, 0)
+    return round(h / (h + m), 4) if h + m else None
+
+
+def snapshot() -> dict:
+    """Return a copy of all counters."""
+    with _lock:
+        return dict(sorted(_counters.items()))
+
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
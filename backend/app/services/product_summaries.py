@@ -0,0 +1,113 @@
+"""Per-product summaries kept alongside the transactions table.
+
+``product_summaries`` holds one row per product with its sums, counts,
+category and payment histograms and a HyperLogLog sketch of its distinct
+customers, so a product question reads one row however many transactions
+the product has. Stores come from the exact store index instead.
+
+Appends only add rows, so ``refresh_product_summaries`` folds in just the
+transactions past each summary's ``max_id``; sums add up and sketches merge.
+A full refresh (after a bulk load) rebuilds every summary.
+"""
+
+from sqlalchemy import func
+
+from app.extensions import db
+from app.models import ProductSummary, Transaction
+from app.services.aggregates import SAMPLE_SIZE
+from app.services.sketch import HyperLogLog
+
+# Rows fetched at a time when streaming distinct customers into the sketch
+STREAM_BATCH_SIZE = 10000
+
+
+def _empty(product_id) -> ProductSummary:
+    return ProductSummary(
+        product_id=product_id, max_id=0, tx_count=0, total_quantity=0,
+        revenue=0.0, sum_price=0.0, sum_discount=0.0,
+        revenue_by_category={}, count_by_category={},
+        revenue_by_payment={}, count_by_payment={},
+        sample_quantities=[], sample_amounts=[], customer_sketch=HyperLogLog().to_bytes(),
+    )
+
+
+def _fold(summary: ProductSummary):
+    """Add the product's transactions past ``summary.max_id`` to the summary."""
+    T = Transaction
+    criteria = [T.product_id == summary.product_id, T.id > summary.max_id]
+
+    # JSON columns are replaced rather than mutated so the change is tracked
+    rev_cat, cnt_cat = dict(summary.revenue_by_category), dict(summary.count_by_category)
+    rev_pm, cnt_pm = dict(summary.revenue_by_payment), dict(summary.count_by_payment)
+    max_id = summary.max_id
+    for cat, pm, cnt, qty, rev, price, disc, last_id in (
+        db.session.query(
+            T.product_category, T.payment_method, func.count(T.id), func.sum(T.quantity),
+            func.sum(T.total_amount), func.sum(T.price), func.sum(T.discount_applied), func.max(T.id),
+        )
+        .filter(*criteria)
+        .group_by(T.product_category, T.payment_method)
+    ):
+        summary.tx_count += cnt
+        summary.total_quantity += qty
+        summary.revenue += rev
+        summary.sum_price += price
+        summary.sum_discount += disc
+        rev_cat[cat] = rev_cat.get(cat, 0) + rev
+        cnt_cat[cat] = cnt_cat.get(cat, 0) + cnt
+        rev_pm[pm] = rev_pm.get(pm, 0) + rev
+        cnt_pm[pm] = cnt_pm.get(pm, 0) + cnt
+        max_id = max(max_id, last_id)
+    if max_id == summary.max_id:
+        return
+    summary.revenue_by_category, summary.count_by_category = rev_cat, cnt_cat
+    summary.revenue_by_payment, summary.count_by_payment = rev_pm, cnt_pm
+
+    customers = HyperLogLog.from_bytes(summary.customer_sketch)
+    customers.update(
+        cid for (cid,) in
+        db.session.query(T.customer_id).filter(*criteria).distinct()
+        .execution_options(yield_per=STREAM_BATCH_SIZE)
+    )
+    summary.customer_sketch = customers.to_bytes()
+
+    missing = SAMPLE_SIZE - len(summary.sample_amounts)
+    if missing > 0:
+        rows = (
+            db.session.query(T.quantity, T.total_amount)
+            .filter(*criteria).order_by(T.id).limit(missing).all()
+        )
+        summary.sample_quantities = summary.sample_quantities + [q for q, _ in rows]
+        summary.sample_amounts = summary.sample_amounts + [a for _, a in rows]
+
+    summary.max_id = max_id
+
+
+def refresh_product_summaries(product_ids=None) -> int:
+    """Fold new transactions into the summaries of ``product_ids``.
+
+    With None every summary is rebuilt from scratch. Returns the number of
+    summaries written.
+    """
+    if product_ids is None:
+        db.session.query(ProductSummary).delete()
+        product_ids = [p for (p,) in db.session.query(Transaction.product_id).distinct()]
+
+    for product_id in sorted(product_ids):
+        summary = db.session.get(ProductSummary, product_id)
+        if summary is None:
+            summary = _empty(product_id)
+            db.session.add(summary)
+        _fold(summary)
+    db.session.commit()
+    return len(product_ids)
+
+
+def product_summaries_ready() -> bool:
+    """True once summaries have been built (there is one per product)."""
+    return db.session.query(ProductSummary.product_id).limit(1).first() is not None
+
+
+def get_product_summary(product_id: str):
+    """Return the ProductSummary for ``product_id``, or None."""
+    return db.session.get(ProductSummary, product_id)
@@ -0,0 +1,116 @@
+"""Per-customer profiles kept alongside the transactions table.
+
+``customer_profiles`` holds one row per customer with their totals, category
+and payment mix and the first few amounts, so customer summaries and
+comparisons are a primary-key lookup instead of a scan of the customer's
+transactions. Profiles are rebuilt for the customers an ingest touched
+(``refresh_profiles``) from app.services.ingest_service.refresh_derived.
+Until they have been built, readers fall back to aggregating transactions.
+"""
+
+from sqlalchemy import distinct, func
+
+from app.extensions import db
+from app.models import CustomerProfile, Transaction
+from app.services.aggregates import SAMPLE_SIZE
+
+# Customer IDs per IN (...) list when refreshing touched customers
+REFRESH_BATCH_SIZE = 500
+INSERT_BATCH_SIZE = 1000
+
+
+def _build(criteria) -> list:
+    """Profile rows for the customers matching ``criteria``."""
+    T = Transaction
+    profiles = {}
+    for cid, cat, pm, cnt, qty, spend, price, disc, first, last in (
+        db.session.query(
+            T.customer_id, T.product_category, T.payment_method,
+            func.count(T.id), func.sum(T.quantity), func.sum(T.total_amount),
+            func.sum(T.price), func.sum(T.discount_applied),
+            func.min(T.transaction_date), func.max(T.transaction_date),
+        )
+        .filter(*criteria)
+        .group_by(T.customer_id, T.product_category, T.payment_method)
+    ):
+        p = profiles.get(cid)
+        if p is None:
+            p = profiles[cid] = {
+                "customer_id": cid, "tx_count": 0, "total_quantity": 0,
+                "total_spend": 0.0, "sum_price": 0.0, "sum_discount": 0.0,
+                "product_count": 0, "first_purchase": first, "last_purchase": last,
+                "spend_by_category": {}, "count_by_category": {},
+                "spend_by_payment": {}, "count_by_payment": {},
+                "sample_quantities": [], "sample_amounts": [],
+            }
+        p["tx_count"] += cnt
+        p["total_quantity"] += qty
+        p["total_spend"] += spend
+        p["sum_price"] += price
+        p["sum_discount"] += disc
+        p["first_purchase"] = min(p["first_purchase"], first)
+        p["last_purchase"] = max(p["last_purchase"], last)
+        p["spend_by_category"][cat] = p["spend_by_category"].get(cat, 0) + spend
+        p["count_by_category"][cat] = p["count_by_category"].get(cat, 0) + cnt
+        p["spend_by_payment"][pm] = p["spend_by_payment"].get(pm, 0) + spend
+        p["count_by_payment"][pm] = p["count_by_payment"].get(pm, 0) + cnt
+
+    for cid, n in (
+        db.session.query(T.customer_id, func.count(distinct(T.product_id)))
+        .filter(*criteria)
+        .group_by(T.customer_id)
+    ):
+        profiles[cid]["product_count"] = n
+
+    position = func.row_number().over(partition_by=T.customer_id, order_by=T.id).label("position")
+    ranked = db.session.query(T.customer_id, T.quantity, T.total_amount, position).filter(*criteria).subquery()
+    for cid, qty, amount in (
+        db.session.query(ranked.c.customer_id, ranked.c.quantity, ranked.c.total_amount)
+        .filter(ranked.c.position <= SAMPLE_SIZE)
+        .order_by(ranked.c.customer_id, ranked.c.position)
+    ):
+        profiles[cid]["sample_quantities"].append(qty)
+        profiles[cid]["sample_amounts"].append(amount)
+
+    return list(profiles.values())
+
+
+def _insert(rows):
+    for i in range(0, len(rows), INSERT_BATCH_SIZE):
+        db.session.execute(CustomerProfile.__table__.insert(), rows[i:i + INSERT_BATCH_SIZE])
+
+
+def refresh_profiles(customer_ids=None) -> int:
+    """Rebuild the profiles of ``customer_ids`` (every customer when None).
+
+    Returns the number of profiles written.
+    """
+    written = 0
+    if customer_ids is None:
+        db.session.query(CustomerProfile).delete()
+        rows = _build([])
+        _insert(rows)
+        written = len(rows)
+    else:
+        ids = sorted(customer_ids)
+        for i in range(0, len(ids), REFRESH_BATCH_SIZE):
+            batch = ids[i:i + REFRESH_BATCH_SIZE]
+            (db.session.query(CustomerProfile)
+             .filter(CustomerProfile.customer_id.in_(batch))
+             .delete(synchronize_session=False))
+            rows = _build([Transaction.customer_id.in_(batch)])
+            _insert(rows)
+            written += len(rows)
+    db.session.commit()
+    return written
+
+
+def profiles_ready() -> bool:
+    """True once profiles have been built (there is one per customer)."""
+    return db.session.query(CustomerProfile.customer_id).limit(1).first() is not None
+
+
+def get_profile(customer_id: str):
+    """Return the CustomerProfile for ``customer_id``, or None."""
+    return db.session.get(CustomerProfile, customer_id)
+
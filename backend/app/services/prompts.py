@@ -25,17 +25,23 @@ When store locations are listed, mention the total count and show some examples.
 QUERY_CLASSIFICATION_PROMPT = """Classify this retail analytics question into exactly one intent.
 
 You MUST return a JSON object with these exact keys:
-- "intent": MUST be exactly one of: "customer_query", "product_query", "business_metric", "comparison", "off_topic", "general"
+- "intent": MUST be exactly one of: "customer_query", "product_query", "store_query", "business_metric", "comparison", "off_topic", "general"
 - "customer_id": the first numeric customer ID if mentioned (as a string), or null
 - "customer_id_2": the second numeric customer ID if comparing two customers (as a string), or null
 - "product_id": the first single-letter product ID (A/B/C/D) if mentioned, or null
 - "product_id_2": the second single-letter product ID if comparing two products, or null
-- "metric_type": only when intent is "business_metric", set to "revenue" if the question is about revenue, spending, sales amounts, or category/payment breakdowns; set to "count" if the question is about counts or totals of customers, products, or transactions; otherwise null
+- "metric_type": only when intent is "business_metric", set to "revenue" if the question is about revenue, spending, sales amounts, or category/payment breakdowns; set to "count" if the question is about counts or totals of customers, products, or transactions; set to "trend" if the question is about changes over time (daily, monthly, trends, growth); otherwise null
+- "approximate": true only when intent is "business_metric" and the question asks for a rough or approximate figure, otherwise false
+- "granularity": only when metric_type is "trend", set to "day" for daily questions, otherwise "month"
+- "category", "category_2": only when intent is "store_query", the product categories mentioned (exactly one of "Books", "Electronics", "Clothing", "Home Decor"), or null; when metric_type is "trend", set "category" to the one category the trend is limited to, or null
+- "payment_method": only when metric_type is "trend", the one payment method the trend is limited to (exactly one of "Credit Card", "Debit Card", "PayPal", "Cash"), or null
+- "match": only when intent is "store_query", "any" if stores selling either item are wanted, otherwise "all"
 - "summary": a brief description of what the user wants
 
 Rules:
 - If the question is NOT about retail, transactions, customers, products, or business data → "off_topic"
 - If the question compares two customers or two products → "comparison"
+- If the question asks which or how many stores sell two products, a product and a category, or a category → "store_query"
 - If the question mentions a specific customer or customer ID → "customer_query"
 - If the question mentions a specific product or product ID → "product_query"
 - If the question asks about totals, averages, revenue, trends → "business_metric"
@@ -0,0 +1,58 @@
+"""Cache for formatted retrieval results and chart payloads.
+
+Transactions only change when data is loaded, so a data_service or
+chart_service result is fully determined by the function, its arguments and
+the dataset version. ``cached_result`` keys entries on all three: a load
+bumps the version (app.services.dataset) and old entries are never read
+again, ageing out of the LRU instead of being invalidated one by one.
+
+Entries live in the "results" cache (``RESULTS_CACHE_SIZE`` /
+``RESULTS_CACHE_TTL``, shared through Redis with ``CACHE_BACKEND=redis``);
+hits and misses are counted as ``results.hits`` / ``results.misses``.
+"""
+
+import functools
+import json
+
+from flask import has_app_context
+
+from app.services import metrics
+from app.services.cache import get_cache
+from app.services.dataset import current_dataset_version
+
+_SCALARS = (str, int, float, bool, type(None))
+
+
+def _cacheable(value) -> bool:
+    if isinstance(value, (list, tuple)):
+        return all(isinstance(v, _SCALARS) for v in value)
+    return isinstance(value, _SCALARS)
+
+
+def cached_result(name, encode=None, decode=None):
+    """Decorator caching a JSON-serializable result per dataset version.
+
+    Calls with pre-loaded rows or summaries (anything but scalars and lists
+    of scalars) bypass the cache, as do calls outside an app context.
+    ``encode``/``decode`` convert other results to and from a cacheable form.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not has_app_context() or not all(map(_cacheable, (*args, *kwargs.values()))):
+                return fn(*args, **kwargs)
+
+            cache = get_cache("results")
+            key = f"{name}:{current_dataset_version()}:{json.dumps([args, kwargs], sort_keys=True)}"
+            entry = cache.get(key)
+            if entry is not None:
+                metrics.incr("results.hits")
+                return decode(entry["value"]) if decode else entry["value"]
+
+            metrics.incr("results.misses")
+            value = fn(*args, **kwargs)
+            # Wrapped so a cached None (no chart) is told apart from a miss
+            cache.set(key, {"value": encode(value) if encode else value})
+            return value
+        return wrapper
+    return decorator
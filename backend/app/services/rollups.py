@@ -0,0 +1,146 @@
+"""Time-bucketed rollup cube over the transactions table.
+
+``transaction_rollups`` holds one row per (day, category, payment method,
+product) with counts and sums, so business metrics and revenue trends are
+answered from a few thousand rows no matter how many transactions exist.
+Months are stored alongside days for monthly grouping.
+
+The cube is rebuilt for the days an ingest touched (``refresh_rollups``) from
+app.services.ingest_service.refresh_derived. Until it has been built, readers
+fall back to scanning transactions.
+"""
+
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import and_, func, or_
+
+from app.extensions import db
+from app.models import Transaction, TransactionRollup
+
+GRANULARITIES = ("day", "month")
+INSERT_BATCH_SIZE = 1000
+# Day ranges rebuilt per query on incremental refreshes
+RANGE_BATCH_SIZE = 100
+
+# Filters readers may apply, shared by the cube and the transactions table
+FILTER_COLUMNS = ("product_category", "payment_method", "product_id")
+
+
+def _as_date(value):
+    """DATE() returns a string on SQLite and a date on PostgreSQL."""
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _day_ranges(days) -> list:
+    """Group ``days`` into [first, end) ranges of consecutive days."""
+    ranges = []
+    for d in sorted(set(days)):
+        if ranges and ranges[-1][1] == d:
+            ranges[-1][1] = d + timedelta(days=1)
+        else:
+            ranges.append([d, d + timedelta(days=1)])
+    return ranges
+
+
+def _rebuild(ranges=None) -> int:
+    """Replace the cube rows within ``ranges`` (every row when None); returns rows written."""
+    T = Transaction
+    day = func.date(T.transaction_date)
+    query = db.session.query(
+        day, T.product_category, T.payment_method, T.product_id,
+        func.count(T.id), func.sum(T.quantity), func.sum(T.total_amount),
+        func.sum(T.price), func.sum(T.discount_applied),
+    )
+    stale = db.session.query(TransactionRollup)
+    if ranges is not None:
+        query = query.filter(or_(*(
+            and_(T.transaction_date >= datetime.combine(start, time()),
+                 T.transaction_date < datetime.combine(end, time()))
+            for start, end in ranges
+        )))
+        stale = stale.filter(or_(*(
+            and_(TransactionRollup.day >= start, TransactionRollup.day < end) for start, end in ranges
+        )))
+
+    stale.delete(synchronize_session=False)
+    rows = []
+    for d, cat, pm, pid, cnt, qty, rev, price, disc in query.group_by(
+        day, T.product_category, T.payment_method, T.product_id
+    ):
+        d = _as_date(d)
+        rows.append({
+            "day": d, "month": d.replace(day=1),
+            "product_category": cat, "payment_method": pm, "product_id": pid,
+            "tx_count": cnt, "total_quantity": qty, "revenue": rev,
+            "sum_price": price, "sum_discount": disc,
+        })
+    for i in range(0, len(rows), INSERT_BATCH_SIZE):
+        db.session.execute(TransactionRollup.__table__.insert(), rows[i:i + INSERT_BATCH_SIZE])
+    return len(rows)
+
+
+def refresh_rollups(days=None) -> int:
+    """Rebuild the cube rows for ``days`` (every day when None) from transactions.
+
+    Only the given days are touched: consecutive days are read as one
+    transaction_date range, RANGE_BATCH_SIZE ranges per query, so the work
+    follows the size of the load rather than the span of dates it covers.
+    Returns the rows written.
+    """
+    if days is None:
+        written = _rebuild()
+    else:
+        ranges = _day_ranges(days)
+        written = sum(
+            _rebuild(ranges[i:i + RANGE_BATCH_SIZE]) for i in range(0, len(ranges), RANGE_BATCH_SIZE)
+        )
+    db.session.commit()
+    return written
+
+
+def rollups_ready() -> bool:
+    """True once the cube has been built (it is never empty for a non-empty table)."""
+    return db.session.query(TransactionRollup.day).limit(1).first() is not None
+
+
+def trend(granularity="month", **filters) -> list:
+    """Return [(period_start, count, quantity, revenue, sum_discount)] in date order.
+
+    ``filters`` may restrict product_category, payment_method or product_id.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {GRANULARITIES}")
+    unknown = set(filters) - set(FILTER_COLUMNS)
+    if unknown:
+        raise ValueError(f"unsupported trend filters: {sorted(unknown)}")
+
+    if rollups_ready():
+        R = TransactionRollup
+        period = R.day if granularity == "day" else R.month
+        rows = (
+            db.session.query(period, func.sum(R.tx_count), func.sum(R.total_quantity),
+                             func.sum(R.revenue), func.sum(R.sum_discount))
+            .filter(*[getattr(R, col) == val for col, val in filters.items()])
+            .group_by(period)
+            .order_by(period)
+        )
+        return [(_as_date(p), cnt, qty, rev, disc) for p, cnt, qty, rev, disc in rows]
+
+    # Cube not built yet: scan transactions by day and bucket here
+    T = Transaction
+    day = func.date(T.transaction_date)
+    buckets = {}
+    for d, cnt, qty, rev, disc in (
+        db.session.query(day, func.count(T.id), func.sum(T.quantity),
+                         func.sum(T.total_amount), func.sum(T.discount_applied))
+        .filter(*[getattr(T, col) == val for col, val in filters.items()])
+        .group_by(day)
+    ):
+        d = _as_date(d)
+        key = d if granularity == "day" else d.replace(day=1)
+        b = buckets.setdefault(key, [0, 0, 0.0, 0.0])
+        b[0] += cnt
+        b[1] += qty
+        b[2] += rev
+        b[3] += disc
+    return [(key, *buckets[key]) for key in sorted(buckets)]
@@ -0,0 +1,123 @@
+"""Request coalescing: identical in-flight calls share one execution.
+
+``SingleFlight`` coalesces across threads in a worker. ``RedisSingleFlight``
+additionally coalesces across workers: one worker takes a short Redis lock and
+publishes its result for ``result_ttl`` seconds, the others poll for it (and
+run the call themselves if it does not show up in time). Results shared
+through Redis must be JSON-serializable.
+"""
+
+import json
+import threading
+import time
+
+from flask import current_app
+
+from app.services import metrics
+
+_EXTENSION_KEY = "singleflight"
+_create_lock = threading.Lock()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key within this process."""
+
+    def __init__(self, wait_timeout=120):
+        self.wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """Run ``fn()`` once for all concurrent callers with ``key``.
+
+        Returns (result, shared) where ``shared`` is True for callers that
+        received another caller's result. The leader's exception is re-raised
+        in every waiter.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            metrics.incr("singleflight.shared")
+            if not call.done.wait(self.wait_timeout):
+                raise TimeoutError(f"timed out waiting for in-flight call {key}")
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        metrics.incr("singleflight.leaders")
+        try:
+            call.result = self._execute(key, fn)
+            return call.result, False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def _execute(self, key, fn):
+        return fn()
+
+
+class RedisSingleFlight(SingleFlight):
+    """Coalesce across workers through Redis, on top of in-process coalescing."""
+
+    def __init__(self, url, wait_timeout=120, result_ttl=5, poll_interval=0.05, client=None):
+        super().__init__(wait_timeout)
+        if client is None:
+            import redis  # optional dependency, only needed for this backend
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+
+    def _execute(self, key, fn):
+        lock_key, result_key = f"singleflight:lock:{key}", f"singleflight:result:{key}"
+
+        deadline = time.monotonic() + self.wait_timeout
+        locked = False
+        while True:
+            raw = self.client.get(result_key)
+            if raw is not None:
+                metrics.incr("singleflight.shared_remote")
+                return json.loads(raw)
+            locked = self.client.set(lock_key, "1", nx=True, px=int(self.wait_timeout * 1000))
+            if locked or time.monotonic() >= deadline:
+                break  # leader, or the other worker is stuck and we answer ourselves
+            time.sleep(self.poll_interval)
+
+        try:
+            result = fn()
+            self.client.set(result_key, json.dumps(result), ex=self.result_ttl)
+            return result
+        finally:
+            if locked:
+                self.client.delete(lock_key)
+
+
+def get_singleflight() -> SingleFlight:
+    """Return the current app's coalescer (``COALESCE_BACKEND``: memory or redis)."""
+    app = current_app._get_current_object()
+    flight = app.extensions.get(_EXTENSION_KEY)
+    if flight is None:
+        with _create_lock:
+            flight = app.extensions.get(_EXTENSION_KEY)
+            if flight is None:
+                if app.config.get("COALESCE_BACKEND") == "redis":
+                    flight = RedisSingleFlight(app.config["REDIS_URL"])
+                else:
+                    flight = SingleFlight()
+                app.extensions[_EXTENSION_KEY] = flight
+    return flight
@@ -0,0 +1,72 @@
+"""HyperLogLog distinct-count sketch.
+
+A sketch is ``2 ** precision`` one-byte registers (4 KiB at the default
+precision of 12), so it can be stored in a row and merged with another
+sketch without keeping the values. Counts are within about
+``1.04 / sqrt(2 ** precision)`` (1.6%) of the true number of distinct values,
+and exact-ish for small sets thanks to linear counting.
+"""
+
+import hashlib
+import math
+
+HLL_PRECISION = 12
+
+
+def _hash(value) -> int:
+    return int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), "big")
+
+
+class HyperLogLog:
+    """Mergeable estimate of the number of distinct values added."""
+
+    def __init__(self, precision=HLL_PRECISION, registers=None):
+        self.precision = precision
+        self.m = 1 << precision
+        self.registers = bytearray(registers) if registers is not None else bytearray(self.m)
+        if len(self.registers) != self.m:
+            raise ValueError(f"expected {self.m} registers, got {len(self.registers)}")
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Rebuild a sketch from to_bytes(); the precision follows from the length."""
+        return cls(int(math.log2(len(data))), data)
+
+    def to_bytes(self) -> bytes:
+        return bytes(self.registers)
+
+    def add(self, value):
+        h = _hash(value)
+        index = h & (self.m - 1)
+        rest = h >> self.precision
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values):
+        for value in values:
+            self.add(value)
+        return self
+
+    def merge(self, other):
+        """Fold ``other`` (same precision) into this sketch."""
+        if other.m != self.m:
+            raise ValueError("cannot merge sketches of different precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self) -> int:
+        m = self.m
+        zeros = self.registers.count(0)
+        if zeros == m:
+            return 0
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)  # linear counting for small sets
+        return round(estimate)
+
+    @property
+    def relative_error(self) -> float:
+        """Standard error of count() as a fraction of the true value."""
+        return 1.04 / math.sqrt(self.m)
@@ -0,0 +1,212 @@
+"""In-process columnar snapshot of the transactions table.
+
+When ``ANALYTICS_ENGINE`` is ``"snapshot"`` each worker loads the table once
+into NumPy arrays (categorical columns dictionary-encoded as integer codes)
+and answers TransactionSummary requests with vectorized group-bys instead of
+SQL. When the dataset version changes the snapshot appends the rows past
+its last id (a full reload only if rows were removed or rewritten).
+
+The snapshot backs data_service.load_summary, the scan path. Once the
+derived tables (rollups, customer profiles, product summaries) are built
+they answer whole-table, per-customer and per-product questions, and the
+snapshot serves what they can't: date-ranged customer totals, and every
+question on a database whose derived tables are not built yet.
+"""
+
+import logging
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from flask import current_app
+from sqlalchemy import func
+
+from app.extensions import db
+from app.models import Transaction
+from app.services.aggregates import SAMPLE_SIZE, STORE_SAMPLE_SIZE, TransactionSummary
+from app.services.dataset import get_dataset_version
+
+logger = logging.getLogger(__name__)
+
+CATEGORICAL_COLUMNS = ("customer_id", "product_id", "product_category", "payment_method", "store_location")
+NUMERIC_COLUMNS = ("quantity", "price", "discount_applied", "total_amount")
+
+_EXTENSION_KEY = "transaction_snapshot"
+_lock = threading.Lock()
+
+
+class TransactionSnapshot:
+    """Columnar copy of the transactions table at one dataset version."""
+
+    def __init__(self, version, max_id, codes, categories, numeric, dates):
+        self.version = version
+        self.max_id = max_id
+        self.codes = codes            # column -> int32 code array
+        self.categories = categories  # column -> sorted array of distinct values
+        self.numeric = numeric        # column -> float64/int64 array
+        self.dates = dates            # transaction_date as datetime64[us]
+        self.size = len(numeric["total_amount"])
+        self.checked_at = time.monotonic()
+
+    @staticmethod
+    def _read(after_id=None):
+        """Read rows (ordered by id), optionally only those past ``after_id``."""
+        columns = [
+            getattr(Transaction, c)
+            for c in ("id", "transaction_date") + CATEGORICAL_COLUMNS + NUMERIC_COLUMNS
+        ]
+        query = db.select(*columns).order_by(Transaction.id)
+        if after_id is not None:
+            query = query.where(Transaction.id > after_id)
+        with db.engine.connect() as conn:
+            return pd.read_sql(query, conn)
+
+    @staticmethod
+    def _dates(df):
+        return pd.to_datetime(df["transaction_date"]).to_numpy(dtype="datetime64[us]")
+
+    @staticmethod
+    def _numeric(df):
+        return {
+            "quantity": df["quantity"].to_numpy(dtype=np.int64),
+            "price": df["price"].to_numpy(dtype=np.float64),
+            "discount_applied": df["discount_applied"].to_numpy(dtype=np.float64),
+            "total_amount": df["total_amount"].to_numpy(dtype=np.float64),
+        }
+
+    @classmethod
+    def load(cls):
+        """Read the whole table (ordered by id) and encode it column by column."""
+        version = get_dataset_version()
+        df = cls._read()
+
+        codes, categories = {}, {}
+        for col in CATEGORICAL_COLUMNS:
+            col_codes, uniques = pd.factorize(df[col], sort=True)
+            codes[col] = col_codes.astype(np.int32)
+            categories[col] = np.asarray(uniques, dtype=object)
+
+        max_id = int(df["id"].max()) if len(df) else 0
+        logger.info(f"Loaded transaction snapshot v{version}: {len(df)} rows")
+        return cls(version, max_id, codes, categories, cls._numeric(df), cls._dates(df))
+
+    def refreshed(self):
+        """Return a snapshot for the current dataset version.
+
+        Appended rows are read and merged into the existing dictionaries; if
+        the table no longer extends this snapshot, it is reloaded in full.
+        """
+        version = get_dataset_version()
+        df = self._read(after_id=self.max_id)
+        total = db.session.query(func.count(Transaction.id)).scalar()
+        if total != self.size + len(df):
+            return TransactionSnapshot.load()
+
+        codes, categories = {}, {}
+        for col in CATEGORICAL_COLUMNS:
+            old_cats = self.categories[col]
+            new_values = df[col].to_numpy(dtype=object)
+            cats = np.union1d(old_cats, new_values).astype(object)
+            remap = np.searchsorted(cats, old_cats).astype(np.int32)
+            codes[col] = np.concatenate([
+                remap[self.codes[col]],
+                np.searchsorted(cats, new_values).astype(np.int32),
+            ])
+            categories[col] = cats
+
+        new_numeric = self._numeric(df)
+        numeric = {col: np.concatenate([self.numeric[col], new_numeric[col]]) for col in NUMERIC_COLUMNS}
+        max_id = int(df["id"].max()) if len(df) else self.max_id
+        logger.info(f"Extended transaction snapshot to v{version}: +{len(df)} rows")
+        dates = np.concatenate([self.dates, self._dates(df)])
+        return TransactionSnapshot(version, max_id, codes, categories, numeric, dates)
+
+    def _code(self, column, value):
+        """Return the integer code for ``value``, or -1 if it never occurs."""
+        cats = self.categories[column]
+        i = int(np.searchsorted(cats, value))
+        return i if i < len(cats) and cats[i] == value else -1
+
+    def summarize(self, with_stores=True, since=None, until=None, **filters):
+        """Build a TransactionSummary for rows equal to ``filters`` (column=value).
+
+        ``since``/``until`` bound transaction_date, ``until`` exclusive.
+        """
+        s = TransactionSummary()
+
+        masks = [self.codes[column] == self._code(column, value) for column, value in filters.items()]
+        if since is not None:
+            masks.append(self.dates >= np.datetime64(since, "us"))
+        if until is not None:
+            masks.append(self.dates < np.datetime64(until, "us"))
+        mask = None
+        for m in masks:
+            mask = m if mask is None else mask & m
+        idx = np.flatnonzero(mask) if mask is not None else np.arange(self.size)
+        if not len(idx):
+            return s
+
+        qty = self.numeric["quantity"][idx]
+        amount = self.numeric["total_amount"][idx]
+
+        s.count = int(len(idx))
+        s.total_quantity = int(qty.sum())
+        s.total_revenue = float(amount.sum())
+        s.sum_price = float(self.numeric["price"][idx].sum())
+        s.sum_discount = float(self.numeric["discount_applied"][idx].sum())
+        s.unique_customers = int(np.unique(self.codes["customer_id"][idx]).size)
+        s.unique_products = int(np.unique(self.codes["product_id"][idx]).size)
+
+        s.revenue_by_category, s.count_by_category = self._group_by("product_category", idx, amount)
+        s.revenue_by_payment, s.count_by_payment = self._group_by("payment_method", idx, amount)
+
+        if with_stores:
+            store_codes = np.unique(self.codes["store_location"][idx])
+            s.store_count = int(store_codes.size)
+            s.stores = [str(v) for v in self.categories["store_location"][store_codes[:STORE_SAMPLE_SIZE]]]
+
+        s.sample_quantities = [int(q) for q in qty[:SAMPLE_SIZE]]
+        s.sample_amounts = [float(a) for a in amount[:SAMPLE_SIZE]]
+        return s
+
+    def _group_by(self, column, idx, amount):
+        """Vectorized SUM(total_amount) and COUNT(*) grouped by a coded column."""
+        cats = self.categories[column]
+        codes = self.codes[column][idx]
+        sums = np.bincount(codes, weights=amount, minlength=len(cats))
+        counts = np.bincount(codes, minlength=len(cats))
+        present = np.flatnonzero(counts)
+        return (
+            {str(cats[i]): float(sums[i]) for i in present},
+            {str(cats[i]): int(counts[i]) for i in present},
+        )
+
+
+def snapshot_enabled() -> bool:
+    return current_app.config.get("ANALYTICS_ENGINE") == "snapshot"
+
+
+def get_snapshot() -> TransactionSnapshot:
+    """Return the current app's snapshot, reloading it if the dataset changed.
+
+    The version check runs at most once per ``SNAPSHOT_CHECK_INTERVAL`` seconds.
+    """
+    app = current_app._get_current_object()
+    snap = app.extensions.get(_EXTENSION_KEY)
+    interval = app.config.get("SNAPSHOT_CHECK_INTERVAL", 5)
+
+    if snap is not None and time.monotonic() - snap.checked_at < interval:
+        return snap
+
+    with _lock:
+        snap = app.extensions.get(_EXTENSION_KEY)
+        if snap is None:
+            snap = TransactionSnapshot.load()
+            app.extensions[_EXTENSION_KEY] = snap
+        elif snap.version != get_dataset_version():
+            snap = snap.refreshed()
+            app.extensions[_EXTENSION_KEY] = snap
+        else:
+            snap.checked_at = time.monotonic()
+    return snap
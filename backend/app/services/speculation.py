@@ -0,0 +1,136 @@
+"""Speculative retrieval that overlaps the database with intent classification.
+
+Entity questions ("What has customer 109318 bought?", "compare product A and
+B") usually name their entities plainly. While classify_query waits on the
+LLM, the retrieval for the guessed classification runs on a worker thread.
+If the real classification asks for the same retrieval the result is used,
+otherwise it is discarded.
+
+Counters: ``speculation.started``, ``speculation.wins`` / ``speculation.win_ms``
+(retrieval time hidden behind classification), ``speculation.wasted`` /
+``speculation.wasted_ms`` (retrieval time spent on a wrong guess) and
+``speculation.failed``.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+from app.services import metrics
+from app.services.intent_rules import extract_entities
+
+logger = logging.getLogger(__name__)
+
+_EXTENSION_KEY = "speculation_executor"
+_create_lock = threading.Lock()
+
+RETRIEVAL_FIELDS = ("intent", "customer_id", "customer_id_2", "product_id", "product_id_2")
+
+# Classification fields that determine what _retrieve() loads, per intent
+KEY_FIELDS = {
+    "customer_query": ("customer_id",),
+    "product_query": ("product_id",),
+    "comparison": ("customer_id", "customer_id_2", "product_id", "product_id_2"),
+    "store_query": ("product_id", "product_id_2", "category", "category_2", "match"),
+}
+
+
+def retrieval_key(classification: dict) -> tuple:
+    intent = classification.get("intent")
+    return (intent,) + tuple(classification.get(f) for f in KEY_FIELDS.get(intent, ()))
+
+
+def guess_classification(question: str):
+    """Guess the entity classification from the raw text, or None."""
+    customers, products = extract_entities(question)
+    customers = [c.upper() for c in customers]
+    products = [p.upper() for p in products]
+    guess = dict.fromkeys(RETRIEVAL_FIELDS)
+
+    if len(customers) == 2 and not products:
+        guess.update(intent="comparison", customer_id=customers[0], customer_id_2=customers[1])
+    elif len(products) == 2 and not customers:
+        guess.update(intent="comparison", product_id=products[0], product_id_2=products[1])
+    elif len(customers) == 1 and not products:
+        guess.update(intent="customer_query", customer_id=customers[0])
+    elif len(products) == 1 and not customers:
+        guess.update(intent="product_query", product_id=products[0])
+    else:
+        return None
+    return guess
+
+
+def _get_executor(app):
+    executor = app.extensions.get(_EXTENSION_KEY)
+    if executor is None:
+        with _create_lock:
+            executor = app.extensions.get(_EXTENSION_KEY)
+            if executor is None:
+                executor = app.extensions[_EXTENSION_KEY] = ThreadPoolExecutor(
+                    max_workers=app.config["SPECULATION_WORKERS"],
+                    thread_name_prefix="speculate",
+                )
+    return executor
+
+
+class Speculation:
+    """A retrieval started before the classification is known."""
+
+    def __init__(self, guess, future, started):
+        self.guess = guess
+        self.future = future
+        self.started = started
+
+    def claim(self, classification):
+        """Return the speculative result if ``classification`` agrees, else None."""
+        if retrieval_key(classification) != retrieval_key(self.guess):
+            self.discard()
+            return None
+
+        waited = time.monotonic() - self.started
+        try:
+            result, elapsed = self.future.result()
+        except Exception as e:
+            logger.warning(f"Speculative retrieval failed: {e}")
+            metrics.incr("speculation.failed")
+            return None
+        metrics.incr("speculation.wins")
+        metrics.incr("speculation.win_ms", int(min(elapsed, waited) * 1000))
+        return result
+
+    def discard(self):
+        metrics.incr("speculation.wasted")
+        if self.future.cancel():
+            return
+
+        def _record(future):
+            if future.exception() is None:
+                metrics.incr("speculation.wasted_ms", int(future.result()[1] * 1000))
+
+        self.future.add_done_callback(_record)
+
+
+def speculate(question: str, retrieve):
+    """Start ``retrieve(guess)`` in the background if the question names entities.
+
+    Returns a Speculation, or None when there is no guess or speculation is
+    disabled (``SPECULATION_WORKERS=0``).
+    """
+    app = current_app._get_current_object()
+    if not app.config["SPECULATION_WORKERS"]:
+        return None
+    guess = guess_classification(question)
+    if guess is None:
+        return None
+
+    def _run():
+        start = time.monotonic()
+        with app.app_context():
+            result = retrieve(dict(guess))
+        return result, time.monotonic() - start
+
+    metrics.incr("speculation.started")
+    return Speculation(guess, _get_executor(app).submit(_run), time.monotonic())
@@ -0,0 +1,156 @@
+"""Inverted bitmap index of which stores sell which products and categories.
+
+Every distinct store location gets a dense integer ID in order of first
+appearance, and each product and category maps to a bitset (a Python int,
+bit i set when store i sells it). Stores map back to a bitset over product
+IDs. Store counts, membership and "stores selling both A and C" are then
+integer AND/OR and ``int.bit_count()`` instead of DISTINCT scans.
+
+Each worker builds the index at startup (create_app) and, like the snapshot,
+extends it with the rows past its last id when the dataset version changes.
+Loads only append rows; if the last indexed row is gone the table was
+reloaded and the index is rebuilt.
+"""
+
+import heapq
+import logging
+import threading
+
+from flask import current_app
+from sqlalchemy import func
+
+from app.extensions import db
+from app.models import Transaction
+from app.services.dataset import current_dataset_version
+
+logger = logging.getLogger(__name__)
+
+_EXTENSION_KEY = "store_index"
+_lock = threading.Lock()
+
+
+def _positions(bits):
+    """Yield the indexes of the set bits in ``bits``, lowest first."""
+    text = bin(bits)[:1:-1]  # reversed binary digits, without the "0b"
+    i = text.find("1")
+    while i >= 0:
+        yield i
+        i = text.find("1", i + 1)
+
+
+class StoreIndex:
+    """Bitsets over store IDs for products and categories, and back."""
+
+    def __init__(self, version):
+        self.version = version
+        self.max_id = 0
+        self.size = 0
+        self.store_ids = {}       # location -> store ID
+        self.stores = []          # store ID -> location
+        self.product_ids = {}     # product -> bit in store_products
+        self.products = []        # bit -> product
+        self.by_product = {}      # product -> bitset of stores
+        self.by_category = {}     # category -> bitset of stores
+        self.store_products = []  # store ID -> bitset of product bits
+
+    @classmethod
+    def load(cls):
+        index = cls(current_dataset_version())
+        index._extend()
+        logger.info(f"Built store index v{index.version}: {len(index.stores)} stores")
+        return index
+
+    def _extend(self):
+        """Add the rows past ``max_id`` (one row per store/product/category)."""
+        T = Transaction
+        rows = (
+            db.session.query(T.store_location, T.product_id, T.product_category,
+                             func.count(T.id), func.max(T.id))
+            .filter(T.id > self.max_id)
+            .group_by(T.store_location, T.product_id, T.product_category)
+        )
+        product_bits, category_bits = {}, {}
+        for location, product, category, cnt, last_id in rows:
+            sid = self.store_ids.get(location)
+            if sid is None:
+                sid = self.store_ids[location] = len(self.stores)
+                self.stores.append(location)
+                self.store_products.append(0)
+            pid = self.product_ids.get(product)
+            if pid is None:
+                pid = self.product_ids[product] = len(self.products)
+                self.products.append(product)
+            product_bits[product] = product_bits.get(product, 0) | (1 << sid)
+            category_bits[category] = category_bits.get(category, 0) | (1 << sid)
+            self.store_products[sid] |= 1 << pid
+            self.size += cnt
+            self.max_id = max(self.max_id, last_id)
+        # OR in per key once; each |= on a large int copies it
+        for product, bits in product_bits.items():
+            self.by_product[product] = self.by_product.get(product, 0) | bits
+        for category, bits in category_bits.items():
+            self.by_category[category] = self.by_category.get(category, 0) | bits
+
+    def refreshed(self):
+        """Return an index for the current dataset version."""
+        last = (
+            db.session.query(func.max(Transaction.id)).filter(Transaction.id <= self.max_id).scalar()
+        ) or 0
+        if last != self.max_id:
+            return StoreIndex.load()
+        self.version = current_dataset_version()
+        self._extend()
+        logger.info(f"Extended store index to v{self.version}: {len(self.stores)} stores")
+        return self
+
+    def stores_for(self, products=(), categories=(), match_all=True) -> int:
+        """Bitset of stores selling all (or any) of ``products`` and ``categories``."""
+        sets = [self.by_product.get(p, 0) for p in products]
+        sets += [self.by_category.get(c, 0) for c in categories]
+        if not sets:
+            return 0
+        bits = sets[0]
+        for other in sets[1:]:
+            bits = bits & other if match_all else bits | other
+        return bits
+
+    @staticmethod
+    def count(bits) -> int:
+        return bits.bit_count()
+
+    def names(self, bits, limit=None) -> list:
+        """Store locations in ``bits``, sorted; only the first ``limit`` when given."""
+        locations = (self.stores[i] for i in _positions(bits))
+        if limit is None:
+            return sorted(locations)
+        return heapq.nsmallest(limit, locations)
+
+    def products_at(self, location) -> list:
+        """Products sold at ``location``, sorted."""
+        sid = self.store_ids.get(location)
+        if sid is None:
+            return []
+        return sorted(self.products[i] for i in _positions(self.store_products[sid]))
+
+
+def get_store_index() -> StoreIndex:
+    """Return the current app's index, extending it if the dataset changed.
+
+    The version comes from current_dataset_version(), so a load in this
+    worker is seen at once and one in another worker within
+    ``SNAPSHOT_CHECK_INTERVAL`` seconds.
+    """
+    app = current_app._get_current_object()
+    index = app.extensions.get(_EXTENSION_KEY)
+    version = current_dataset_version()
+    if index is not None and index.version == version:
+        return index
+
+    with _lock:
+        index = app.extensions.get(_EXTENSION_KEY)
+        if index is None:
+            index = StoreIndex.load()
+        elif index.version != version:
+            index = index.refreshed()
+        app.extensions[_EXTENSION_KEY] = index
+    return index
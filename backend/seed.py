@@ -1,5 +1,13 @@
-"""Seed the PostgreSQL database from the CSV dataset."""
+"""Seed the PostgreSQL database from the CSV dataset.
 
+Usage:
+    python seed.py                      # ORM loader
+    python seed.py --bulk [--workers N] # COPY-based bulk loader
+    python seed.py --append PATH ...    # ingest only new files / appended rows
+    python seed.py --rebuild-derived    # rebuild derived tables and indexes for existing data
+"""
+
+import argparse
 import csv
 import os
 import sys
@@ -11,12 +19,14 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from app import create_app
 from app.extensions import db
 from app.models import Transaction
+from app.services.dataset import get_dataset_version
+from app.services.ingest_service import CHUNK_SIZE, append_load, bulk_load, refresh_derived
 
 CSV_PATH = os.path.join(os.path.dirname(__file__), "data", "Retail_Transaction_Dataset.csv")
 BATCH_SIZE = 5000
 
 
-def seed():
+def seed(csv_path=CSV_PATH, bulk=False, workers=1, chunk_size=CHUNK_SIZE):
     app = create_app()
 
     with app.app_context():
@@ -26,9 +36,15 @@ def seed():
             print(f"Database already has {count} rows. Skipping seed.")
             return
 
-        print(f"Reading CSV from {CSV_PATH} ...")
+        print(f"Reading CSV from {csv_path} ...")
+        if bulk:
+            bulk_load(csv_path, workers=workers, chunk_size=chunk_size)
+            final_count = Transaction.query.count()
+            print(f"Done! Seeded {final_count} transactions.")
+            return
+
         rows = []
-        with open(CSV_PATH, "r", encoding="utf-8") as f:
+        with open(csv_path, "r", encoding="utf-8") as f:
             reader = csv.DictReader(f)
             for i, row in enumerate(reader):
                 # Parse date — format is "M/D/YYYY H:MM"
@@ -66,9 +82,57 @@ def seed():
             db.session.bulk_save_objects(rows)
             db.session.commit()
 
+        refresh_derived()
+        version = get_dataset_version()
         final_count = Transaction.query.count()
-        print(f"Done! Seeded {final_count} transactions.")
+        print(f"Done! Seeded {final_count} transactions (dataset version {version}).")
+
+
+def append(paths, workers=1, chunk_size=CHUNK_SIZE):
+    """Ingest new CSV files or rows past each file's watermark."""
+    app = create_app()
+
+    with app.app_context():
+        result = append_load(paths, workers=workers, chunk_size=chunk_size)
+        print(f"Done! Appended {result.inserted} transactions.")
+
+
+def rebuild_derived():
+    """Rebuild the rollup cube, customer profiles and product summaries from the transactions table.
+
+    Also creates any transactions index added since the table was created.
+    """
+    app = create_app()
+
+    with app.app_context():
+        for index in Transaction.__table__.indexes:
+            index.create(bind=db.engine, checkfirst=True)
+        refresh_derived()
+        print(f"Done! Rebuilt derived data (dataset version {get_dataset_version()}).")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed the transactions table from CSV.")
+    parser.add_argument("--csv", default=CSV_PATH, help="path to the dataset CSV")
+    parser.add_argument("--bulk", action="store_true",
+                        help="use the COPY-based bulk loader with parallel parsing")
+    parser.add_argument("--append", nargs="+", metavar="PATH",
+                        help="append new rows from CSV files or directories instead of seeding")
+    parser.add_argument("--rebuild-derived", action="store_true",
+                        help="rebuild rollups, customer profiles and product summaries from the existing transactions table")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="parser processes for --bulk/--append (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE,
+                        help="rows per parse/write chunk for --bulk/--append")
+    args = parser.parse_args()
+    if args.rebuild_derived:
+        rebuild_derived()
+        return
+    if args.append:
+        append(args.append, workers=args.workers, chunk_size=args.chunk_size)
+        return
+    seed(args.csv, bulk=args.bulk, workers=args.workers, chunk_size=args.chunk_size)
 
 
 if __name__ == "__main__":
-    seed()
+    main()
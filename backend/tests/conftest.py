@@ -1,11 +1,16 @@
 """Shared fixtures for backend tests."""
 
+import json
+import threading
+import time
 import pytest
 from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
 from app import create_app
 from app.extensions import db as _db
 from app.models import Transaction
+from app.services.ingest_service import refresh_derived
 
 
 @pytest.fixture(scope="session")
@@ -22,6 +27,19 @@ def app():
         _db.drop_all()
 
 
+@pytest.fixture()
+def empty_app(tmp_path):
+    """Separate app on its own SQLite file, for tests that load data."""
+    test_app = create_app({
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'ingest.db'}",
+    })
+    with test_app.app_context():
+        yield test_app
+        _db.session.remove()
+        _db.engine.dispose()
+
+
 @pytest.fixture(scope="session")
 def seeded_app(app):
     """App with sample data already inserted (session-scoped for speed)."""
@@ -95,7 +113,128 @@ SAMPLE_ROWS = [
 
 
 def _seed_sample_data():
-    """Insert sample transactions into the test database."""
+    """Insert sample transactions, build derived tables and bump the dataset version."""
     for row in SAMPLE_ROWS:
         _db.session.add(Transaction(**row))
     _db.session.commit()
+    refresh_derived()
+
+
+# --------------- fake OpenAI-compatible server ---------------
+
+class FakeOpenAI:
+    """Scriptable stand-in for the chat completions API.
+
+    Queue responses with ``script(status, content, headers, delay)``; when the
+    queue is empty every call succeeds with ``default_content``.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.default_content = "ok"
+        self.default_delay = 0.0
+        self._script = []
+        self._lock = threading.Lock()
+
+    def script(self, status=200, content="ok", headers=None, delay=0.0):
+        with self._lock:
+            self._script.append((status, content, headers or {}, delay))
+
+    def next_response(self):
+        with self._lock:
+            if self._script:
+                return self._script.pop(0)
+        return 200, self.default_content, {}, self.default_delay
+
+
+def _completion(content):
+    return {
+        "id": "chatcmpl-fake", "object": "chat.completion", "created": 0, "model": "fake",
+        "choices": [{"index": 0, "finish_reason": "stop",
+                     "message": {"role": "assistant", "content": content}}],
+    }
+
+
+def _chunk(content):
+    return {
+        "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": 0, "model": "fake",
+        "choices": [{"index": 0, "finish_reason": None, "delta": {"content": content}}],
+    }
+
+
+@pytest.fixture()
+def fake_openai():
+    """Run a FakeOpenAI on localhost; yields (fake, base_url)."""
+    fake = FakeOpenAI()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            fake.requests.append(body)
+            status, content, headers, delay = fake.next_response()
+            time.sleep(delay)
+
+            if status != 200:
+                payload = json.dumps({"error": {"message": "fake error", "type": "fake"}}).encode()
+            elif body.get("stream"):
+                words = content.split(" ")
+                events = [_chunk(w if i == 0 else " " + w) for i, w in enumerate(words)]
+                payload = "".join(f"data: {json.dumps(e)}\n\n" for e in events).encode()
+                payload += b"data: [DONE]\n\n"
+            else:
+                payload = json.dumps(_completion(content)).encode()
+
+            self.send_response(status)
+            self.send_header("Content-Type", "text/event-stream" if body.get("stream") else "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+        # Bursts of concurrent clients would overflow the default backlog of 5
+        request_queue_size = 128
+
+    server = Server(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield fake, f"http://127.0.0.1:{server.server_address[1]}/v1"
+    server.shutdown()
+    server.server_close()
+
+
+class FakeRedis:
+    """In-memory stand-in for the redis-py calls the caches and coalescer make."""
+
+    def __init__(self):
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, nx=False, px=None, ex=None):
+        with self.lock:
+            if nx and key in self.data:
+                return False
+            self.data[key] = value
+            return True
+
+    def scan_iter(self, pattern):
+        prefix = pattern.rstrip("*")
+        return [k for k in list(self.data) if k.startswith(prefix)]
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+@pytest.fixture()
+def fake_redis():
+    return FakeRedis()
@@ -0,0 +1,44 @@
+"""Unit tests for app.services.aggregates."""
+
+from app.models import Transaction
+from app.services.aggregates import TransactionSummary, summarize
+
+
+def _assert_same(a, b):
+    assert a.count == b.count
+    assert a.total_quantity == b.total_quantity
+    assert round(a.total_revenue, 2) == round(b.total_revenue, 2)
+    assert round(a.sum_price, 2) == round(b.sum_price, 2)
+    assert round(a.sum_discount, 2) == round(b.sum_discount, 2)
+    assert a.unique_customers == b.unique_customers
+    assert a.unique_products == b.unique_products
+    assert a.count_by_category == b.count_by_category
+    assert a.count_by_payment == b.count_by_payment
+    assert a.store_count == b.store_count
+    assert a.stores == b.stores
+    assert a.sample_quantities == b.sample_quantities
+    assert a.sample_amounts == b.sample_amounts
+
+
+class TestTransactionSummary:
+    def test_query_matches_rows(self, app_ctx):
+        rows = Transaction.query.filter_by(product_id="A").order_by(Transaction.id).all()
+        _assert_same(
+            TransactionSummary.from_query(Transaction.product_id == "A"),
+            TransactionSummary.from_rows(rows),
+        )
+
+    def test_whole_table(self, app_ctx):
+        rows = Transaction.query.order_by(Transaction.id).all()
+        _assert_same(TransactionSummary.from_query(), TransactionSummary.from_rows(rows))
+
+    def test_empty(self, app_ctx):
+        s = TransactionSummary.from_query(Transaction.product_id == "Z")
+        assert not s
+        assert s.count == 0
+
+    def test_summarize_passes_summary_through(self, app_ctx):
+        s = TransactionSummary.from_query(Transaction.product_id == "B")
+        assert summarize(s) is s
+        assert s.categories == ["Books"]
+        assert s.store_count == 2
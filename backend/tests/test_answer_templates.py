@@ -0,0 +1,79 @@
+"""Tests for deterministic templated answers."""
+
+import pytest
+
+from app.services.aggregates import TransactionSummary
+from app.services.answer_templates import render_answer, template_key
+
+ENABLED = {"business_metric:count", "business_metric:revenue"}
+
+
+def _metric(metric_type):
+    return {"intent": "business_metric", "metric_type": metric_type}
+
+
+@pytest.fixture()
+def summary(app_ctx):
+    return TransactionSummary.from_query()
+
+
+class TestCountTemplate:
+    def test_single_count(self, summary):
+        text = render_answer("How many unique customers are there?", _metric("count"), summary, ENABLED)
+        assert text == "There are **3** unique customers in the dataset."
+
+    def test_several_counts(self, summary):
+        text = render_answer("How many customers and products?", _metric("count"), summary, ENABLED)
+        assert "- **Unique customers:** 3" in text
+        assert "- **Unique products:** 4" in text
+
+    @pytest.mark.parametrize("question", [
+        "Which product has the most transactions?",
+        "How many transactions per category?",
+        "How many?",
+        "How many transactions were paid with PayPal?",
+        "How many customers bought Electronics?",
+    ])
+    def test_falls_back(self, summary, question):
+        assert render_answer(question, _metric("count"), summary, ENABLED) is None
+
+
+class TestRevenueTemplate:
+    def test_total(self, summary):
+        text = render_answer("What is the total revenue?", _metric("revenue"), summary, ENABLED)
+        assert text == "Total revenue is **$342.25** across 6 transactions."
+
+    def test_by_category(self, summary):
+        text = render_answer("What is the total revenue by category?", _metric("revenue"), summary, ENABLED)
+        assert "- Home Decor: $120.00 (1 transaction, avg $120.00)" in text
+        assert "- Electronics: $116.25 (2 transactions, avg $58.12)" in text
+
+    def test_top_category(self, summary):
+        text = render_answer("Which category has the highest revenue?", _metric("revenue"), summary, ENABLED)
+        assert text.startswith("**Home Decor** is the top category")
+
+    def test_average(self, summary):
+        text = render_answer("What is the average transaction value?", _metric("revenue"), summary, ENABLED)
+        assert "**$57.04**" in text
+
+    @pytest.mark.parametrize("question", [
+        "What's the revenue trend by month?",
+        "Which product brings in the most revenue?",
+        "Why is revenue low at the downtown store?",
+        "What is the revenue from Electronics?",
+        "What was total revenue in 2024?",
+        "What is the revenue from product A?",
+    ])
+    def test_falls_back(self, summary, question):
+        assert render_answer(question, _metric("revenue"), summary, ENABLED) is None
+
+
+def test_disabled_key_falls_back(summary):
+    question = "How many unique customers are there?"
+    assert render_answer(question, _metric("count"), summary, {"business_metric:revenue"}) is None
+
+
+def test_no_template_for_intent(summary):
+    classification = {"intent": "product_query", "product_id": "A"}
+    assert template_key(classification) == "product_query:None"
+    assert render_answer("Tell me about product A", classification, summary, ENABLED) is None
@@ -0,0 +1,63 @@
+"""Unit tests for app.services.approximate and the approximate metrics mode."""
+
+import json
+from unittest.mock import patch
+
+import pytest
+
+from app.services.approximate import approximate_summary, unique_customers_estimate
+from app.services.data_service import get_business_metrics, summarize_business_metrics
+from app.services.intent_rules import classify_by_rules
+
+
+class TestApproximateSummary:
+    def test_full_sample_is_exact(self, app_ctx):
+        s = approximate_summary(sample_size=100)
+        exact = summarize_business_metrics()
+
+        assert s.sample_size == 6
+        assert s.count == 6 and s.count_margin == 0
+        assert s.total_revenue == pytest.approx(exact.total_revenue)
+        assert s.revenue_by_category == pytest.approx(exact.revenue_by_category)
+        assert s.avg_transaction_margin == pytest.approx(0)
+        assert s.unique_customers == 3
+        assert s.unique_products == 4
+
+    def test_partial_sample_has_margins(self, app_ctx):
+        s = approximate_summary(sample_size=3)
+
+        assert s.sample_size == 3
+        assert s.count == 6  # ids have no gaps
+        assert s.avg_transaction_margin > 0
+        assert s.revenue_margin > 0
+        assert sum(s.count_by_category.values()) == 6
+
+    def test_customers_from_sketches(self, app_ctx):
+        count, error = unique_customers_estimate()
+        assert count == 3
+        assert error == pytest.approx(0.01625)
+
+    def test_text_reports_bounds(self, app_ctx):
+        text = get_business_metrics(approximate_summary(sample_size=3))
+        assert text.startswith("Business Metrics (approximate) — ~6 transactions")
+        assert "[Calculation Breakdown]" in text
+        assert "Avg Transaction Value ≈ mean(TotalAmount in sample)" in text
+        assert "Unique Customers ≈ 3 (HyperLogLog sketch, ±1.6% standard error)" in text
+
+
+class TestApproximateMode:
+    def test_rules_detect_wording(self):
+        assert classify_by_rules("Roughly how much total revenue is there?")["approximate"] is True
+        assert classify_by_rules("What is the total revenue?")["approximate"] is False
+
+    @patch("app.routes.chat.generate_response", return_value="About $342 of revenue.")
+    def test_config_enables_mode(self, mock_gen, client, seeded_app, monkeypatch):
+        monkeypatch.setitem(seeded_app.config, "METRICS_MODE", "approximate")
+        resp = client.post(
+            "/api/chat", data=json.dumps({"message": "How many unique customers are there?"}),
+            content_type="application/json",
+        )
+        data = resp.get_json()
+
+        assert data["source_data"].startswith("Business Metrics (approximate)")
+        assert data["answered_by"] == "llm"  # templates don't state error bounds
@@ -0,0 +1,210 @@
+"""Tests for the asyncio chat path in app.asgi."""
+
+import asyncio
+import json
+import time
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import pytest
+
+from app.asgi import ChatASGI
+from app.services import llm_async
+from app.services.llm_async import AsyncLLMGateway, aclassify_query, agenerate_response, astream_response
+from app.services.llm_service import DeadlineExceeded
+
+ACLASSIFY_PATH = "app.asgi.aclassify_query"
+AGENERATE_PATH = "app.asgi.agenerate_response"
+
+
+def _classification(intent, **fields):
+    base = {"intent": intent, "customer_id": None, "product_id": None, "summary": "test"}
+    base.update(fields)
+    return base
+
+
+def _run(asgi_app, *requests):
+    """POST each (path, message) concurrently; return the responses in order."""
+    async def main():
+        transport = httpx.ASGITransport(app=asgi_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*(
+                client.post(path, json={"message": message}) for path, message in requests
+            ))
+    return asyncio.run(main())
+
+
+@pytest.fixture()
+def asgi_app(seeded_app):
+    return ChatASGI(seeded_app)
+
+
+class TestAsyncChat:
+    @patch(AGENERATE_PATH, new_callable=AsyncMock, return_value="Customer 109318 bought 2 items.")
+    @patch(ACLASSIFY_PATH, new_callable=AsyncMock,
+           return_value=_classification("customer_query", customer_id="109318"))
+    def test_answers_like_sync_route(self, mock_classify, mock_gen, asgi_app):
+        (resp,) = _run(asgi_app, ("/api/chat", "What has customer 109318 purchased?"))
+        data = resp.json()
+
+        assert resp.status_code == 200
+        assert resp.headers["access-control-allow-origin"] == "*"
+        assert data["intent"] == "customer_query"
+        assert "109318" in data["source_data"]
+        assert data["response"] == "Customer 109318 bought 2 items."
+        assert data["answered_by"] == "llm"
+
+    def test_many_conversations_in_one_process(self, asgi_app):
+        async def slow_generate(question, data, deadline=None):
+            await asyncio.sleep(0.3)
+            return "done"
+
+        with patch(ACLASSIFY_PATH, new_callable=AsyncMock,
+                   return_value=_classification("product_query", product_id="A")), \
+                patch(AGENERATE_PATH, side_effect=slow_generate):
+            started = time.perf_counter()
+            responses = _run(asgi_app, *[("/api/chat", f"Tell me about product A #{i}") for i in range(100)])
+            elapsed = time.perf_counter() - started
+
+        assert all(r.json()["response"] == "done" for r in responses)
+        assert elapsed < 0.3 * 10  # 100 waits of 0.3s overlap instead of queueing
+
+    @patch(AGENERATE_PATH, new_callable=AsyncMock, side_effect=DeadlineExceeded())
+    @patch(ACLASSIFY_PATH, new_callable=AsyncMock,
+           return_value=_classification("product_query", product_id="A"))
+    def test_generation_deadline_degrades(self, mock_classify, mock_gen, asgi_app):
+        (resp,) = _run(asgi_app, ("/api/chat", "Tell me about product A"))
+        assert resp.json()["answered_by"] == "fallback"
+        assert len(resp.json()["chart_data"]) == 2
+
+    def test_validation(self, asgi_app):
+        (resp,) = _run(asgi_app, ("/api/chat", ""))
+        assert "Please enter a question" in resp.json()["response"]
+
+    def test_stream(self, asgi_app):
+        async def tokens(question, data, deadline=None):
+            for text in ("Product A ", "sold well."):
+                yield text
+
+        with patch(ACLASSIFY_PATH, new_callable=AsyncMock,
+                   return_value=_classification("product_query", product_id="A")), \
+                patch("app.asgi.astream_response", side_effect=tokens):
+            (resp,) = _run(asgi_app, ("/api/chat/stream", "Tell me about product A"))
+
+        assert resp.headers["content-type"] == "text/event-stream"
+        events = [block.split("\n") for block in resp.text.strip().split("\n\n")]
+        assert [e[0] for e in events] == ["event: meta", "event: token", "event: token", "event: done"]
+        assert json.loads(events[0][1][len("data: "):])["intent"] == "product_query"
+
+    def test_other_routes_go_to_flask(self, asgi_app):
+        async def main():
+            transport = httpx.ASGITransport(app=asgi_app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.get("/api/health")
+        assert asyncio.run(main()).json() == {"status": "ok"}
+
+
+class TestAsyncLLM:
+    def test_gateway_retries_and_functions(self, fake_openai, monkeypatch):
+        fake, base_url = fake_openai
+        fake.script(status=500)
+        fake.default_content = "Revenue is up"
+
+        async def main():
+            gateway = AsyncLLMGateway("test-key", base_url=base_url, backoff_base=0.01)
+            monkeypatch.setattr(llm_async, "_gateway", gateway)
+            try:
+                text = await agenerate_response("q", "data")
+                streamed = [t async for t in astream_response("q", "data")]
+                return text, streamed
+            finally:
+                await gateway.aclose()
+
+        text, streamed = asyncio.run(main())
+        assert text == "Revenue is up"
+        assert streamed == ["Revenue", " is", " up"]
+        assert len(fake.requests) == 3  # 500, retry, stream
+
+    def test_classify_and_deadline(self, fake_openai, monkeypatch):
+        fake, base_url = fake_openai
+        fake.script(content='{"intent": "revenue_question", "customer_id": null}')
+
+        async def main():
+            gateway = AsyncLLMGateway("test-key", base_url=base_url)
+            monkeypatch.setattr(llm_async, "_gateway", gateway)
+            try:
+                result = await aclassify_query("how are we doing overall?")
+                fake.default_delay = 1
+                with pytest.raises(DeadlineExceeded):
+                    await agenerate_response("q", "data", deadline=time.monotonic() + 0.1)
+                return result
+            finally:
+                await gateway.aclose()
+
+        assert asyncio.run(main())["intent"] == "business_metric"
+
+    def test_retry_abandoned_for_deadline_raises(self, fake_openai, monkeypatch):
+        fake, base_url = fake_openai
+        fake.script(status=429, headers={"retry-after": "5"})
+        fake.script(status=429, headers={"retry-after": "5"})
+
+        async def main():
+            gateway = AsyncLLMGateway("test-key", base_url=base_url)
+            monkeypatch.setattr(llm_async, "_gateway", gateway)
+            try:
+                with pytest.raises(DeadlineExceeded):
+                    await agenerate_response("q", "data", deadline=time.monotonic() + 2)
+                with pytest.raises(DeadlineExceeded):
+                    [t async for t in astream_response("q", "data", deadline=time.monotonic() + 2)]
+            finally:
+                await gateway.aclose()
+
+        asyncio.run(main())
+        assert len(fake.requests) == 2
+
+    def test_generate_is_hedged(self, fake_openai, monkeypatch):
+        fake, base_url = fake_openai
+        fake.script(content="slow answer", delay=1.5)
+        fake.default_content = "fast answer"
+
+        async def main():
+            gateway = AsyncLLMGateway("test-key", base_url=base_url, hedge_percentile=95,
+                                      hedge_min_delay=0.1, hedge_max_ratio=1.0, hedge_min_samples=0)
+            monkeypatch.setattr(llm_async, "_gateway", gateway)
+            try:
+                return await agenerate_response("q", "data")
+            finally:
+                await gateway.aclose()
+
+        started = time.perf_counter()
+        assert asyncio.run(main()) == "fast answer"
+        assert time.perf_counter() - started < 1.0
+        assert len(fake.requests) == 2
+
+    def test_more_chats_than_sync_limit_in_flight(self, asgi_app, fake_openai, monkeypatch):
+        fake, base_url = fake_openai
+        fake.default_content = "Product A sold well."
+        fake.default_delay = 1.0
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+        monkeypatch.setenv("OPENAI_BASE_URL", base_url)
+        monkeypatch.setattr(llm_async, "_gateway", None)
+
+        async def main():
+            transport = httpx.ASGITransport(app=asgi_app)
+            try:
+                async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+                    return await asyncio.gather(*(
+                        client.post("/api/chat", json={"message": f"Tell me about product A #{i}"})
+                        for i in range(40)
+                    ))
+            finally:
+                await llm_async._gateway.aclose()
+
+        started = time.perf_counter()
+        responses = asyncio.run(main())
+        elapsed = time.perf_counter() - started
+
+        assert [r.json()["response"] for r in responses] == ["Product A sold well."] * 40
+        assert len(fake.requests) == 40
+        # 16 slots would need three rounds of 1s
+        assert elapsed < 2.0
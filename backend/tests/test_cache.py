@@ -0,0 +1,174 @@
+"""Unit tests for app.services.cache, the classification cache and the result cache."""
+
+import json
+from unittest.mock import MagicMock, patch
+
+from app.services.cache import LRUCache, RedisCache, get_cache
+from app.services.intent_rules import bind_template, normalize_question, to_template
+from app.services.llm_service import classify_query
+
+
+class TestLRUCache:
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(max_size=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        assert cache.get("a") == 1
+        cache.set("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        stats = cache.stats()
+        assert stats["evictions"] == 1
+        assert stats["hits"] == 2
+        assert stats["misses"] == 1
+
+    def test_ttl_expiry(self):
+        cache = LRUCache(max_size=2, ttl=60)
+        with patch("app.services.cache.time.monotonic", return_value=1000.0):
+            cache.set("a", 1)
+        with patch("app.services.cache.time.monotonic", return_value=1061.0):
+            assert cache.get("a") is None
+        assert cache.stats()["expirations"] == 1
+
+
+class TestRedisCache:
+    def test_round_trip(self, fake_redis):
+        cache = RedisCache(None, "classification", client=fake_redis)
+        assert cache.get("q") is None
+        cache.set("q", {"intent": "general"})
+        assert cache.get("q") == {"intent": "general"}
+        assert cache.stats()["hits"] == 1
+        cache.clear()
+        assert cache.get("q") is None
+
+
+class TestTemplates:
+    def test_normalizes_case_punctuation_and_ids(self):
+        a = normalize_question("Did customer 109318 buy product A?")
+        b = normalize_question("did   CUSTOMER 555555 buy product c")
+        assert a[0] == b[0] == "did customer <c1> buy product <p1>"
+
+    def test_round_trip(self):
+        classification = {"intent": "customer_query", "customer_id": "109318", "product_id": "A",
+                          "customer_id_2": None, "product_id_2": None, "summary": "x"}
+        template = to_template(classification, ["109318"], ["A"])
+        assert template["customer_id"] == "<c1>"
+        bound = bind_template(template, ["555555"], ["C"], summary="q")
+        assert bound["customer_id"] == "555555"
+        assert bound["product_id"] == "C"
+
+    def test_unknown_id_not_cacheable(self):
+        assert to_template({"intent": "customer_query", "customer_id": "42"}, [], []) is None
+
+
+def _llm_gateway(payload):
+    gateway = MagicMock()
+    message = MagicMock()
+    message.content = json.dumps(payload)
+    gateway.chat.return_value.choices = [MagicMock(message=message)]
+    return gateway
+
+
+class TestClassificationCache:
+    def test_rebinds_ids_on_hit(self, app_ctx):
+        get_cache("classification").clear()
+        gateway = _llm_gateway({"intent": "customer_query", "customer_id": "109318", "product_id": "A"})
+        with patch("app.services.llm_service.get_gateway", return_value=gateway):
+            first = classify_query("Did customer 109318 buy product A?")
+            second = classify_query("did customer 555555 buy product C")
+
+        assert gateway.chat.call_count == 1
+        assert first["customer_id"] == "109318"
+        assert second["intent"] == "customer_query"
+        assert second["customer_id"] == "555555"
+        assert second["product_id"] == "C"
+        assert get_cache("classification").stats()["hits"] == 1
+
+
+class TestResultCache:
+    def test_repeat_call_is_served_from_cache(self, app_ctx):
+        from app.services import metrics
+        from app.services.data_service import get_product_info
+
+        get_cache("results").clear()
+        metrics.reset()
+        first = get_product_info("A")
+        with patch("app.services.data_service.product_summary") as loader:
+            second = get_product_info("A")
+
+        assert second == first
+        loader.assert_not_called()
+        # The text and the product summary it was built from
+        assert metrics.get("results.misses") == 2
+        assert metrics.get("results.hits") == 1
+
+    def test_dataset_version_bump_invalidates(self, app_ctx):
+        from app.services.aggregates import TransactionSummary
+        from app.services.chart_service import product_charts
+        from app.services.dataset import bump_dataset_version
+
+        get_cache("results").clear()
+        product_charts("A")
+        bump_dataset_version()
+        with patch("app.services.chart_service.product_summary", return_value=TransactionSummary()) as loader:
+            assert product_charts("A") is None
+        loader.assert_called_once_with("A")
+
+    def test_preloaded_rows_bypass_cache(self, app_ctx):
+        from app.services.data_service import get_product_info, product_summary
+
+        summary = product_summary("A")
+        get_cache("results").clear()
+        get_product_info("A", summary)
+        assert get_cache("results").stats()["size"] == 0
+
+
+class TestRetrievalQueries:
+    @staticmethod
+    def _statements(fn):
+        from sqlalchemy import event
+        from app.extensions import db
+
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", record)
+        try:
+            fn()
+        finally:
+            event.remove(db.engine, "before_cursor_execute", record)
+        return statements
+
+    def test_product_summary_built_once(self, app_ctx):
+        from app.routes.chat import _retrieve
+
+        from app.services.aggregates import TransactionSummary
+
+        classification = {"intent": "product_query", "product_id": "A"}
+        get_cache("results").clear()
+        with patch.object(TransactionSummary, "from_product_summary",
+                          side_effect=TransactionSummary.from_product_summary) as build:
+            _retrieve(classification)
+        warm = self._statements(lambda: _retrieve(classification))
+
+        # Text, charts and the degraded-answer summary share one build
+        build.assert_called_once()
+        assert warm == []
+
+    def test_templated_metrics_served_from_cache(self, app_ctx):
+        from app.routes.chat import _retrieve
+
+        classification = {"intent": "business_metric", "metric_type": "count"}
+        get_cache("results").clear()
+        _retrieve(classification)
+        summary = None
+
+        def warm():
+            nonlocal summary
+            summary = _retrieve(classification)[2]
+
+        assert self._statements(warm) == []
+        assert summary.unique_customers == 3
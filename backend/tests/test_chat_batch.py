@@ -0,0 +1,122 @@
+"""Tests for the /api/chat/batch endpoint."""
+
+import json
+import threading
+import time
+from unittest.mock import patch
+
+from app.services import metrics
+
+GENERATE_RESPONSE_PATH = "app.routes.chat.generate_response"
+CLASSIFY_QUERY_PATH = "app.routes.chat.classify_query"
+RETRIEVE_PATH = "app.routes.chat._retrieve"
+
+
+def _post_batch(client, messages):
+    return client.post(
+        "/api/chat/batch",
+        data=json.dumps({"messages": messages}),
+        content_type="application/json",
+    )
+
+
+def _classify(question, timeout=None):
+    """Stand-in classifier keyed on the question text."""
+    if "joke" in question:
+        return {"intent": "off_topic"}
+    if "customer 109318" in question:
+        return {"intent": "customer_query", "customer_id": "109318", "summary": question}
+    if "product" in question:
+        return {"intent": "product_query", "product_id": question[-1], "summary": question}
+    return {"intent": "business_metric", "metric_type": "count", "summary": question}
+
+
+class TestChatBatch:
+    @patch(GENERATE_RESPONSE_PATH, side_effect=lambda q, d, deadline=None: f"answer to {q}")
+    @patch(CLASSIFY_QUERY_PATH, side_effect=_classify)
+    def test_results_in_order_with_timings(self, mock_classify, mock_gen, client):
+        messages = [
+            "Tell me about product A",
+            "Tell me a joke",
+            "What has customer 109318 purchased?",
+            "",
+            "How many unique customers are there?",
+        ]
+        resp = _post_batch(client, messages)
+        body = resp.get_json()
+        results = body["results"]
+
+        assert resp.status_code == 200
+        assert len(results) == 5
+        assert results[0]["response"] == "answer to Tell me about product A"
+        assert results[0]["intent"] == "product_query"
+        assert len(results[0]["chart_data"]) == 2
+        assert results[1]["intent"] == "off_topic"
+        assert "109318" in results[2]["source_data"]
+        assert results[3]["error"] is True
+        assert results[4]["answered_by"] == "template"
+        assert set(results[0]["timings"]) == {"classify_ms", "retrieve_ms", "generate_ms"}
+        assert body["timings"]["total_ms"] >= body["timings"]["classify_ms"]
+
+    @patch(GENERATE_RESPONSE_PATH, return_value="ok")
+    @patch(CLASSIFY_QUERY_PATH, side_effect=_classify)
+    def test_each_entity_retrieved_once(self, mock_classify, mock_gen, client):
+        from app.routes.chat import _retrieve
+
+        metrics.reset()
+        messages = ["Tell me about product A", "Describe product A", "Tell me about product B"] * 3
+        with patch(RETRIEVE_PATH, side_effect=_retrieve) as mock_retrieve:
+            body = _post_batch(client, messages).get_json()
+
+        assert mock_retrieve.call_count == 2
+        assert body["groups"] == 2
+        assert metrics.get("batch.retrievals_saved") == 7
+        assert all(r["response"] == "ok" for r in body["results"])
+
+    @patch(GENERATE_RESPONSE_PATH, return_value="ok")
+    @patch(CLASSIFY_QUERY_PATH, side_effect=_classify)
+    def test_failed_retrieval_not_counted_as_saved(self, mock_classify, mock_gen, client):
+        from app.routes.chat import _retrieve
+
+        def flaky_retrieve(classification):
+            if classification.get("product_id") == "B":
+                raise RuntimeError("database unavailable")
+            return _retrieve(classification)
+
+        metrics.reset()
+        messages = ["Tell me about product A", "Describe product A", "Tell me about product B"]
+        with patch(RETRIEVE_PATH, side_effect=flaky_retrieve):
+            results = _post_batch(client, messages).get_json()["results"]
+
+        assert results[2]["error"] is True
+        assert metrics.get("batch.retrievals_saved") == 1
+
+    @patch(CLASSIFY_QUERY_PATH, side_effect=_classify)
+    def test_generation_parallelism_is_bounded(self, mock_classify, client, seeded_app, monkeypatch):
+        monkeypatch.setitem(seeded_app.config, "BATCH_GENERATE_CONCURRENCY", 3)
+        lock = threading.Lock()
+        active = peak = 0
+
+        def slow_generate(question, data, deadline=None):
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.05)
+            with lock:
+                active -= 1
+            return "ok"
+
+        with patch(GENERATE_RESPONSE_PATH, side_effect=slow_generate):
+            started = time.perf_counter()
+            _post_batch(client, [f"Tell me about product {p}" for p in "ABCDABCDAB"])
+            elapsed = time.perf_counter() - started
+
+        assert peak == 3
+        assert elapsed < 10 * 0.05  # overlapped, not one after another
+
+    def test_rejects_bad_payloads(self, client, seeded_app, monkeypatch):
+        assert _post_batch(client, []).status_code == 400
+        assert client.post("/api/chat/batch", data="nope", content_type="application/json").status_code == 400
+        monkeypatch.setitem(seeded_app.config, "BATCH_MAX_MESSAGES", 2)
+        assert _post_batch(client, ["a", "b", "c"]).status_code == 400
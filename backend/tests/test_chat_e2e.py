@@ -4,8 +4,11 @@ All LLM calls are mocked so no OpenAI API key is needed.
 """
 
 import json
+import time
 from unittest.mock import patch
 
+import pytest
+
 
 # --------- helpers ---------
 
@@ -62,6 +65,7 @@ class TestCustomerQueryFlow:
         assert data["intent"] == "customer_query"
         assert "109318" in data["source_data"]
         assert data["response"] == "Customer 109318 has 2 purchases."
+        assert data["data_tokens"]["after"] <= data["data_tokens"]["before"]
 
     @patch(GENERATE_RESPONSE_PATH, return_value="No data found for customer 000000.")
     @patch(CLASSIFY_QUERY_PATH, return_value=_mock_classify("customer_query", customer_id="000000"))
@@ -117,6 +121,116 @@ class TestBusinessMetricFlow:
         assert data["intent"] == "business_metric"
         assert "chart_data" not in data
 
+    @patch(GENERATE_RESPONSE_PATH, return_value="One store sells both.")
+    @patch(CLASSIFY_QUERY_PATH, return_value=_mock_classify("store_query", product_id="A", product_id_2="B"))
+    def test_store_query_uses_index(self, mock_classify, mock_gen, client):
+        resp = _post_chat(client, "Which stores sell both A and B?")
+        data = resp.get_json()
+
+        assert resp.status_code == 200
+        assert data["source_data"].startswith("Stores selling product A and product B — 1 stores")
+        assert data["chart_data"][0]["data"][-1] == {"name": "product A ∩ product B", "value": 1}
+
+    @patch(GENERATE_RESPONSE_PATH, return_value="Revenue peaked in June.")
+    @patch(CLASSIFY_QUERY_PATH, return_value=_mock_classify("business_metric", metric_type="trend", granularity="month"))
+    def test_trend_uses_rollups(self, mock_classify, mock_gen, client):
+        resp = _post_chat(client, "Show the monthly revenue trend")
+        data = resp.get_json()
+
+        assert resp.status_code == 200
+        assert data["source_data"].startswith("Revenue Trend by Month")
+        assert [c["title"] for c in data["chart_data"]] == ["Revenue by Month", "Transactions by Month"]
+
+    @patch(GENERATE_RESPONSE_PATH, return_value="Books revenue was flat.")
+    def test_filtered_trend_keeps_filter(self, mock_gen, client):
+        data = _post_chat(client, "What is the revenue growth for Books?").get_json()
+
+        assert data["source_data"].startswith("Revenue Trend by Month (product category Books) — 2 periods")
+        revenue = data["chart_data"][0]["data"]
+        assert sum(p["value"] for p in revenue) == pytest.approx(72.0)
+
+    @patch(GENERATE_RESPONSE_PATH)
+    @patch(CLASSIFY_QUERY_PATH, return_value=_mock_classify("business_metric", metric_type="count"))
+    def test_templated_answer_skips_llm(self, mock_classify, mock_gen, client):
+        resp = _post_chat(client, "How many unique customers are there?")
+        data = resp.get_json()
+
+        assert data["response"] == "There are **3** unique customers in the dataset."
+        assert data["answered_by"] == "template"
+        mock_gen.assert_not_called()
+
+    @patch(GENERATE_RESPONSE_PATH, return_value="Revenue rose steadily.")
+    @patch(CLASSIFY_QUERY_PATH, return_value=_mock_classify("business_metric", metric_type="revenue"))
+    def test_unsupported_question_falls_back_to_llm(self, mock_classify, mock_gen, client):
+        resp = _post_chat(client, "How has revenue grown over time?")
+        data = resp.get_json()
+
+        assert data["response"] == "Revenue rose steadily."
+        assert data["answered_by"] == "llm"
+        mock_gen.assert_called_once()
+
+    @pytest.mark.parametrize("question", [
+        "How many transactions were paid with PayPal?",
+        "How many customers bought Electronics?",
+        "What is the revenue from Electronics?",
+        "What was total revenue in 2024?",
+    ])
+    @patch(GENERATE_RESPONSE_PATH, return_value="From the filtered data ...")
+    def test_filtered_question_falls_back_to_llm(self, mock_gen, client, question):
+        data = _post_chat(client, question).get_json()
+
+        assert data["answered_by"] == "llm"
+        mock_gen.assert_called_once()
+
+    @patch(GENERATE_RESPONSE_PATH, return_value="There are 3 unique customers.")
+    @patch(CLASSIFY_QUERY_PATH, return_value=_mock_classify("business_metric", metric_type="count"))
+    def test_templates_disabled(self, mock_classify, mock_gen, client, seeded_app, monkeypatch):
+        monkeypatch.setitem(seeded_app.config, "TEMPLATED_ANSWERS", set())
+        data = _post_chat(client, "How many customers are there?").get_json()
+        assert data["answered_by"] == "llm"
+
+
+# --------- deadlines ---------
+
+class TestDeadline:
+    @patch(CLASSIFY_QUERY_PATH, return_value=_mock_classify("product_query", product_id="A"))
+    def test_generation_timeout_returns_data_summary(self, mock_classify, client):
+        from app.services import metrics
+        from app.services.llm_service import DeadlineExceeded
+
+        metrics.reset()
+        with patch(GENERATE_RESPONSE_PATH, side_effect=DeadlineExceeded()):
+            data = _post_chat(client, "Tell me about product A").get_json()
+
+        assert data["answered_by"] == "fallback"
+        assert "quick summary" in data["response"]
+        assert "2 transactions totalling **$116.25**" in data["response"]
+        assert data["source_data"].startswith("Product A")
+        assert len(data["chart_data"]) == 2
+        assert metrics.get("deadline.degraded") == 1
+
+    @patch(CLASSIFY_QUERY_PATH, return_value=_mock_classify("customer_query", customer_id="109318"))
+    def test_generation_gets_remaining_budget(self, mock_classify, client, seeded_app, monkeypatch):
+        monkeypatch.setitem(seeded_app.config, "CHAT_GENERATE_BUDGET", 0.5)
+        with patch(GENERATE_RESPONSE_PATH, return_value="ok") as mock_gen:
+            before = time.monotonic()
+            _post_chat(client, "What has customer 109318 purchased?")
+        deadline = mock_gen.call_args.kwargs["deadline"]
+        assert before < deadline <= time.monotonic() + 0.5
+
+    def test_stage_overrun_is_counted(self, app_ctx):
+        from app.services import metrics
+        from app.services.deadline import Deadline
+
+        metrics.reset()
+        deadline = Deadline(10, {"classify": 0.01, "retrieve": 1, "generate": 1})
+        with deadline.stage("classify"):
+            time.sleep(0.02)
+        with deadline.stage("retrieve"):
+            pass
+        assert metrics.get("deadline.classify_overruns") == 1
+        assert metrics.get("deadline.retrieve_overruns") == 0
+
 
 # --------- off-topic ---------
 
@@ -127,3 +241,61 @@ class TestOffTopic:
         data = resp.get_json()
         assert data["intent"] == "off_topic"
         assert "retail analytics" in data["response"].lower()
+
+
+# --------- streaming ---------
+
+STREAM_RESPONSE_PATH = "app.routes.chat.stream_response"
+
+
+def _post_stream(client, message):
+    resp = client.post(
+        "/api/chat/stream",
+        data=json.dumps({"message": message}),
+        content_type="application/json",
+    )
+    events = []
+    for block in resp.get_data(as_text=True).strip().split("\n\n"):
+        event_line, data_line = block.split("\n")
+        events.append((event_line[len("event: "):], json.loads(data_line[len("data: "):])))
+    return resp, events
+
+
+class TestChatStream:
+    @patch(STREAM_RESPONSE_PATH, return_value=iter(["Product A ", "sold well."]))
+    @patch(CLASSIFY_QUERY_PATH, return_value=_mock_classify("product_query", product_id="A"))
+    def test_meta_then_tokens(self, mock_classify, mock_stream, client):
+        resp, events = _post_stream(client, "Tell me about product A")
+
+        assert resp.mimetype == "text/event-stream"
+        assert [e for e, _ in events] == ["meta", "token", "token", "done"]
+        meta = events[0][1]
+        assert meta["intent"] == "product_query"
+        assert "Product A" in meta["source_data"]
+        assert len(meta["chart_data"]) == 2
+        assert "".join(p["text"] for e, p in events if e == "token") == "Product A sold well."
+
+    @patch(CLASSIFY_QUERY_PATH, return_value=_mock_classify("off_topic"))
+    def test_off_topic(self, mock_classify, client):
+        _, events = _post_stream(client, "Tell me a joke")
+        assert events[0] == ("meta", {"intent": "off_topic"})
+        assert "retail analytics" in events[1][1]["text"]
+
+    @patch(CLASSIFY_QUERY_PATH, side_effect=RuntimeError("boom"))
+    def test_error_event(self, mock_classify, client):
+        _, events = _post_stream(client, "What is the total revenue?")
+        assert events[-1][0] == "error"
+
+    @patch(STREAM_RESPONSE_PATH)
+    @patch(CLASSIFY_QUERY_PATH, return_value=_mock_classify("product_query", product_id="A"))
+    def test_deadline_streams_data_summary(self, mock_classify, mock_stream, client):
+        from app.services.llm_service import DeadlineExceeded
+
+        def timed_out(question, data, deadline=None):
+            raise DeadlineExceeded()
+            yield  # pragma: no cover
+
+        mock_stream.side_effect = timed_out
+        _, events = _post_stream(client, "Tell me about product A")
+        assert [e for e, _ in events] == ["meta", "token", "done"]
+        assert "quick summary" in events[1][1]["text"]
@@ -0,0 +1,58 @@
+"""Unit tests for app.services.compaction."""
+
+from app.services.compaction import compact_payload, estimate_tokens
+
+PRODUCT_INFO = "\n".join([
+    "Product B — 40 transactions",
+    "═══════════════════════════════════════",
+    "",
+    "Categories: Books",
+    "",
+    "[Calculation Breakdown]",
+    "",
+    "Total Qty Sold = sum of all quantities",
+    "  = 1 + 4 + 2 + 5 + 3 + ... (35 more values)",
+    "  = 120",
+    "",
+    "Total Revenue = sum of all transaction amounts",
+    "  = $15.00 + $57.00 + $10.00 + $9.00 + $3.00 + ... (35 more)",
+    "  = $1,234.56",
+    "",
+    "Total Stores Selling This Product: 40",
+    "Sample store locations:",
+] + [f"  • {100 + i} Andrew Cliffs Apt. {i}\nBaileyfort, HI 9335{i % 10}" for i in range(15)] + [
+    "  ... and 25 more",
+])
+
+
+class TestCompactPayload:
+    def test_disabled_with_zero_budget(self):
+        text, before, after = compact_payload(PRODUCT_INFO, 0)
+        assert text == PRODUCT_INFO
+        assert before == after == estimate_tokens(PRODUCT_INFO)
+
+    def test_large_budget_only_drops_decoration(self):
+        text, before, after = compact_payload(PRODUCT_INFO, 10_000)
+        assert "═" not in text
+        assert "Andrew Cliffs" in text
+        assert after < before
+
+    def test_tight_budget_keeps_totals(self):
+        text, before, after = compact_payload(PRODUCT_INFO, 50)
+        assert after < before
+        assert "  = 120" in text
+        assert "  = $1,234.56" in text
+        assert "Total Stores Selling This Product: 40" in text
+        assert "+ ..." not in text
+        assert "Andrew Cliffs" not in text
+        assert "  • Baileyfort, HI" in text
+        assert "  ... and 35 more" in text
+
+    def test_trims_transaction_listing(self):
+        rows = [f"- 2024-01-{i + 1:02d} | Product A (Books) | Total $1.00 | Cash | 1 Main St\nTown, CA 90210"
+                for i in range(20)]
+        data = "Found 20 transaction(s) for customer 1:\n\n" + "\n".join(rows) + "\n\nTotal spend: $20.00"
+        text, _, _ = compact_payload(data, 60)
+        assert text.count("\n- 2024") == 8
+        assert "12 more transactions not shown" in text
+        assert "Total spend: $20.00" in text
@@ -4,6 +4,7 @@ from app.services.data_service import (
     get_customer_transactions,
     get_product_info,
     get_business_metrics,
+    summarize_business_metrics,
     compare_customers,
     compare_products,
 )
@@ -52,6 +53,18 @@ class TestGetBusinessMetrics:
         result = get_business_metrics([])
         assert "No transaction data" in result
 
+    def test_sql_path_matches_rows(self, app_ctx):
+        rows = Transaction.query.all()
+        assert get_business_metrics() == get_business_metrics(rows)
+
+    def test_sql_summary(self, app_ctx):
+        summary = summarize_business_metrics()
+        assert summary.count == 6
+        assert summary.unique_customers == 3
+        assert summary.unique_products == 4
+        assert summary.count_by_category["Electronics"] == 2
+        assert round(summary.revenue_by_payment["PayPal"], 2) == 165.00
+
 
 class TestCompareCustomers:
     def test_both_exist(self, app_ctx):
@@ -0,0 +1,110 @@
+"""Unit tests for app.services.ingest_service."""
+
+from datetime import datetime
+
+import pytest
+
+from app.models import IngestWatermark, Transaction
+from app.services.dataset import get_dataset_version
+from app.services.ingest_service import append_load, bulk_load, parse_chunk, parse_date
+from app.services.snapshot import get_snapshot
+
+HEADER = "CustomerID,ProductID,Quantity,Price,TransactionDate,PaymentMethod,StoreLocation,ProductCategory,DiscountApplied(%),TotalAmount\n"
+
+CSV_ROWS = [
+    '109318,C,7,80.08,12/26/2023 12:32,Cash,"176 Andrew Cliffs\nBaileyfort, HI 93354",Books,18.68,455.86\n',
+    '993229,C,4,75.19,8/5/2023 0:00,Cash,"11635 William Well Suite 809\nEast Kara, MT 19483",Home Decor,14.12,258.31\n',
+    '579675,A,8,31.53,3/11/2024,PayPal,"910 Mendez Ville Suite 909\nPort Lauraland, MO 99563",Books,15.94,212.02\n',
+    'bad,A,not-a-number,1,1/1/2024,Cash,Somewhere,Books,0,1\n',
+]
+
+
+def _write_csv(path, rows):
+    path.write_text(HEADER + "".join(rows), encoding="utf-8")
+    return str(path)
+
+
+class TestParsing:
+    def test_parse_date_formats(self):
+        assert parse_date("12/26/2023 12:32") == datetime(2023, 12, 26, 12, 32)
+        assert parse_date("3/11/2024") == datetime(2024, 3, 11)
+
+    def test_parse_chunk_rejects_bad_rows(self):
+        good = ["1", "A", "2", "3.5", "1/2/2024 3:04", "Cash", " Store ", "Books", "0", "7.0"]
+        bad = ["1", "A", "x", "3.5", "1/2/2024", "Cash", "Store", "Books", "0", "7.0"]
+        records, rejected = parse_chunk([good, bad, None])
+        assert rejected == 2
+        assert records[0][2] == 2
+        assert records[0][6] == "Store"
+
+
+class TestBulkLoad:
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_loads_csv(self, empty_app, tmp_path, workers):
+        path = _write_csv(tmp_path / "tx.csv", CSV_ROWS)
+        loaded = bulk_load(path, workers=workers, chunk_size=2, log=lambda msg: None)
+
+        assert loaded == 3
+        assert Transaction.query.count() == 3
+        row = Transaction.query.filter_by(customer_id="109318").one()
+        assert row.store_location == "176 Andrew Cliffs\nBaileyfort, HI 93354"
+        assert row.transaction_date == datetime(2023, 12, 26, 12, 32)
+        assert get_dataset_version() == 1
+
+    def test_rebuilds_indexes(self, empty_app, tmp_path):
+        from sqlalchemy import inspect
+        from app.extensions import db
+
+        path = _write_csv(tmp_path / "tx.csv", CSV_ROWS)
+        bulk_load(path, log=lambda msg: None)
+        names = {ix["name"] for ix in inspect(db.engine).get_indexes("transactions")}
+        assert {"ix_transactions_customer_date_id", "ix_transactions_product_id"} <= names
+
+
+class TestAppendLoad:
+    def test_skips_unchanged_file(self, empty_app, tmp_path):
+        path = _write_csv(tmp_path / "tx.csv", CSV_ROWS[:2])
+        first = append_load([path], log=lambda msg: None)
+        second = append_load([path], log=lambda msg: None)
+
+        assert first.inserted == 2
+        assert second.inserted == 0
+        assert Transaction.query.count() == 2
+        assert get_dataset_version() == 1
+
+    def test_resumes_after_watermark(self, empty_app, tmp_path):
+        path = tmp_path / "tx.csv"
+        _write_csv(path, CSV_ROWS[:1])
+        append_load([str(path)], log=lambda msg: None)
+
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("".join(CSV_ROWS[1:]))
+        result = append_load([str(path)], log=lambda msg: None)
+
+        assert result.inserted == 2
+        assert result.rejected == 1
+        assert result.duplicates == 0
+        assert result.customer_ids == {"993229", "579675"}
+        mark = IngestWatermark.query.one()
+        assert mark.rows_ingested == 4
+
+    def test_dedupes_rewritten_file(self, empty_app, tmp_path):
+        append_load([_write_csv(tmp_path / "a.csv", CSV_ROWS[:2])], log=lambda msg: None)
+        # A new export that repeats the old rows plus one new one
+        result = append_load([_write_csv(tmp_path / "b.csv", CSV_ROWS[:3])], log=lambda msg: None)
+
+        assert result.inserted == 1
+        assert result.duplicates == 2
+        assert Transaction.query.count() == 3
+
+    def test_snapshot_extended_incrementally(self, empty_app, tmp_path):
+        empty_app.config["SNAPSHOT_CHECK_INTERVAL"] = 0
+        append_load([_write_csv(tmp_path / "a.csv", CSV_ROWS[:1])], log=lambda msg: None)
+        snap = get_snapshot()
+        append_load([_write_csv(tmp_path / "b.csv", CSV_ROWS[1:3])], log=lambda msg: None)
+        extended = get_snapshot()
+
+        assert extended.size == 3
+        assert extended.max_id > snap.max_id
+        assert extended.summarize(product_id="C").count == 2
+        assert list(extended.categories["product_id"]) == ["A", "C"]
@@ -0,0 +1,82 @@
+"""Unit tests for app.services.intent_rules."""
+
+from unittest.mock import patch
+
+import pytest
+
+from app.services import metrics
+from app.services.intent_rules import classify_by_rules, extract_entities
+from app.services.llm_service import classify_query
+
+
+class TestClassifyByRules:
+    @pytest.mark.parametrize("question, intent, fields", [
+        ("What has customer 109318 purchased?", "customer_query", {"customer_id": "109318"}),
+        ("How much has customer 993229 spent in total?", "customer_query", {"customer_id": "993229"}),
+        ("Show me the purchase history for customer id #109318", "customer_query", {"customer_id": "109318"}),
+        ("Which stores sell product B?", "product_query", {"product_id": "B"}),
+        ("Tell me about product d", "product_query", {"product_id": "D"}),
+        ("Compare product A vs product B", "comparison", {"product_id": "A", "product_id_2": "B"}),
+        ("Compare products A and C", "comparison", {"product_id": "A", "product_id_2": "C"}),
+        ("Is product A better than product B?", "comparison", {"product_id": "A", "product_id_2": "B"}),
+        ("How does product C do against product D?", "comparison", {"product_id": "C", "product_id_2": "D"}),
+        ("Compare customer 109318 vs customer 993229", "comparison",
+         {"customer_id": "109318", "customer_id_2": "993229"}),
+        ("customer 109318 versus 993229", "comparison", {"customer_id": "109318", "customer_id_2": "993229"}),
+        ("What is the total revenue by category?", "business_metric", {"metric_type": "revenue"}),
+        ("How many unique customers are there?", "business_metric", {"metric_type": "count"}),
+        ("Which stores sell both A and C?", "store_query",
+         {"product_id": "A", "product_id_2": "C", "match": "all"}),
+        ("How many stores sell Electronics?", "store_query", {"category": "Electronics", "product_id": None}),
+        ("Stores selling product A or Home Decor", "store_query",
+         {"product_id": "A", "category": "Home Decor", "match": "any"}),
+        ("Show the monthly revenue trend", "business_metric",
+         {"metric_type": "trend", "category": None, "payment_method": None}),
+        ("What is the revenue growth for Books?", "business_metric",
+         {"metric_type": "trend", "category": "Books", "payment_method": None}),
+        ("Daily sales trend for credit card payments", "business_metric",
+         {"metric_type": "trend", "granularity": "day", "payment_method": "Credit Card"}),
+    ])
+    def test_confident(self, question, intent, fields):
+        result = classify_by_rules(question)
+        assert result["intent"] == intent
+        for key, value in fields.items():
+            assert result[key] == value
+        assert set(result) >= {"intent", "customer_id", "customer_id_2", "product_id", "product_id_2", "summary"}
+
+    @pytest.mark.parametrize("question", [
+        "Tell me a joke",
+        "Tell me about product Z",
+        "Did customer 109318 buy product A?",
+        "How many customers spent more than 10000 on revenue?",
+        "Compare the weekend with weekdays",
+        "Which products sold best last summer?",
+        "Is product A more popular than B?",
+        "Is product A selling better this year?",
+        "Do customers spend more on product B?",
+        "How many customers per month?",
+        "Monthly revenue trend by category",
+        "Revenue growth for Books and Clothing",
+    ])
+    def test_unsure_falls_back(self, question):
+        assert classify_by_rules(question) is None
+
+    def test_bare_numbers_need_customer_context(self):
+        assert extract_entities("Orders over 100000") == ([], [])
+
+
+class TestClassifyQueryFastPath:
+    def test_rules_skip_llm(self):
+        metrics.reset()
+        with patch("app.services.llm_service.get_gateway") as gateway:
+            result = classify_query("What has customer 109318 purchased?")
+        gateway.assert_not_called()
+        assert result["intent"] == "customer_query"
+        assert metrics.get("classifier.rule_hits") == 1
+
+    def test_metrics_endpoint(self, client):
+        metrics.reset()
+        classify_query("Compare product A vs product B")
+        data = client.get("/api/metrics").get_json()
+        assert data["counters"]["classifier.rule_hits"] == 1
+        assert data["classifier"]["rule_hit_rate"] == 1.0
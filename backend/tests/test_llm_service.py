@@ -0,0 +1,230 @@
+"""Tests for the LLM gateway in app.services.llm_service, against a local fake server."""
+
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+from openai import APITimeoutError, RateLimitError
+
+from app.services import llm_service
+from app.services.llm_service import DeadlineExceeded, LLMGateway, generate_response, stream_response
+
+
+def _gateway(base_url, **kwargs):
+    kwargs.setdefault("backoff_base", 0.01)
+    return LLMGateway("test-key", base_url=base_url, **kwargs)
+
+
+def _ask(gateway, timeout=5):
+    response = gateway.chat(model="gpt-4o", messages=[{"role": "user", "content": "hi"}], timeout=timeout)
+    return response.choices[0].message.content
+
+
+class TestLLMGateway:
+    def test_reuses_one_client(self, fake_openai, monkeypatch):
+        fake, base_url = fake_openai
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+        monkeypatch.setenv("OPENAI_BASE_URL", base_url)
+        monkeypatch.setattr(llm_service, "_gateway", None)
+
+        first = llm_service.get_gateway()
+        assert llm_service.get_gateway() is first
+        assert llm_service.get_openai_client() is first.client
+        first.close()
+
+    def test_retries_server_errors(self, fake_openai):
+        fake, base_url = fake_openai
+        fake.script(status=500)
+        fake.script(content="recovered")
+        assert _ask(_gateway(base_url)) == "recovered"
+        assert len(fake.requests) == 2
+
+    def test_honours_retry_after(self, fake_openai):
+        fake, base_url = fake_openai
+        fake.script(status=429, headers={"retry-after-ms": "200"})
+        gateway = _gateway(base_url)
+        started = time.perf_counter()
+        assert _ask(gateway) == "ok"
+        assert time.perf_counter() - started >= 0.2
+
+    def test_gives_up_after_max_retries(self, fake_openai):
+        fake, base_url = fake_openai
+        for _ in range(3):
+            fake.script(status=429, headers={"retry-after": "0"})
+        with pytest.raises(RateLimitError):
+            _ask(_gateway(base_url, max_retries=2))
+        assert len(fake.requests) == 3
+
+    def test_per_call_timeout(self, fake_openai):
+        fake, base_url = fake_openai
+        fake.default_delay = 0.5
+        with pytest.raises(APITimeoutError):
+            _ask(_gateway(base_url, max_retries=0), timeout=0.1)
+
+    def test_caps_concurrency(self, fake_openai):
+        fake, base_url = fake_openai
+        fake.default_delay = 0.2
+        gateway = _gateway(base_url, max_concurrency=1, max_retries=0)
+        errors = []
+
+        def call():
+            try:
+                _ask(gateway, timeout=0.3)
+            except APITimeoutError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        # One slot and a 0.3s budget: the third caller cannot get a slot in time
+        assert errors
+
+    def test_deadline_caps_timeout_and_retries(self, fake_openai):
+        fake, base_url = fake_openai
+        fake.default_delay = 1
+        gateway = _gateway(base_url, max_retries=5)
+        started = time.perf_counter()
+        with pytest.raises(DeadlineExceeded):
+            gateway.chat(model="gpt-4o", messages=[], timeout=5, deadline=time.monotonic() + 0.2)
+        assert time.perf_counter() - started < 0.8
+        assert len(fake.requests) == 1
+
+    def test_backoff_is_jittered_and_capped(self):
+        gateway = LLMGateway("test-key", backoff_base=1, backoff_max=4)
+        delays = [gateway.retry_delay(5, Exception()) for _ in range(50)]
+        assert all(0 <= d <= 4 for d in delays)
+        assert len(set(delays)) > 1
+
+
+class TestResponseFunctions:
+    def test_generate_and_stream(self, fake_openai):
+        fake, base_url = fake_openai
+        fake.default_content = "Revenue is up"
+        gateway = _gateway(base_url)
+        with patch("app.services.llm_service.get_gateway", return_value=gateway):
+            assert generate_response("q", "data") == "Revenue is up"
+            assert list(stream_response("q", "data")) == ["Revenue", " is", " up"]
+        assert fake.requests[-1]["stream"] is True
+
+    def test_deadline_raises_instead_of_apologising(self, fake_openai):
+        fake, base_url = fake_openai
+        fake.default_delay = 1
+        gateway = _gateway(base_url)
+        with patch("app.services.llm_service.get_gateway", return_value=gateway):
+            with pytest.raises(DeadlineExceeded):
+                generate_response("q", "data", deadline=time.monotonic() + 0.1)
+            with pytest.raises(DeadlineExceeded):
+                list(stream_response("q", "data", deadline=time.monotonic() + 0.1))
+
+    def test_retry_abandoned_for_deadline_raises(self, fake_openai):
+        fake, base_url = fake_openai
+        fake.script(status=429, headers={"retry-after": "5"})
+        fake.script(status=429, headers={"retry-after": "5"})
+        gateway = _gateway(base_url)
+        with patch("app.services.llm_service.get_gateway", return_value=gateway):
+            with pytest.raises(DeadlineExceeded):
+                generate_response("q", "data", deadline=time.monotonic() + 2)
+            with pytest.raises(DeadlineExceeded):
+                list(stream_response("q", "data", deadline=time.monotonic() + 2))
+        assert len(fake.requests) == 2
+
+    def test_rate_limit_without_deadline_apologises(self, fake_openai):
+        fake, base_url = fake_openai
+        for _ in range(3):
+            fake.script(status=429, headers={"retry-after": "0"})
+        gateway = _gateway(base_url)
+        with patch("app.services.llm_service.get_gateway", return_value=gateway):
+            assert generate_response("q", "data") == llm_service.GENERATE_ERROR_RESPONSE
+
+
+class TestHedging:
+    def _hedging_gateway(self, base_url, **kwargs):
+        kwargs.setdefault("hedge_max_ratio", 1.0)
+        return _gateway(base_url, hedge_percentile=95, hedge_min_delay=0.1, hedge_min_samples=0, **kwargs)
+
+    def _ask(self, gateway):
+        return gateway.hedged_text(model="gpt-4o", messages=[{"role": "user", "content": "hi"}], timeout=5)
+
+    def test_slow_call_is_hedged(self, fake_openai):
+        from app.services import metrics
+
+        fake, base_url = fake_openai
+        fake.script(content="slow answer", delay=1.5)
+        fake.default_content = "fast answer"
+        metrics.reset()
+        gateway = self._hedging_gateway(base_url)
+
+        started = time.perf_counter()
+        assert self._ask(gateway) == "fast answer"
+        assert time.perf_counter() - started < 1.0
+        assert len(fake.requests) == 2
+        assert metrics.get("llm.hedges_issued") == 1
+        assert metrics.get("llm.hedges_won") == 1
+
+        # The slow attempt is closed once it starts streaming
+        deadline = time.monotonic() + 3
+        while metrics.get("llm.hedges_cancelled") == 0 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert metrics.get("llm.hedges_cancelled") == 1
+
+    def test_stalled_loser_is_cancelled(self, fake_openai):
+        from app.services import metrics
+
+        fake, base_url = fake_openai
+        fake.script(content="never sent", delay=5)
+        fake.default_content = "fast answer"
+        metrics.reset()
+        gateway = self._hedging_gateway(base_url, max_concurrency=2)
+
+        started = time.perf_counter()
+        assert self._ask(gateway) == "fast answer"
+        # The loser never produced a chunk; it is cancelled when the winner
+        # finishes rather than holding its slot until the timeout
+        assert time.perf_counter() - started < 1.0
+        assert metrics.get("llm.hedges_cancelled") == 1
+        assert gateway._hedge_gateway._slots._value == 2
+        gateway.close()
+
+    def test_fast_call_is_not_hedged(self, fake_openai):
+        fake, base_url = fake_openai
+        gateway = self._hedging_gateway(base_url)
+        assert self._ask(gateway) == "ok"
+        assert len(fake.requests) == 1
+
+    def test_delay_follows_latency_percentile(self, fake_openai):
+        _, base_url = fake_openai
+        gateway = _gateway(base_url, hedge_percentile=90, hedge_min_delay=0.1, hedge_min_samples=10)
+        assert gateway.hedge_delay() is None
+        gateway._latencies.extend(i / 10 for i in range(1, 11))  # 0.1s .. 1.0s
+        assert gateway.hedge_delay() == pytest.approx(1.0)
+        gateway.hedge_percentile = 50
+        assert gateway.hedge_delay() == pytest.approx(0.6)
+
+    def test_spend_cap(self, fake_openai):
+        from app.services import metrics
+
+        _, base_url = fake_openai
+        metrics.reset()
+        gateway = self._hedging_gateway(base_url, hedge_max_ratio=0.25)
+        gateway._hedged_calls = 8
+        assert [gateway._claim_hedge() for _ in range(3)] == [True, True, False]
+        assert metrics.get("llm.hedges_capped") == 1
+
+    def test_hedged_failure_past_deadline_raises(self, fake_openai):
+        fake, base_url = fake_openai
+        fake.default_delay = 1
+        gateway = self._hedging_gateway(base_url)
+        with patch("app.services.llm_service.get_gateway", return_value=gateway):
+            with pytest.raises(DeadlineExceeded):
+                generate_response("q", "data", deadline=time.monotonic() + 0.3)
+
+    def test_generate_response_uses_hedging(self, fake_openai):
+        fake, base_url = fake_openai
+        fake.default_content = "Revenue is up"
+        gateway = self._hedging_gateway(base_url)
+        with patch("app.services.llm_service.get_gateway", return_value=gateway):
+            assert generate_response("q", "data") == "Revenue is up"
+        assert fake.requests[-1]["stream"] is True
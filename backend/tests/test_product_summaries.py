@@ -0,0 +1,98 @@
+"""Unit tests for app.services.product_summaries and the product views built on it."""
+
+from unittest.mock import patch
+
+import pytest
+
+from app.models import Transaction
+from app.services.data_service import get_product_info, load_summary, product_summary
+from app.services.ingest_service import append_load
+from app.services.product_summaries import get_product_summary, product_summaries_ready
+from tests.test_ingest_service import CSV_ROWS, _write_csv
+
+
+class TestProductSummaries:
+    def test_built_for_seeded_data(self, app_ctx):
+        assert product_summaries_ready()
+        row = get_product_summary("A")
+        assert row.tx_count == 2
+        assert row.revenue == pytest.approx(116.25)
+        assert row.max_id == max(t.id for t in Transaction.query.filter_by(product_id="A"))
+
+    def test_summary_matches_sql(self, app_ctx):
+        stored = product_summary("B")
+        sql = load_summary(product_id="B")
+
+        assert stored.count == sql.count
+        assert stored.total_revenue == pytest.approx(sql.total_revenue)
+        assert stored.count_by_payment == sql.count_by_payment
+        assert stored.sample_amounts == sql.sample_amounts
+        assert stored.stores == sql.stores
+        assert stored.store_count == sql.store_count
+        assert stored.unique_customers == sql.unique_customers
+
+    def test_store_count_is_exact(self, app_ctx):
+        assert "Total Stores Selling This Product: 2" in get_product_info("A")
+
+    def test_unknown_product(self, app_ctx):
+        assert not product_summary("Z")
+
+
+class TestIncrementalRefresh:
+    def test_append_folds_new_rows(self, empty_app, tmp_path):
+        path = tmp_path / "tx.csv"
+        _write_csv(path, CSV_ROWS[:1])
+        append_load([str(path)], log=lambda msg: None)
+        assert get_product_summary("C").tx_count == 1
+
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("".join(CSV_ROWS[1:3]))
+        append_load([str(path)], log=lambda msg: None)
+
+        s = product_summary("C")
+        assert s.count == 2
+        assert s.total_revenue == pytest.approx(455.86 + 258.31)
+        assert s.store_count == 2
+        assert s.unique_customers == 2
+        assert s.sample_amounts == [455.86, 258.31]
+        assert s.revenue_by_category == {"Books": pytest.approx(455.86), "Home Decor": pytest.approx(258.31)}
+        assert get_product_summary("A").tx_count == 1
+
+
+class TestProductEndpoint:
+    def test_serves_summary(self, client):
+        data = client.get("/api/products/A").get_json()
+
+        assert data["transaction_count"] == 2
+        assert data["total_revenue"] == 116.25
+        assert data["categories"] == ["Electronics"]
+        assert data["store_count"] == 2
+        assert data["sample_stores"] == ["123 Main St, New York", "789 Elm Rd, Houston"]
+
+    def test_unknown_product(self, client):
+        assert client.get("/api/products/Z").status_code == 404
+
+    def test_conditional_get(self, client):
+        first = client.get("/api/products/A")
+        etag = first.headers["ETag"]
+        assert first.headers["Cache-Control"] == "public, max-age=60"
+
+        with patch("app.routes.products.product_summary") as loader, \
+                patch("app.services.dataset.get_dataset_version") as version:
+            repeat = client.get("/api/products/A", headers={"If-None-Match": etag})
+        assert repeat.status_code == 304
+        assert repeat.headers["ETag"] == etag
+        assert repeat.data == b""
+        loader.assert_not_called()
+        version.assert_not_called()
+
+        other = client.get("/api/products/B", headers={"If-None-Match": etag})
+        assert other.status_code == 200
+        assert other.headers["ETag"] != etag
+
+    def test_etag_changes_with_dataset_version(self, client, app_ctx):
+        from app.services.dataset import bump_dataset_version
+
+        etag = client.get("/api/products/A").headers["ETag"]
+        bump_dataset_version()
+        assert client.get("/api/products/A", headers={"If-None-Match": etag}).status_code == 200
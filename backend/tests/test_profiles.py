@@ -0,0 +1,117 @@
+"""Unit tests for app.services.profiles and the customer views built on it."""
+
+from datetime import datetime
+
+import pytest
+
+from app.services.aggregates import TransactionSummary
+from app.services.cache import get_cache
+from app.services.data_service import compare_customers, customer_summary, load_summary
+from app.services.ingest_service import append_load
+from app.services.profiles import get_profile, profiles_ready
+from tests.test_ingest_service import CSV_ROWS, _write_csv
+
+
+class TestProfiles:
+    def test_built_for_seeded_data(self, app_ctx):
+        assert profiles_ready()
+        p = get_profile("109318")
+        assert p.tx_count == 2
+        assert p.total_spend == pytest.approx(86.25)
+        assert p.product_count == 2
+        assert p.first_purchase == datetime(2024, 1, 15, 10, 30)
+        assert p.last_purchase == datetime(2024, 2, 20, 14, 0)
+        assert p.count_by_payment == {"Credit Card": 1, "Cash": 1}
+        assert p.sample_amounts == [71.25, 15.0]
+
+    def test_summary_matches_sql(self, app_ctx):
+        profile = customer_summary("993229")
+        sql = load_summary(customer_id="993229", with_stores=False)
+
+        assert profile.count == sql.count
+        assert profile.total_revenue == pytest.approx(sql.total_revenue)
+        assert profile.revenue_by_category == pytest.approx(sql.revenue_by_category)
+        assert profile.count_by_payment == sql.count_by_payment
+        assert profile.sample_amounts == sql.sample_amounts
+
+    def test_unknown_customer(self, app_ctx):
+        assert not customer_summary("000000")
+
+    def test_unique_customers_from_profiles(self, app_ctx):
+        assert TransactionSummary.from_rollups().unique_customers == 3
+
+    def test_compare_customers(self, app_ctx):
+        text = compare_customers("109318", "993229")
+        assert "= $71.25 + $15.00" in text
+        assert "Avg per Transaction = $79.00 / 2 = $39.50" in text
+
+
+class TestIncrementalRefresh:
+    def test_append_updates_touched_customers(self, empty_app, tmp_path):
+        path = tmp_path / "tx.csv"
+        _write_csv(path, CSV_ROWS[:1])
+        append_load([str(path)], log=lambda msg: None)
+        assert get_profile("109318").tx_count == 1
+
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("".join(CSV_ROWS[1:3]))
+        append_load([str(path)], log=lambda msg: None)
+
+        assert get_profile("109318").tx_count == 1
+        assert get_profile("993229").total_spend == pytest.approx(258.31)
+        assert get_profile("579675").spend_by_category == {"Books": pytest.approx(212.02)}
+
+
+class TestCustomerEndpoint:
+    def test_returns_profile_totals(self, client):
+        data = client.get("/api/customers/109318").get_json()
+
+        assert data["transaction_count"] == 2
+        assert data["total_spend"] == 86.25
+        assert data["avg_transaction"] == pytest.approx(43.125, abs=0.01)
+        assert data["spend_by_category"] == {"Books": 15.0, "Electronics": 71.25}
+        assert [t["product_id"] for t in data["transactions"]] == ["B", "A"]
+
+    def test_unknown_customer(self, client):
+        assert client.get("/api/customers/000000").status_code == 404
+
+    def test_conditional_get(self, client):
+        etag = client.get("/api/customers/109318").headers["ETag"]
+
+        repeat = client.get("/api/customers/109318", headers={"If-None-Match": etag})
+        assert repeat.status_code == 304
+        assert "ETag" not in client.get("/api/customers/000000").headers
+
+    def test_keyset_pages_cover_history(self, client):
+        first = client.get("/api/customers/109318?limit=1").get_json()
+        assert [t["product_id"] for t in first["transactions"]] == ["B"]
+        assert first["total_spend"] == 86.25
+
+        second = client.get(f"/api/customers/109318?limit=1&cursor={first['next_cursor']}").get_json()
+        assert [t["product_id"] for t in second["transactions"]] == ["A"]
+        assert second["next_cursor"] is None
+        assert second["transaction_count"] == 2
+
+    def test_date_range_restricts_totals(self, client):
+        data = client.get("/api/customers/109318?start=2024-02-01&end=2024-02-20").get_json()
+
+        assert data["transaction_count"] == 1
+        assert data["total_spend"] == 15.0
+        assert [t["product_id"] for t in data["transactions"]] == ["B"]
+        assert client.get("/api/customers/109318?end=2023-12-31").status_code == 404
+
+    @pytest.mark.parametrize("engine", ["sql", "snapshot"])
+    def test_open_ended_range(self, client, seeded_app, monkeypatch, engine):
+        monkeypatch.setitem(seeded_app.config, "ANALYTICS_ENGINE", engine)
+        get_cache("results").clear()
+        data = client.get("/api/customers/109318?start=2024-02-01&end=9999-12-31").get_json()
+        assert data["total_spend"] == 15.0
+        assert [t["product_id"] for t in data["transactions"]] == ["B"]
+        assert client.get("/api/customers/109318?start=9999-12-31").status_code == 404
+
+    @pytest.mark.parametrize("query", [
+        "limit=0", "limit=abc", "limit=", "limit=-5", "cursor=not-a-cursor", "start=2024-13-01",
+        "start=2024-03-01&end=2024-02-01",
+    ])
+    def test_rejects_bad_parameters(self, client, query):
+        assert client.get(f"/api/customers/109318?{query}").status_code == 400
@@ -0,0 +1,118 @@
+"""Unit tests for app.services.rollups and the reports built on it."""
+
+from datetime import date
+
+import pytest
+
+from app.extensions import db
+from app.models import TransactionRollup
+from app.services.aggregates import TransactionSummary
+from app.services.chart_service import build_trend_charts
+from app.services.data_service import get_revenue_trend, load_summary
+from app.services.ingest_service import append_load
+from app.services.intent_rules import classify_by_rules
+from app.services.rollups import _day_ranges, refresh_rollups, rollups_ready, trend
+from tests.test_ingest_service import CSV_ROWS, _write_csv
+
+
+class TestCube:
+    def test_built_for_seeded_data(self, app_ctx):
+        assert rollups_ready()
+        assert TransactionRollup.query.count() == 6
+
+    def test_summary_matches_sql(self, app_ctx):
+        cube = TransactionSummary.from_rollups()
+        sql = load_summary(with_stores=False)
+
+        assert cube.count == sql.count == 6
+        assert cube.total_revenue == pytest.approx(342.25)
+        assert cube.revenue_by_category == pytest.approx(sql.revenue_by_category)
+        assert cube.count_by_payment == sql.count_by_payment
+        assert cube.unique_customers == 3
+        assert cube.unique_products == 4
+
+    def test_filtered_summary(self, app_ctx):
+        s = TransactionSummary.from_rollups(product_id="A")
+        assert s.count == 2
+        assert s.total_revenue == pytest.approx(116.25)
+
+
+class TestTrend:
+    def test_monthly(self, app_ctx):
+        periods = trend("month")
+        assert [p[0] for p in periods] == [date(2024, m, 1) for m in range(1, 7)]
+        assert periods[-1][3] == pytest.approx(120.0)
+
+    def test_filters(self, app_ctx):
+        periods = trend("day", product_category="Books")
+        assert [(p[0], p[1]) for p in periods] == [(date(2024, 2, 20), 1), (date(2024, 5, 1), 1)]
+
+    def test_rejects_unknown_granularity_and_filters(self, app_ctx):
+        with pytest.raises(ValueError):
+            trend("week")
+        with pytest.raises(ValueError):
+            trend("month", customer_id="109318")
+
+    def test_text_and_charts(self, app_ctx):
+        periods = trend("month")
+        text = get_revenue_trend("month", periods)
+        assert "Revenue Trend by Month — 6 periods" in text
+        assert "Highest month: 2024-06 ($120.00)" in text
+        assert "Lowest month: 2024-02 ($15.00)" in text
+
+        charts = build_trend_charts(periods, "month")
+        assert charts[0]["data"][0] == {"name": "2024-01", "value": 71.25}
+        assert charts[1]["data"][0] == {"name": "2024-01", "value": 1}
+
+
+class TestIncrementalRefresh:
+    def test_append_updates_touched_days(self, empty_app, tmp_path):
+        path = tmp_path / "tx.csv"
+        _write_csv(path, CSV_ROWS[:1])
+        append_load([str(path)], log=lambda msg: None)
+        assert [(p[0], p[1]) for p in trend("month")] == [(date(2023, 12, 1), 1)]
+
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("".join(CSV_ROWS[1:3]))
+        append_load([str(path)], log=lambda msg: None)
+
+        periods = trend("month")
+        assert [p[0] for p in periods] == [date(2023, 8, 1), date(2023, 12, 1), date(2024, 3, 1)]
+        assert sum(p[1] for p in periods) == 3
+        assert TransactionSummary.from_rollups().total_revenue == pytest.approx(455.86 + 258.31 + 212.02)
+
+    def test_days_between_touched_days_are_left_alone(self, empty_app, tmp_path):
+        path = tmp_path / "tx.csv"
+        _write_csv(path, CSV_ROWS[:3])
+        append_load([str(path)], log=lambda msg: None)
+        days = {r.day for r in TransactionRollup.query}
+        # A cube row no transaction backs; a rebuild of its day would drop it
+        db.session.add(TransactionRollup(
+            day=date(2023, 10, 1), month=date(2023, 10, 1), product_category="Books",
+            payment_method="Cash", product_id="A", tx_count=1, total_quantity=1,
+            revenue=1.0, sum_price=1.0, sum_discount=0.0,
+        ))
+        db.session.commit()
+
+        assert refresh_rollups(days) == 3
+        assert TransactionRollup.query.filter_by(day=date(2023, 10, 1)).count() == 1
+
+    def test_day_ranges(self):
+        days = [date(2024, 1, 2), date(2023, 1, 1), date(2024, 1, 1), date(2024, 1, 2)]
+        assert _day_ranges(days) == [
+            [date(2023, 1, 1), date(2023, 1, 2)],
+            [date(2024, 1, 1), date(2024, 1, 3)],
+        ]
+
+
+class TestTrendIntent:
+    @pytest.mark.parametrize("question,granularity", [
+        ("Show the monthly revenue trend", "month"),
+        ("What are daily sales?", "day"),
+        ("How has revenue changed over time?", "month"),
+    ])
+    def test_trend_questions(self, question, granularity):
+        result = classify_by_rules(question)
+        assert result["intent"] == "business_metric"
+        assert result["metric_type"] == "trend"
+        assert result["granularity"] == granularity
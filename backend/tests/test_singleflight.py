@@ -0,0 +1,112 @@
+"""Tests for app.services.singleflight and coalesced /api/chat requests."""
+
+import json
+import threading
+import time
+from unittest.mock import patch
+
+
+from app.services.singleflight import RedisSingleFlight, SingleFlight
+
+
+def _run_concurrently(n, target):
+    barrier = threading.Barrier(n)
+    results = [None] * n
+
+    def run(i):
+        barrier.wait()
+        results[i] = target()
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+class TestSingleFlight:
+    def test_one_execution_for_concurrent_callers(self):
+        flight = SingleFlight()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.2)
+            return {"answer": 42}
+
+        results = _run_concurrently(5, lambda: flight.do("k", slow))
+        assert len(calls) == 1
+        assert all(result == {"answer": 42} for result, _ in results)
+        assert sum(shared for _, shared in results) == 4
+
+    def test_error_reaches_every_waiter(self):
+        flight = SingleFlight()
+
+        def boom():
+            time.sleep(0.1)
+            raise RuntimeError("boom")
+
+        def call():
+            try:
+                flight.do("k", boom)
+            except RuntimeError as e:
+                return str(e)
+
+        assert _run_concurrently(3, call) == ["boom"] * 3
+
+    def test_sequential_calls_run_again(self):
+        flight = SingleFlight()
+        assert flight.do("k", lambda: 1) == (1, False)
+        assert flight.do("k", lambda: 2) == (2, False)
+
+
+class TestRedisSingleFlight:
+    def test_shares_result_across_workers(self, fake_redis):
+        # Two coalescers stand in for two gunicorn workers
+        worker_a = RedisSingleFlight(None, client=fake_redis, poll_interval=0.01)
+        worker_b = RedisSingleFlight(None, client=fake_redis, poll_interval=0.01)
+        calls = []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.2)
+            return {"answer": 42}
+
+        flights = iter([worker_a, worker_b])
+        lock = threading.Lock()
+
+        def call():
+            with lock:
+                flight = next(flights)
+            return flight.do("k", slow)[0]
+
+        assert _run_concurrently(2, call) == [{"answer": 42}] * 2
+        assert len(calls) == 1
+
+
+class TestCoalescedChat:
+    def test_identical_requests_share_generation(self, seeded_app):
+        calls = []
+
+        def slow_generate(question, data, deadline=None):
+            calls.append(question)
+            time.sleep(0.2)
+            return "Hello!"
+
+        classification = {"intent": "general", "customer_id": None, "customer_id_2": None,
+                          "product_id": None, "product_id_2": None, "summary": ""}
+
+        def post(message):
+            client = seeded_app.test_client()
+            return client.post("/api/chat", data=json.dumps({"message": message}),
+                               content_type="application/json").get_json()
+
+        with patch("app.routes.chat.generate_response", side_effect=slow_generate), \
+                patch("app.routes.chat.classify_query", return_value=classification), \
+                patch("app.routes.chat.current_dataset_version", return_value=1):
+            results = _run_concurrently(4, lambda: post("Hi there!"))
+            results += _run_concurrently(2, lambda: post("  hi THERE "))
+
+        assert [r["response"] for r in results] == ["Hello!"] * 6
+        assert len(calls) == 2
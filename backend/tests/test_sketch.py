@@ -0,0 +1,29 @@
+"""Unit tests for app.services.sketch."""
+
+import pytest
+
+from app.services.sketch import HyperLogLog
+
+
+class TestHyperLogLog:
+    def test_small_sets_are_exact(self):
+        h = HyperLogLog()
+        assert h.count() == 0
+        h.update(["a", "b", "a", "c"])
+        assert h.count() == 3
+
+    @pytest.mark.parametrize("n", [5000, 50000])
+    def test_large_sets_within_error(self, n):
+        h = HyperLogLog().update(f"store {i}" for i in range(n))
+        assert h.count() == pytest.approx(n, rel=4 * h.relative_error)
+
+    def test_merge_is_union(self):
+        a = HyperLogLog().update(range(3000))
+        b = HyperLogLog().update(range(2000, 6000))
+        merged = HyperLogLog.from_bytes(a.to_bytes()).merge(b)
+        assert merged.count() == pytest.approx(6000, rel=4 * a.relative_error)
+        assert merged.count() >= a.count()
+
+    def test_rejects_mismatched_precision(self):
+        with pytest.raises(ValueError):
+            HyperLogLog(precision=10).merge(HyperLogLog())
@@ -0,0 +1,90 @@
+"""Unit tests for app.services.snapshot."""
+
+from datetime import date, datetime
+from unittest.mock import patch
+
+from app.extensions import db
+from app.models import Transaction
+from app.services.cache import get_cache
+from app.services.aggregates import TransactionSummary
+from app.services.data_service import (
+    compare_customers, customer_history_summary, get_business_metrics, get_product_info,
+)
+from app.services.dataset import bump_dataset_version, get_dataset_version
+from app.services.product_summaries import product_summaries_ready
+from app.services.profiles import profiles_ready
+from app.services.rollups import rollups_ready
+from app.services.snapshot import TransactionSnapshot, get_snapshot
+from tests.conftest import SAMPLE_ROWS
+from tests.test_aggregates import _assert_same
+
+
+class TestTransactionSnapshot:
+    def test_encodes_categoricals(self, app_ctx):
+        snap = TransactionSnapshot.load()
+        assert snap.size == 6
+        assert list(snap.categories["product_id"]) == ["A", "B", "C", "D"]
+        assert snap.codes["product_id"].dtype.kind == "i"
+
+    def test_matches_sql(self, app_ctx):
+        snap = TransactionSnapshot.load()
+        for pid in ("A", "B", "Z"):
+            _assert_same(
+                snap.summarize(product_id=pid),
+                TransactionSummary.from_query(Transaction.product_id == pid),
+            )
+        _assert_same(
+            snap.summarize(customer_id="109318"),
+            TransactionSummary.from_query(Transaction.customer_id == "109318"),
+        )
+        _assert_same(snap.summarize(), TransactionSummary.from_query())
+
+    def test_date_range_matches_sql(self, app_ctx):
+        snap = TransactionSnapshot.load()
+        since, until = datetime(2024, 2, 1), datetime(2024, 5, 1)
+        _assert_same(
+            snap.summarize(since=since, until=until),
+            TransactionSummary.from_query(Transaction.transaction_date >= since, Transaction.transaction_date < until),
+        )
+
+    def test_formatters_identical(self, empty_app, monkeypatch):
+        # Raw transactions only: with no derived tables every formatter scans
+        for row in SAMPLE_ROWS:
+            db.session.add(Transaction(**row))
+        db.session.commit()
+        assert not (rollups_ready() or profiles_ready() or product_summaries_ready())
+
+        def render():
+            # Summaries are cached too; each engine must compute its own
+            get_cache("results").clear()
+            return [
+                get_business_metrics.__wrapped__(),
+                get_product_info.__wrapped__("A"),
+                compare_customers.__wrapped__("109318", "993229"),
+                customer_history_summary("109318", start=date(2024, 2, 1)).total_revenue,
+            ]
+
+        expected = render()
+        monkeypatch.setitem(empty_app.config, "ANALYTICS_ENGINE", "snapshot")
+        with patch.object(TransactionSnapshot, "summarize", autospec=True,
+                          side_effect=TransactionSnapshot.summarize) as summarize:
+            actual = render()
+        assert actual == expected
+        assert summarize.call_count == 5
+
+    def test_date_ranged_history_uses_snapshot(self, app_ctx, seeded_app, monkeypatch):
+        monkeypatch.setitem(seeded_app.config, "ANALYTICS_ENGINE", "snapshot")
+        with patch.object(TransactionSnapshot, "summarize", autospec=True,
+                          side_effect=TransactionSnapshot.summarize) as summarize:
+            s = customer_history_summary("109318", start=date(2024, 2, 1), end=date(2024, 2, 20))
+        assert s.total_revenue == 15.0
+        summarize.assert_called_once()
+
+    def test_reloads_on_version_change(self, app_ctx, seeded_app, monkeypatch):
+        monkeypatch.setitem(seeded_app.config, "SNAPSHOT_CHECK_INTERVAL", 0)
+        first = get_snapshot()
+        assert get_snapshot() is first
+        bump_dataset_version()
+        second = get_snapshot()
+        assert second is not first
+        assert second.version == get_dataset_version()
@@ -0,0 +1,98 @@
+"""Tests for speculative retrieval during classification."""
+
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from app.routes.chat import _classify_and_retrieve
+from app.services import metrics
+from app.services.deadline import Deadline
+from app.services.speculation import guess_classification, retrieval_key, speculate
+
+CLASSIFY_QUERY_PATH = "app.routes.chat.classify_query"
+
+
+class TestGuessClassification:
+    @pytest.mark.parametrize("question, expected", [
+        ("What has customer 109318 purchased?", {"intent": "customer_query", "customer_id": "109318"}),
+        ("Tell me about product b", {"intent": "product_query", "product_id": "B"}),
+        ("Compare product A vs B", {"intent": "comparison", "product_id": "A", "product_id_2": "B"}),
+        ("Compare customer 109318 and customer 993229",
+         {"intent": "comparison", "customer_id": "109318", "customer_id_2": "993229"}),
+    ])
+    def test_entity_questions(self, question, expected):
+        guess = guess_classification(question)
+        assert {k: v for k, v in guess.items() if v is not None} == expected
+
+    def test_no_entities(self):
+        assert guess_classification("What is the total revenue?") is None
+
+    def test_key_ignores_fields_the_intent_does_not_use(self):
+        a = {"intent": "customer_query", "customer_id": "109318", "product_id": "A"}
+        b = {"intent": "customer_query", "customer_id": "109318"}
+        assert retrieval_key(a) == retrieval_key(b)
+
+
+def _classification(intent, **fields):
+    base = {"intent": intent, "customer_id": None, "product_id": None, "summary": "test"}
+    base.update(fields)
+    return base
+
+
+class TestSpeculativeRetrieval:
+    def test_win_reuses_result(self, app_ctx):
+        metrics.reset()
+        calls = []
+        ran = threading.Event()
+
+        def retrieve(classification):
+            calls.append(threading.current_thread().name)
+            ran.set()
+            return ("data", None, None)
+
+        speculation = speculate("Tell me about product A", retrieve)
+        assert ran.wait(5)
+        result = speculation.claim(_classification("product_query", product_id="A"))
+
+        assert result == ("data", None, None)
+        assert calls[0].startswith("speculate")
+        assert metrics.get("speculation.wins") == 1
+
+    def test_mismatch_is_discarded(self, app_ctx):
+        metrics.reset()
+        speculation = speculate("Tell me about product A", lambda c: ("data", None, None))
+        speculation.future.result(5)
+
+        assert speculation.claim(_classification("business_metric")) is None
+        assert metrics.get("speculation.wasted") == 1
+        assert metrics.get("speculation.wins") == 0
+
+    def test_disabled(self, seeded_app, app_ctx, monkeypatch):
+        monkeypatch.setitem(seeded_app.config, "SPECULATION_WORKERS", 0)
+        assert speculate("Tell me about product A", lambda c: None) is None
+
+    def test_overlaps_with_classification(self, app_ctx):
+        """The route runs the real retrieval while classification is still waiting."""
+        metrics.reset()
+
+        def slow_classify(question, **kwargs):
+            time.sleep(0.2)
+            return _classification("customer_query", customer_id="109318")
+
+        with patch(CLASSIFY_QUERY_PATH, side_effect=slow_classify):
+            classification, retrieval = _classify_and_retrieve("What has customer 109318 purchased?", Deadline.from_config())
+
+        assert classification["intent"] == "customer_query"
+        assert "109318" in retrieval[0]
+        assert metrics.get("speculation.wins") == 1
+        assert metrics.get("speculation.win_ms") > 0
+
+    def test_wrong_guess_falls_back_to_classified_retrieval(self, app_ctx):
+        metrics.reset()
+        with patch(CLASSIFY_QUERY_PATH, return_value=_classification("product_query", product_id="B")):
+            _, retrieval = _classify_and_retrieve("What has customer 109318 purchased?", Deadline.from_config())
+
+        assert retrieval[0].startswith("Product B")
+        assert metrics.get("speculation.wasted") == 1
@@ -0,0 +1,90 @@
+"""Unit tests for app.services.store_index and the store lookups built on it."""
+
+from app.extensions import db
+from app.models import Transaction
+from app.services.chart_service import build_store_charts
+from app.services.data_service import get_store_membership, product_summary, store_membership
+from app.services.ingest_service import append_load
+from app.services.dataset import bump_dataset_version
+from app.services.store_index import _EXTENSION_KEY, StoreIndex, _positions, get_store_index
+from tests.test_ingest_service import CSV_ROWS, _write_csv
+
+NEW_YORK = "123 Main St, New York"
+CHICAGO = "456 Oak Ave, Chicago"
+HOUSTON = "789 Elm Rd, Houston"
+
+
+class TestStoreIndex:
+    def test_positions(self):
+        assert list(_positions(0)) == []
+        assert list(_positions(0b101001)) == [0, 3, 5]
+
+    def test_membership(self, app_ctx):
+        index = StoreIndex.load()
+
+        assert len(index.stores) == 4
+        assert index.names(index.stores_for(products=["A"])) == [NEW_YORK, HOUSTON]
+        assert index.names(index.stores_for(products=["A", "B"])) == [NEW_YORK]
+        assert index.count(index.stores_for(products=["A", "B"], match_all=False)) == 3
+        assert index.names(index.stores_for(categories=["Home Decor"])) == [CHICAGO]
+        assert index.count(index.stores_for(products=["Z"])) == 0
+        assert index.products_at(CHICAGO) == ["B", "D"]
+
+    def test_product_summary_stores(self, app_ctx):
+        s = product_summary("B")
+        assert s.store_count == 2
+        assert s.stores == [NEW_YORK, CHICAGO]
+
+
+class TestStoreMembership:
+    def test_intersection_text_and_chart(self, app_ctx):
+        membership = store_membership(["A"], ["Books"])
+        text = get_store_membership(membership)
+
+        assert text.startswith("Stores selling product A and Books — 1 stores")
+        assert "product A ∩ Books = 1" in text
+        assert f"  • {NEW_YORK}" in text
+        assert build_store_charts(membership)[0]["data"] == [
+            {"name": "product A", "value": 2},
+            {"name": "Books", "value": 2},
+            {"name": "product A ∩ Books", "value": 1},
+        ]
+
+    def test_single_item_has_no_chart(self, app_ctx):
+        membership = store_membership(categories=["Clothing"])
+        assert membership["store_count"] == 1
+        assert build_store_charts(membership) is None
+
+
+class TestRefresh:
+    def test_extends_on_append(self, empty_app, tmp_path, monkeypatch):
+        monkeypatch.setitem(empty_app.config, "SNAPSHOT_CHECK_INTERVAL", 0)
+        path = tmp_path / "tx.csv"
+        _write_csv(path, CSV_ROWS[:1])
+        append_load([str(path)], log=lambda msg: None)
+        first = get_store_index()
+        assert first.count(first.stores_for(categories=["Books"])) == 1
+
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("".join(CSV_ROWS[1:3]))
+        append_load([str(path)], log=lambda msg: None)
+
+        index = get_store_index()
+        assert index is first
+        assert len(index.stores) == 3
+        assert index.count(index.stores_for(products=["C"])) == 2
+        assert index.count(index.stores_for(categories=["Books"])) == 2
+
+    def test_built_at_startup(self, empty_app):
+        assert isinstance(empty_app.extensions[_EXTENSION_KEY], StoreIndex)
+
+    def test_rebuilds_when_rows_removed(self, empty_app, tmp_path):
+        append_load([_write_csv(tmp_path / "tx.csv", CSV_ROWS[:3])], log=lambda msg: None)
+        first = get_store_index()
+        Transaction.query.filter_by(id=first.max_id).delete()
+        db.session.commit()
+        bump_dataset_version()
+
+        index = get_store_index()
+        assert index is not first
+        assert len(index.stores) == 2
@@ -2,7 +2,7 @@ import { useState } from 'react';
 import './index.css';
 import ChatWindow from './components/ChatWindow';
 import ChatInput from './components/ChatInput';
-import { sendMessage } from './services/api';
+import { streamMessage } from './services/api';
 
 function App() {
   const SUGGESTIONS = [
@@ -20,26 +20,39 @@ function App() {
     },
   ]);
   const [loading, setLoading] = useState(false);
+  const [streaming, setStreaming] = useState(false);
 
   const handleSend = async (text) => {
-    if (!text.trim() || loading) return;
+    if (!text.trim() || loading || streaming) return;
 
     const userMsg = { role: 'user', content: text };
     setMessages((prev) => [...prev, userMsg]);
     setLoading(true);
+    setStreaming(true);
 
     try {
-      const data = await sendMessage(text);
-      setMessages((prev) => [
-        ...prev,
-        {
-          role: 'assistant',
-          content: data.response,
-          sourceData: data.source_data,
-          intent: data.intent,
-          chartData: data.chart_data,
+      let started = false;
+      const updateLast = (fn) =>
+        setMessages((prev) => [...prev.slice(0, -1), fn(prev[prev.length - 1])]);
+
+      await streamMessage(text, {
+        onMeta: (meta) => {
+          started = true;
+          setLoading(false);
+          setMessages((prev) => [
+            ...prev,
+            {
+              role: 'assistant',
+              content: '',
+              sourceData: meta.source_data,
+              intent: meta.intent,
+              chartData: meta.chart_data,
+            },
+          ]);
         },
-      ]);
+        onToken: (chunk) => updateLast((msg) => ({ ...msg, content: msg.content + chunk })),
+      });
+      if (!started) throw new Error('Empty response');
     } catch {
       setMessages((prev) => [
         ...prev,
@@ -47,6 +60,7 @@ function App() {
       ]);
     } finally {
       setLoading(false);
+      setStreaming(false);
     }
   };
 
@@ -62,7 +76,7 @@ function App() {
       </header>
       <main className="chat-container">
         <ChatWindow messages={messages} loading={loading} onSuggestionClick={handleSend} />
-        <ChatInput onSend={handleSend} disabled={loading} />
+        <ChatInput onSend={handleSend} disabled={loading || streaming} />
       </main>
     </div>
   );
@@ -9,3 +9,44 @@ export async function sendMessage(message) {
   if (!res.ok) throw new Error('Failed to send message');
   return res.json();
 }
+
+// Stream a chat answer over Server-Sent Events.
+// onMeta({ intent, source_data, chart_data }) fires once retrieval is done,
+// onToken(text) for every generated chunk. Resolves when the stream ends.
+export async function streamMessage(message, { onMeta, onToken } = {}) {
+  const res = await fetch(`${API_BASE}/chat/stream`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json', Accept: 'text/event-stream' },
+    body: JSON.stringify({ message }),
+  });
+  if (!res.ok || !res.body) throw new Error('Failed to send message');
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  const handleEvent = (block) => {
+    let event = 'message';
+    let data = '';
+    for (const line of block.split('\n')) {
+      if (line.startsWith('event: ')) event = line.slice(7);
+      else if (line.startsWith('data: ')) data += line.slice(6);
+    }
+    const payload = data ? JSON.parse(data) : {};
+    if (event === 'meta') onMeta?.(payload);
+    else if (event === 'token') onToken?.(payload.text);
+    else if (event === 'error') throw new Error(payload.response || 'Stream failed');
+  };
+
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let sep;
+    while ((sep = buffer.indexOf('\n\n')) !== -1) {
+      handleEvent(buffer.slice(0, sep));
+      buffer = buffer.slice(sep + 2);
+    }
+  }
+  if (buffer.trim()) handleEvent(buffer);
+}